@@ -0,0 +1,46 @@
+# run from backend
+# PYTHONPATH=. python -m benchmarks.cache_codecs
+"""Blob size and encode/decode time of the cache codecs (models.cache_codec) against legacy json text."""
+import json
+import time
+
+from models.cache_codec import codecs, available_codecs
+from services.ichimoku.ichimoku_api import IchimokuApi
+from benchmarks.ichimoku_export import make_frame
+
+SIZES = [1_000, 10_000]
+REPEATS = 5
+
+
+def best_of(func, arg) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def legacy_encode(data) -> bytes:
+    return json.dumps(data, default=str).encode()
+
+
+def main():
+    api = IchimokuApi(ticker="BENCH", period="Y")
+    print(f"{'rows':>7} {'codec':>13} {'size, KB':>9} {'ratio':>6} {'encode, ms':>11} {'decode, ms':>11}")
+    for size in SIZES:
+        data = api.export_nan(make_frame(api, size))
+        legacy_time, legacy_blob = best_of(legacy_encode, data)
+        legacy_decode, _ = best_of(json.loads, legacy_blob)
+        print(f"{size:>7} {'json (legacy)':>13} {len(legacy_blob) / 1024:>9.1f} {1:>6.1f} {legacy_time * 1000:>11.2f} {legacy_decode * 1000:>11.2f}")
+        for name in available_codecs():
+            codec = codecs[name]
+            encode_time, blob = best_of(codec.encode, data)
+            decode_time, decoded = best_of(codec.decode, blob)
+            assert decoded == json.loads(legacy_blob)
+            ratio = len(legacy_blob) / len(blob)
+            print(f"{size:>7} {name:>13} {len(blob) / 1024:>9.1f} {ratio:>6.1f} {encode_time * 1000:>11.2f} {decode_time * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
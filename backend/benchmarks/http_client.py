@@ -0,0 +1,37 @@
+# run from backend
+# PYTHONPATH=. python -m benchmarks.http_client
+"""Sector P/E refresh latency: a new connection per request (bare requests.get) against the shared pooled client."""
+import time
+
+import requests
+
+from services import http_client
+from services.paper_data.total_tickers import tech
+
+REPEATS = 3
+
+
+def smart_lab_url(ticker: str) -> str:
+    return f"https://smart-lab.ru/q/{ticker}/MSFO/p_e/"
+
+
+def fetch_sector(get) -> float:
+    # requests of one sector refresh, back to back
+    started = time.perf_counter()
+    for ticker in tech:
+        get(smart_lab_url(ticker)).raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    http_client.get(smart_lab_url(tech[0]))  # warm the pool, as a running server would have it
+    print(f"{len(tech)} smart-lab requests, http2={http_client.HTTP2}")
+    print(f"{'client':>15} {'best, ms':>9} {'per request, ms':>16}")
+    for name, get in [("requests.get", lambda url: requests.get(url, timeout=15)), ("shared client", http_client.get)]:
+        best = min(fetch_sector(get) for _ in range(REPEATS))
+        print(f"{name:>15} {best * 1000:>9.0f} {best * 1000 / len(tech):>16.0f}")
+    http_client.close()
+
+
+if __name__ == "__main__":
+    main()
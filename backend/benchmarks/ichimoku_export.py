@@ -0,0 +1,72 @@
+# run from backend
+# PYTHONPATH=. python -m benchmarks.ichimoku_export
+"""Compares the legacy row-by-row Ichimoku export with the vectorized IchimokuApi.export_nan."""
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from services.ichimoku.ichimoku_api import IchimokuApi
+
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 3
+
+
+def export_nan_rows(df: DataFrame) -> list:
+    """Previous implementation of IchimokuApi.export_nan (iterrows + pd.isna per cell)."""
+    result = []
+    for _, row in df.iterrows():
+        unix_time = int(row["time"].timestamp())
+        if row.isna().all():
+            result.append({"time": unix_time})
+        else:
+            data_dict = {"time": unix_time}
+            for col in df.columns:
+                if col != "time" and not pd.isna(row[col]):
+                    data_dict[col] = row[col]
+            result.append(data_dict)
+    return result
+
+
+def make_frame(api: IchimokuApi, size: int) -> DataFrame:
+    rng = np.random.default_rng(size)
+    close = 100 + rng.normal(0, 1, size).cumsum()
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    df = DataFrame(
+        {
+            "time": [start + timedelta(minutes=10 * i) for i in range(size)],
+            "open": close + rng.normal(0, 0.5, size),
+            "close": close,
+            "high": close + rng.random(size),
+            "low": close - rng.random(size),
+            "volume": rng.integers(0, 10_000, size),
+        }
+    )
+    return api.get_ichimoku(df)
+
+
+def best_of(func, df: DataFrame) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    api = IchimokuApi(ticker="BENCH", period="Y")
+    print(f"{'candles':>8} {'rows, s':>10} {'vectorized, s':>14} {'speedup':>8}  identical")
+    for size in SIZES:
+        df = make_frame(api, size)
+        old_time, old_result = best_of(export_nan_rows, df)
+        new_time, new_result = best_of(api.export_nan, df)
+        identical = json.dumps(old_result) == json.dumps(new_result)
+        print(f"{size:>8} {old_time:>10.3f} {new_time:>14.3f} {old_time / new_time:>7.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
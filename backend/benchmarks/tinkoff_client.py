@@ -0,0 +1,45 @@
+# run from backend, needs INVEST_TOKEN
+# PYTHONPATH=. python -m benchmarks.tinkoff_client
+"""Latency of a T-api call on a new channel (with Client(TOKEN) per call) against the shared, already open channel."""
+import asyncio
+import time
+
+from tinkoff.invest import Client
+
+from services.tinkoff_client import TinkoffClient, TOKEN
+
+FIGI = "BBG004730N88"  # SBER
+REPEATS = 10
+
+
+def last_price(client) -> None:
+    client.market_data.get_last_prices(figi=[FIGI])
+
+
+def cold() -> float:
+    started = time.perf_counter()
+    with Client(TOKEN) as client:
+        last_price(client)
+    return time.perf_counter() - started
+
+
+def warm(shared: TinkoffClient) -> float:
+    started = time.perf_counter()
+    with shared.services() as client:
+        last_price(client)
+    return time.perf_counter() - started
+
+
+def main():
+    shared = TinkoffClient()
+    with shared.services() as client:
+        last_price(client)  # opened at startup in the app
+    print(f"{'channel':>7} {'best, ms':>9} {'median, ms':>11}")
+    for name, call in [("cold", cold), ("warm", lambda: warm(shared))]:
+        times = sorted(call() for _ in range(REPEATS))
+        print(f"{name:>7} {times[0] * 1000:>9.1f} {times[len(times) // 2] * 1000:>11.1f}")
+    asyncio.run(shared.close())
+
+
+if __name__ == "__main__":
+    main()
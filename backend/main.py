@@ -1,31 +1,75 @@
 import logging
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 import json
 import asyncio
 
 from services.pe.pe_db_manager import PeDBManager
 from services.imoex_change import get_imoex_quote
-from services.share_price import get_realtime_quote
+from services.share_price import get_realtime_quote, get_realtime_quotes
+from services.quote_stream import quote_hub, quote_events
 from services.paper_data.ticker_table_db import TickerTableDBManager
 from services.cbr_currency import Currency
 from services.gdp import GdpData, ImoexData
 from services.paper_data.total_tickers import tech, retail, banks, build, oil, sectors, sectors_companies
 from services.multiplicators.multiplicators_db import MultiplicatorsDBManager
+from services.multiplicators.screener import screen
+from services.presenter import present
 from services.dividends.dividends_db import DividendsDBManager
 from services.paper_data.paper_data_db import PaperDataDBManager
-from services.ichimoku.ichimoku_func import ichimoku_index_data
+from services.ichimoku.ichimoku_func import ichimoku_index_data, ichimoku_batch_data
+from services.ichimoku.ichimoku_stream import ichimoku_hub
+from services.ichimoku.ichimoku_scanner import ichimoku_scan
+from services.ichimoku.ichimoku_api import interval_type
+from services.ichimoku.ichimoku_engine import check_window
+from services.ichimoku.downsample import MIN_POINTS
+from services.cache_janitor import cache_janitor
+from services import http_client
+from services.tinkoff_client import tinkoff_client
 from services.cbr_keyrate import KeyRate
 from services.cbr_parse_infl import InflTable
+from models.models import Window
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 db_manager = TickerTableDBManager()  # ticker-figi-uid table
+MAX_BATCH_TICKERS = 50
+MAX_SCANNER_LIMIT = 500  # signals per scanner response
 
-app = FastAPI()
+
+def resolve_tickers(tickers: str | None, sector: str | None) -> list:
+    """Ticker list of batch endpoints: comma-separated tickers or all companies of a sector"""
+    if sector is not None:
+        if sector not in sectors_companies:
+            raise HTTPException(status_code=404, detail="Sector not found")
+        ticker_list = sectors_companies[sector]
+    elif tickers:
+        ticker_list = [ticker.strip() for ticker in tickers.split(",") if ticker.strip()]
+    else:
+        raise HTTPException(status_code=400, detail="Pass tickers or sector")
+    if len(ticker_list) > MAX_BATCH_TICKERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TICKERS} tickers per request")
+    return ticker_list
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await tinkoff_client.start()
+    cache_janitor.start()
+    yield
+    await cache_janitor.stop()
+    await ichimoku_hub.close()
+    await quote_hub.close()
+    http_client.close()
+    await tinkoff_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -35,10 +79,73 @@ async def root():
 
 
 @app.get("/api/index_ichimoku/{ticker}/{period}", response_model=dict)
-async def get_all_candles_for_ichimoku_by_period(ticker: str, period: str) -> dict:
+async def get_all_candles_for_ichimoku_by_period(ticker: str, period: str, max_points: int | None = None) -> dict:
+    """max_points: downsample the chart to at most this many candles (at least 3), the whole chart if not set"""
     logger.debug(f"Fetching all candles by ticker: {ticker} for period: {period}")
+    if max_points is not None and max_points < MIN_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points must be at least {MIN_POINTS}")
+
+    return await ichimoku_index_data(ticker, period, max_points)
 
-    return ichimoku_index_data(ticker, period)
+
+@app.get("/api/index_ichimoku_batch/{period}", response_model=dict)
+async def get_ichimoku_batch(period: str, tickers: str | None = None, sector: str | None = None) -> dict:
+    """
+    Ichimoku of several tickers in one round trip: ?tickers=SBER,GAZP or ?sector=banks
+    {"data": {"SBER": {"data": [...]}, ...}, "errors": [tickers that could not be loaded]}
+    """
+    ticker_list = resolve_tickers(tickers, sector)
+    logger.debug(f"Fetching ichimoku of {ticker_list} for period: {period}")
+
+    return await ichimoku_batch_data(ticker_list, period)
+
+
+@app.get("/api/ichimoku_scanner/{period}", response_model=dict)
+async def get_ichimoku_scanner(period: str, limit: int = Query(50, ge=1, le=MAX_SCANNER_LIMIT)) -> dict:
+    """
+    Tickers with ichimoku signals on the last candle, strongest first (+1 bullish, -1 bearish, 0 none):
+    {"signals": [{"ticker": "SBER", "close": 300.5, "tkCross": 1, "cloudBreak": 0, "chikou": 1, "score": 2}, ...]}
+    """
+    if period not in interval_type:
+        raise HTTPException(status_code=404, detail="Period not found")
+    try:
+        signals = await ichimoku_scan(period)
+    except Exception as e:
+        logger.error(f"Error scanning ichimoku signals: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error. Can't scan ichimoku signals")
+    return {"signals": signals[:limit]}
+
+
+@app.websocket("/ws/index_ichimoku/{ticker}/{period}")
+async def watch_ichimoku(websocket: WebSocket, ticker: str, period: str, small: int = Query(9, ge=1), medium: int = Query(26, ge=1), large: int = Query(52, ge=1)):
+    """
+    Live updates of the ichimoku chart, one message per candle update:
+    {"ticker": "SBER", "data": [{"time": ..., "chikouSpan": ...}, {"time": ..., "open": ..., "tenkanSen": ..., ...}]}
+    Unknown ticker or period and an invalid window close the connection with the policy violation code 1008.
+    """
+    window = Window(small=small, medium=medium, large=large)
+    try:
+        check_window(window)
+        await ichimoku_hub.resolve(ticker, period)
+    except ValueError as e:
+        logger.debug(f"Ichimoku watcher rejected: {e}")
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    disconnected = asyncio.create_task(websocket.receive_text())
+    try:
+        async with ichimoku_hub.watch(ticker, period, window) as updates:
+            while True:
+                update = asyncio.create_task(updates.get())
+                await asyncio.wait({update, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    update.cancel()
+                    break
+                await websocket.send_json(update.result())
+    except WebSocketDisconnect:
+        logger.debug(f"Ichimoku watcher for {ticker} disconnected")
+    finally:
+        disconnected.cancel()
 
 
 @app.get("/api/key_rate/{period}", response_model=dict)
@@ -75,27 +182,55 @@ async def get_paper_main_data(ticker: str) -> dict:
 
 
 @app.get("/api/dividend_data/{ticker}", response_model=dict)
-async def get_dividends(ticker: str) -> dict:
+async def get_dividends(ticker: str, raw: bool = False) -> dict:
+    """?raw=1 – числа без форматирования и единиц"""
     try:
         db_manager = DividendsDBManager()
         data = await run_in_threadpool(db_manager.update_cache, ticker)
-        return {"dividends": data}
+        return {"dividends": data if raw else present(data)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/multiplicators_data/{ticker}", response_model=dict)
-async def get_multiplicators_data(ticker: str) -> dict:
+async def get_multiplicators_data(ticker: str, raw: bool = False) -> dict:
+    """?raw=1 – числа без форматирования и единиц"""
     try:
         db_manager = MultiplicatorsDBManager()
         data = await run_in_threadpool(db_manager.update_cache, ticker)
         logger.debug(f"{data}")
         logger.debug(f"{type(data)}")
-        return {"multiplicators": data}
+        return {"multiplicators": data if raw else present(data)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/screener/", response_model=dict)
+async def get_screener(filter: str | None = None, sort: str | None = None, limit: int | None = None, fields: str | None = None) -> dict:
+    """
+    Скринер по мультипликаторам всех тикеров: ?filter=pe_ratio_ttm<5,roe>20&sort=-roe&limit=10&fields=pe_ratio_ttm,roe
+    {
+      "total": число подходящих тикеров,
+      "rows": [{"ticker": "SBER", "pe_ratio_ttm": 4.2, "roe": 22.5}, ...]
+    }
+    """
+    try:
+        snapshot = await run_in_threadpool(MultiplicatorsDBManager().get_snapshot)
+    except Exception as e:
+        logger.error(f"Error loading fundamentals snapshot: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error. Can't get fundamentals")
+    try:
+        return screen(snapshot, filter=filter, sort=sort, limit=limit, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/cache_janitor/", response_model=dict)
+async def get_cache_janitor_metrics() -> dict:
+    """Runs, errors and deleted rows per cache table of the background cache janitor"""
+    return cache_janitor.metrics
+
+
 @app.get("/api/sectors/", response_model=dict)
 async def get_sectors() -> dict:
     return {"sectors": sectors_companies}
@@ -152,6 +287,35 @@ async def get_share_price(ticker: str) -> dict:
     return data
 
 
+@app.get("/api/share_prices/", response_model=dict)
+async def get_share_prices(tickers: str | None = None, sector: str | None = None) -> dict:
+    """
+    Котировки нескольких акций одним запросом: ?tickers=SBER,GAZP или ?sector=banks
+    {
+      "prices": {"SBER": {"price": ..., "abs_change": ..., "percent_change": ...}, ...},
+      "missing": тикеры без котировки
+    }
+    """
+    ticker_list = resolve_tickers(tickers, sector)
+    try:
+        prices = await run_in_threadpool(get_realtime_quotes, ticker_list)
+    except Exception as e:
+        logger.error(f"Error fetching share prices: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error. Can't get share prices")
+    return {"prices": prices, "missing": [ticker for ticker in ticker_list if ticker not in prices]}
+
+
+@app.get("/api/quotes/stream")
+async def stream_quotes():
+    """
+    Server-Sent Events: котировки all_tickers и IMOEX.
+    Событие `quote` с data {"ticker", "price", "abs_change", "percent_change"} (ticker "IMOEX" для индекса).
+    Медленный клиент получает только последнюю котировку по каждому тикеру.
+    """
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(quote_events(quote_hub), media_type="text/event-stream", headers=headers)
+
+
 @app.get("/api/imoex_change/", response_model=dict)
 async def get_imoex_data() -> dict:
     """
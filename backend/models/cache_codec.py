@@ -0,0 +1,121 @@
+# serialization + compression of cache blobs (the data columns of *Cache tables)
+import json
+import os
+import zlib
+from datetime import date
+from typing import Any
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def encode_default(value: Any) -> str:
+    """Dates are stored as str(value), like the json.dumps(default=str) caches did; any other type is an error"""
+    if isinstance(value, date):
+        return str(value)
+    raise TypeError(f"Can't store {type(value).__name__} in the cache: {value!r}")
+
+
+def json_dumps(data: Any) -> bytes:
+    return json.dumps(data, default=encode_default, separators=(",", ":")).encode()
+
+
+def msgpack_dumps(data: Any) -> bytes:
+    return msgpack.packb(data, default=encode_default)
+
+
+def msgpack_loads(blob: bytes) -> Any:
+    return msgpack.unpackb(blob, strict_map_key=False)
+
+
+def zstd_compress(blob: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(blob)
+
+
+def zstd_decompress(blob: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(blob)
+
+
+class Codec:
+    """Serializer + compressor, blobs start with the header byte of their codec"""
+
+    def __init__(self, name: str, header: int, dumps, loads, compress, decompress):
+        self.name = name
+        self.header = bytes([header])
+        self.dumps, self.loads = dumps, loads
+        self.compress, self.decompress = compress, decompress
+
+    def encode(self, data: Any) -> bytes:
+        return self.header + self.compress(self.dumps(data))
+
+    def decode(self, blob: bytes) -> Any:
+        return self.loads(self.decompress(blob[1:]))
+
+
+# header bytes are below any printable char, so they never clash with legacy json text
+codecs = {
+    "json+zlib": Codec("json+zlib", 0x01, json_dumps, json.loads, lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress),
+    "json+zstd": Codec("json+zstd", 0x02, json_dumps, json.loads, zstd_compress, zstd_decompress),
+    "msgpack+zlib": Codec("msgpack+zlib", 0x03, msgpack_dumps, msgpack_loads, lambda b: zlib.compress(b, ZLIB_LEVEL), zlib.decompress),
+    "msgpack+zstd": Codec("msgpack+zstd", 0x04, msgpack_dumps, msgpack_loads, zstd_compress, zstd_decompress),
+}
+codecs_by_header = {codec.header[0]: codec for codec in codecs.values()}
+
+
+def available_codecs() -> list[str]:
+    return [
+        name for name in codecs
+        if (msgpack is not None or not name.startswith("msgpack")) and (zstandard is not None or not name.endswith("zstd"))
+    ]
+
+
+def default_codec() -> Codec:
+    """CACHE_CODEC from the env, else the most compact installed one"""
+    name = os.getenv("CACHE_CODEC")
+    if name:
+        if name not in available_codecs():
+            raise ValueError(f"Cache codec {name} is unknown or its package is not installed")
+        return codecs[name]
+    return codecs[available_codecs()[-1]]
+
+
+CACHE_CODEC = default_codec()
+
+
+def encode_cache(data: Any) -> bytes:
+    return CACHE_CODEC.encode(data)
+
+
+def decode_cache(blob: str | bytes) -> Any:
+    """Decodes a blob of any codec, legacy rows hold plain json text"""
+    if isinstance(blob, str):
+        return json.loads(blob)
+    codec = codecs_by_header.get(blob[0]) if blob else None
+    if codec is None:
+        return json.loads(blob)
+    return codec.decode(blob)
+
+
+class CacheBlob(TypeDecorator):
+    """Binary cache column that still accepts json text (legacy rows are read back as str)"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return value.encode()
+        return value
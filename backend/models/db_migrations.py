@@ -0,0 +1,69 @@
+# python -m models.db_migrations
+"""One-off migrations of rows written by older versions, safe to run more than once."""
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.sqlite import insert
+
+from models.cache_codec import encode_cache, decode_cache
+from models.db_model import engine, IchimokuIndexCache, PaperDataCache, DividendsCache, MultiplicatorsCache, PECache, SectorPECache, TickerTable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEGACY_TICKER_TABLE = "uid_figi_ticker_table"  # ticker + json blob (sometimes a json string of json)
+TICKER_FIELDS = ["figi", "uid", "isin", "currency", "class_code"]
+CACHE_TABLES = [IchimokuIndexCache, PaperDataCache, DividendsCache, MultiplicatorsCache, PECache, SectorPECache]
+BATCH_SIZE = 200
+
+
+def migrate_cache_blobs(bind=engine) -> int:
+    """Re-encodes json text rows of the cache tables with the cache codec, returns the number of migrated rows"""
+    migrated = 0
+    for table in CACHE_TABLES:
+        name = table.__tablename__
+        with bind.begin() as connection:
+            while True:
+                rows = connection.execute(text(f"SELECT rowid, data FROM {name} WHERE typeof(data) = 'text' LIMIT :limit"), {"limit": BATCH_SIZE}).all()
+                if not rows:
+                    break
+                connection.execute(
+                    text(f"UPDATE {name} SET data = :data WHERE rowid = :rowid"),
+                    [{"rowid": rowid, "data": encode_cache(decode_cache(data))} for rowid, data in rows],
+                )
+                migrated += len(rows)
+        logger.info(f"migrate_cache_blobs: {name} done")
+    return migrated
+
+
+def migrate_ticker_table(bind=engine) -> int:
+    """
+    Copies uid_figi_ticker_table blobs into the typed TickerTable, returns the number of copied rows.
+    Tickers already in TickerTable and rows clashing with their figi/uid/isin are skipped. The old table is kept.
+    """
+    if not inspect(bind).has_table(LEGACY_TICKER_TABLE):
+        return 0
+    with bind.begin() as connection:
+        rows = []
+        for ticker, data, timestamp in connection.execute(text(f"SELECT ticker, data, timestamp FROM {LEGACY_TICKER_TABLE}")):
+            record = json.loads(data)
+            if isinstance(record, str):
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                continue
+            # raw sqlite rows hold timestamps as text
+            timestamp = datetime.fromisoformat(timestamp) if isinstance(timestamp, str) else timestamp
+            rows.append({"ticker": ticker, **{field: record.get(field) or None for field in TICKER_FIELDS}, "timestamp": timestamp})
+        copied = 0
+        for row in rows:
+            copied += connection.execute(insert(TickerTable).values(row).on_conflict_do_nothing()).rowcount
+    logger.info(f"migrate_ticker_table: copied {copied} of {len(rows)} tickers")
+    return copied
+
+
+if __name__ == "__main__":
+    migrate_ticker_table()
+    count = migrate_cache_blobs()
+    logger.info(f"Migrated {count} cache rows, run VACUUM to give the freed pages back")
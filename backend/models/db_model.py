@@ -1,10 +1,12 @@
 # python -m models.db_model
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, create_engine, Enum, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, create_engine, Enum, UniqueConstraint
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime
 import enum
 import os
 
+from .cache_codec import CacheBlob  # relative: the package is also imported as backend.models
+
 Base = declarative_base()
 
 
@@ -42,35 +44,55 @@ class IchimokuIndexCache(Base):
     __tablename__ = "ichimoku_index_cache"
     ticker = Column(String, primary_key=True)
     period = Column(String, primary_key=True)
-    data = Column(Text)
+    data = Column(CacheBlob)
     timestamp = Column(DateTime, default=datetime.now())
 
 
+class IchimokuCandles(Base):
+    """Raw candles from T-api, stored per (figi, interval) so refreshes only fetch the missing tail"""
+
+    __tablename__ = "ichimoku_candles"
+    figi = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    time = Column(DateTime, primary_key=True)  # UTC, naive
+    open = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    volume = Column(Integer, nullable=False)
+
+
 class PaperDataCache(Base):
     __tablename__ = "paper_data_cache"
     ticker = Column(String, primary_key=True)
-    data = Column(Text, nullable=False)
+    data = Column(CacheBlob, nullable=False)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
 class TickerTable(Base):
-    __tablename__ = "uid_figi_ticker_table"
+    """Instrument directory: ticker-figi-uid-isin of shares (uid is the asset uid). Replaces uid_figi_ticker_table json blobs."""
+
+    __tablename__ = "ticker_table"
     ticker = Column(String, primary_key=True)
-    data = Column(Text, nullable=False)
+    figi = Column(String, unique=True, index=True)
+    uid = Column(String, unique=True, index=True)
+    isin = Column(String, unique=True, index=True)
+    currency = Column(String)
+    class_code = Column(String)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
 class DividendsCache(Base):
     __tablename__ = "dividends_cache"
     ticker = Column(String, primary_key=True)
-    data = Column(Text, nullable=False)
+    data = Column(CacheBlob, nullable=False)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
 class MultiplicatorsCache(Base):
     __tablename__ = "multiplicators_cache"
     ticker = Column(String, primary_key=True, index=True)
-    data = Column(Text, nullable=False)
+    data = Column(CacheBlob, nullable=False)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
@@ -88,14 +110,14 @@ class CurrencyRates(Base):
 class PECache(Base):
     __tablename__ = "pe_cache"
     ticker = Column(String, primary_key=True)
-    data = Column(Text, nullable=False)
+    data = Column(CacheBlob, nullable=False)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
 class SectorPECache(Base):
     __tablename__ = "sector_pe_cache"
     sector = Column(String, primary_key=True)
-    data = Column(Text, nullable=False)
+    data = Column(CacheBlob, nullable=False)
     timestamp = Column(DateTime, default=datetime.now, nullable=False)
 
 
@@ -18,6 +18,11 @@ def convert_quotation(q: Quotation):
     return float(res)
 
 
+def convert_datetime(value):
+    # dates are cached and returned as ISO 8601 strings, the same on a cache hit and a miss
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
 class MoneyValue(BaseModel):
     currency: str
     units: int
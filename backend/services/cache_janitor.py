@@ -0,0 +1,95 @@
+# periodic sweep of outdated cache rows, so request paths only read the cache tables
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.dividends.dividends_db import DividendsDBManager
+from services.ichimoku.ichimoku_api import timedelta_type
+from services.ichimoku.ichimoku_db import IchimokuDbManager
+from services.multiplicators.multiplicators_db import MultiplicatorsDBManager
+from services.paper_data.paper_data_db import PaperDataDBManager
+from services.paper_data.ticker_table_db import TickerTableDBManager
+from services.pe.pe_db_manager import PeDBManager
+
+logger = logging.getLogger(__name__)
+
+JANITOR_INTERVAL = float(os.getenv("CACHE_JANITOR_INTERVAL", 3600))  # seconds between sweeps
+
+
+def default_sweeps() -> dict[str, Callable[[], int]]:
+    """clear_outdated_cache of every cache manager by table name, each returns the number of deleted rows"""
+    sweeps = {
+        "ticker_table": TickerTableDBManager().clear_outdated_cache,
+        "paper_data_cache": PaperDataDBManager().clear_outdated_cache,
+        "multiplicators_cache": MultiplicatorsDBManager().clear_outdated_cache,
+        "dividends_cache": DividendsDBManager().clear_outdated_cache,
+        "pe_cache": PeDBManager().clear_outdated_cache,
+    }
+    # ichimoku entries have a staleness limit per period
+    for period in timedelta_type:
+        sweeps[f"ichimoku_index_cache:{period}"] = IchimokuDbManager(ticker="", period=period).clear_outdated_cache
+    return sweeps
+
+
+class CacheJanitor:
+    """
+    Runs every sweep once per interval in the threadpool.
+    metrics: runs, errors, rows deleted per table (total and in the last run), last run time and duration.
+    """
+
+    def __init__(self, sweeps: dict[str, Callable[[], int]] | None = None, interval: float = JANITOR_INTERVAL):
+        self._sweeps = sweeps  # built on the first sweep, default_sweeps() if None
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self.metrics = {"runs": 0, "errors": 0, "last_run": None, "last_duration": None, "deleted": {}, "last_deleted": {}}
+
+    @property
+    def sweeps(self) -> dict[str, Callable[[], int]]:
+        if self._sweeps is None:
+            self._sweeps = default_sweeps()
+        return self._sweeps
+
+    def sweep(self) -> dict[str, int]:
+        """Runs all sweeps once, a failing sweep doesn't stop the others. Returns deleted rows per table."""
+        started = time.perf_counter()
+        deleted = {}
+        for name, clear in self.sweeps.items():
+            try:
+                deleted[name] = clear() or 0
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.error(f"Cache janitor: sweeping {name} failed: {e}")
+        for name, count in deleted.items():
+            self.metrics["deleted"][name] = self.metrics["deleted"].get(name, 0) + count
+        self.metrics["last_deleted"] = deleted
+        self.metrics["runs"] += 1
+        self.metrics["last_run"] = datetime.now().isoformat(timespec="seconds")
+        self.metrics["last_duration"] = round(time.perf_counter() - started, 4)
+        logger.info(f"Cache janitor: deleted {sum(deleted.values())} rows in {self.metrics['last_duration']}s")
+        return deleted
+
+    async def run(self) -> None:
+        while True:
+            await run_in_threadpool(self.sweep)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+cache_janitor = CacheJanitor()
@@ -1,6 +1,6 @@
 # python -m services.cbr_currency
 from pydantic import BaseModel
-import requests
+from services import http_client
 import xml.etree.ElementTree as ET
 from datetime import date, datetime
 from models.db_model import CurrencyRates, SessionLocal
@@ -16,7 +16,7 @@ class Currency(BaseModel):
         """
         today_str = date.today().strftime("%d/%m/%Y")
         url = f"{self.URL}?date_req={today_str}"
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
         return response.text
 
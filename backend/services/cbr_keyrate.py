@@ -1,5 +1,5 @@
 # python -m services.cbr_keyrate
-import requests
+from services import http_client
 import xml.etree.ElementTree as ET
 import json
 import datetime
@@ -96,7 +96,7 @@ class KeyRate(BaseModel):
             "SOAPAction": "http://web.cbr.ru/KeyRate",
         }
 
-        response = requests.post(url, data=SOAPEnvelope, headers=headers)
+        response = http_client.post(url, content=SOAPEnvelope, headers=headers)
         data = []
 
         if response.status_code == 200:
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-import requests
+from services import http_client
 from bs4 import BeautifulSoup
 import logging
 from sqlalchemy.orm import Session
@@ -31,7 +31,7 @@ class InflTable:
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
         }
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         if response.status_code != 200:
             raise ConnectionError(f"Failed to fetch data. Status code: {response.status_code}")
         soup = BeautifulSoup(response.content, "html.parser")
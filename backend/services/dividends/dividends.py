@@ -2,12 +2,13 @@
 import os
 from datetime import datetime, timedelta
 from google.protobuf.timestamp_pb2 import Timestamp
-from tinkoff.invest import Client
 from tinkoff.invest.schemas import GetDividendsRequest
 import json
 from dotenv import load_dotenv
 
-from models.models import Quotation, convert_quotation
+from models.models import Quotation, convert_quotation, convert_datetime
+from services.tinkoff_client import tinkoff_client
+from services.presenter import present
 from ..paper_data.ticker_table_db import TickerTableDBManager
 from ..multiplicators.multiplicators import Multiplicators
 
@@ -16,11 +17,25 @@ TOKEN = os.environ["INVEST_TOKEN"]
 
 db_manager = TickerTableDBManager()
 
+DIVIDEND_FIELDS = [
+    "dividend_net",
+    "yield_value",
+    "close_price",
+    "payment_date",
+    "declared_date",
+    "last_buy_date",
+    "record_date",
+    "dividend_type",
+    "regularity",
+    "created_at",
+]
+MONEY_FIELDS = ["dividend_net", "yield_value", "close_price"]  # хранятся как float
+
 
 def get_dividend_data_by_ticker(ticker: str) -> dict:
     """Get dividend data for 1 year from today"""
     dividend_data = []
-    with Client(TOKEN) as client:
+    with tinkoff_client.services() as client:
         result = {}
         from_date = datetime.strptime((datetime.now() - timedelta(days=365)).strftime("%d-%m-%Y"), "%d-%m-%Y")
         to_date = datetime.strptime(datetime.now().strftime("%d-%m-%Y"), "%d-%m-%Y")
@@ -46,59 +61,49 @@ def get_dividend_data_by_ticker(ticker: str) -> dict:
     return dividend_data[0]
 
 
-def get_extended_dividend_data_by_ticker(ticker: str) -> dict:
+def get_raw_extended_dividend_data_by_ticker(ticker: str) -> dict:
     """
-    приводит get_dividend_data_by_ticker() к формату
+    get_dividend_data_by_ticker() вместе с дивидендными полями мультипликаторов, без форматирования (даты в ISO 8601):
     {
-    "dividend_yield_daily_ttm": {
-        "value": "10.49",
-        "unit": "%"
-        },
-    "payment_date": {
-        "value": "2024-07-21 00:00:00+00:00",
-        "unit": ""
-        },
+    "dividend_net": 10.5,
+    "payment_date": "2024-07-21T00:00:00+00:00",
+    "five_years_average_dividend_yield": 8.75,
     }
     """
     div_data: dict = get_dividend_data_by_ticker(ticker)
-    multip_data: dict = Multiplicators().get_divs_from_multiplicator_data_from_api(ticker)
+    multip_data: dict = Multiplicators().get_raw_divs_from_multiplicator_data_from_api(ticker)
 
-    formatted_divs = dict()
+    raw_divs = dict()
     if div_data:
-        field_units = {
-            "dividend_net": ("руб", 1),
-            "yield_value": ("%", 1),
-            "close_price": ("руб", 1),
-            "payment_date": ("", 1),
-            "declared_date": ("", 1),
-            "last_buy_date": ("", 1),
-            "record_date": ("", 1),
-            "dividend_type": ("", 1),
-            "regularity": ("", 1),
-            "created_at": ("", 1),
-        }
         for field, value in div_data.items():
-            if field in field_units:
-                unit, divisor = field_units[field]
-
-                if field in ["dividend_net", "yield_value", "close_price"]:
-                    formatted_value = f"{float(value):.2f}"
-                else:
-                    formatted_value = str(value)
-
-                formatted_divs[field] = {
-                    "value": formatted_value,
-                    "unit": unit,
-                }
+            if field in DIVIDEND_FIELDS:
+                raw_divs[field] = float(value) if field in MONEY_FIELDS and value is not None else convert_datetime(value)
 
     # объединение данные, если мультипликаторы не пустые
     if multip_data and isinstance(multip_data, dict):
         # объединение словарей с приоритетом данных из API (если они есть)
         for key, value in multip_data.items():
-            if key not in formatted_divs:
-                formatted_divs[key] = value
+            if key not in raw_divs:
+                raw_divs[key] = value
+
+    return raw_divs
+
 
-    return formatted_divs
+def get_extended_dividend_data_by_ticker(ticker: str) -> dict:
+    """
+    приводит get_raw_extended_dividend_data_by_ticker() к формату ответа (services.presenter)
+    {
+    "dividend_yield_daily_ttm": {
+        "value": "10.49",
+        "unit": "%"
+        },
+    "payment_date": {
+        "value": "2024-07-21T00:00:00+00:00",
+        "unit": ""
+        },
+    }
+    """
+    return present(get_raw_extended_dividend_data_by_ticker(ticker))
 
 
 # print(get_dividend_data_by_ticker("SVCB"))
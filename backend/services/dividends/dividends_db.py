@@ -1,15 +1,17 @@
 # python -m services.dividends.dividends_db
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import json
 
 from models.db_model import SessionLocal, DividendsCache
-from services.dividends.dividends import get_extended_dividend_data_by_ticker
+from models.cache_codec import encode_cache, decode_cache
+from services.dividends.dividends import get_raw_extended_dividend_data_by_ticker
+from services.presenter import is_presented
 
 
 class DividendsDBManager(BaseModel):
     """
     Класс для управления сохранением и обновлением кэша данных по дивидендам.
+    В кэше хранятся сырые значения, форматирование – в services.presenter.
 
     При обращении проверяет, сохранены ли данные по дивидендам для указанного тикера,
     и если время с момента последнего обновления превышает один день, получает новые данные,
@@ -37,7 +39,9 @@ class DividendsDBManager(BaseModel):
             cache = session.query(DividendsCache).filter(DividendsCache.ticker == ticker).first()
             # если найден кэш и его возраст меньше cache_duration (90 дней)
             if cache and (datetime.now() - cache.timestamp) < self.cache_duration:
-                return json.loads(cache.data)
+                data = decode_cache(cache.data)
+                # строки, сохранённые уже отформатированными, обновляются
+                return None if is_presented(data) else data
             return None
         finally:
             session.close()
@@ -46,12 +50,12 @@ class DividendsDBManager(BaseModel):
         """
         Сохраняет данные по дивидендам для указанного тикера в кэше.
 
-        Данные сериализуются в формате JSON, а также сохраняется текущее время обновления.
+        Данные сериализуются кодеком кэша (encode_cache), а также сохраняется текущее время обновления.
         """
         session = self.get_session()
         try:
             cache = DividendsCache(
-                ticker=ticker, data=json.dumps(data, default=str), timestamp=datetime.now()  # default=str преобразует datetime в строку
+                ticker=ticker, data=encode_cache(data), timestamp=datetime.now()  # datetime сохраняется строкой
             )
             session.merge(cache)
             session.commit()
@@ -65,17 +69,15 @@ class DividendsDBManager(BaseModel):
         Если кэш существует и данные обновлены менее одного дня назад, возвращает кэшированные данные.
         Иначе вызывается функция получения новых данных, результат сохраняется в кэш и возвращается.
         """
-        self.clear_outdated_cache()
-
         cached_data = self.get_cache(ticker)
         if cached_data is not None:
             return cached_data
 
-        new_data = get_extended_dividend_data_by_ticker(ticker=ticker)
+        new_data = get_raw_extended_dividend_data_by_ticker(ticker=ticker)
         self.save_cache(ticker, new_data)
         return new_data
 
-    def clear_outdated_cache(self) -> None:
+    def clear_outdated_cache(self) -> int:
         """
         Удаляет устаревшие записи кэша из базы данных.
 
@@ -84,8 +86,9 @@ class DividendsDBManager(BaseModel):
         session = self.get_session()
         try:
             outdated_time = datetime.now() - self.cache_duration
-            session.query(DividendsCache).filter(DividendsCache.timestamp < outdated_time).delete()
+            rows_deleted = session.query(DividendsCache).filter(DividendsCache.timestamp < outdated_time).delete()
             session.commit()
+            return rows_deleted
         finally:
             session.close()
 
@@ -0,0 +1,44 @@
+# process-wide HTTP client for CBR, MOEX ISS and smart-lab: pooled keep-alive connections per host,
+# HTTP/2 when h2 is installed and the host negotiates it, default timeouts, gzip responses
+import importlib.util
+import logging
+import threading
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60)
+HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+_client: httpx.Client | None = None
+_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """The shared client, created on first use (and again after close())"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(http2=HTTP2, timeout=TIMEOUT, limits=LIMITS, headers=HEADERS, follow_redirects=True)
+                logger.debug(f"HTTP client created, http2={HTTP2}")
+    return _client
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return get_client().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return get_client().post(url, **kwargs)
+
+
+def close() -> None:
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
@@ -0,0 +1,108 @@
+# CRUD for raw candles used by the ichimoku calculation
+import logging
+from datetime import datetime, timezone
+
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models.db_model import SessionLocal, IchimokuCandles
+
+logger = logging.getLogger(__name__)
+
+CANDLE_FIELDS = ["open", "close", "high", "low", "volume"]
+UPSERT_CHUNK = 500  # keeps the statement below sqlite's bound parameters limit
+
+
+def to_db_time(time: datetime) -> datetime:
+    # candles from T-api are tz-aware (UTC), sqlite stores naive datetimes
+    if time.tzinfo is not None:
+        time = time.astimezone(timezone.utc).replace(tzinfo=None)
+    return time
+
+
+def from_db_time(time: datetime) -> datetime:
+    return time.replace(tzinfo=timezone.utc)
+
+
+class CandlesDbManager(BaseModel):
+    """
+    Stores raw candles per (figi, interval).
+    Remembers the last stored candle, so IchimokuApi asks T-api only for candles after it.
+    """
+
+    figi: str
+    interval: str
+
+    def get_session(self):
+        return SessionLocal()
+
+    def get_last_time(self) -> datetime | None:
+        session = self.get_session()
+        try:
+            last_time = (
+                session.query(func.max(IchimokuCandles.time)).filter_by(figi=self.figi, interval=self.interval).scalar()
+            )
+            return from_db_time(last_time) if last_time else None
+        finally:
+            session.close()
+
+    def get_candles(self, from_: datetime) -> list:
+        """Returns candles (as make_candle dicts) starting from from_, sorted by time"""
+        session = self.get_session()
+        try:
+            rows = (
+                session.query(IchimokuCandles)
+                .filter(
+                    IchimokuCandles.figi == self.figi,
+                    IchimokuCandles.interval == self.interval,
+                    IchimokuCandles.time >= to_db_time(from_),
+                )
+                .order_by(IchimokuCandles.time)
+                .all()
+            )
+            return [{"time": from_db_time(row.time), **{field: getattr(row, field) for field in CANDLE_FIELDS}} for row in rows]
+        finally:
+            session.close()
+
+    def save_candles(self, candles: list) -> None:
+        """Upserts candles in one transaction. The last stored candle may be incomplete, so it is overwritten."""
+        if not candles:
+            return
+        session = self.get_session()
+        try:
+            rows = [
+                {"figi": self.figi, "interval": self.interval, "time": to_db_time(candle["time"]), **{field: candle[field] for field in CANDLE_FIELDS}}
+                for candle in candles
+            ]
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                stmt = insert(IchimokuCandles).values(rows[start : start + UPSERT_CHUNK])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["figi", "interval", "time"],
+                    set_={field: getattr(stmt.excluded, field) for field in CANDLE_FIELDS},
+                )
+                session.execute(stmt)
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error saving candles: {e}")
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def clear_outdated_candles(self, before: datetime) -> None:
+        session = self.get_session()
+        try:
+            rows_deleted = (
+                session.query(IchimokuCandles)
+                .filter(
+                    IchimokuCandles.figi == self.figi,
+                    IchimokuCandles.interval == self.interval,
+                    IchimokuCandles.time < to_db_time(before),
+                )
+                .delete()
+            )
+            session.commit()
+            logger.debug(f"Cleared {rows_deleted} outdated candles for {self.figi} {self.interval}.")
+        finally:
+            session.close()
@@ -0,0 +1,49 @@
+# Largest-Triangle-Three-Buckets downsampling of exported chart rows
+import numpy as np
+
+MIN_POINTS = 3  # the first and the last rows are always kept
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points chosen by LTTB (Steinarsson, 2013).
+    Points between the first and the last are split into n_out - 2 buckets, every bucket keeps the point forming
+    the largest triangle with the point kept in the previous bucket and the average of the next bucket.
+    Areas of a bucket are computed at once, the loop only goes over buckets.
+    """
+    n = len(x)
+    if n_out >= n or n_out < MIN_POINTS:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # bucket i is edges[i]:edges[i + 1]
+    next_x = np.append(np.add.reduceat(x[1:-1], edges[:-1] - 1) / np.diff(edges), x[-1])
+    next_y = np.append(np.add.reduceat(y[1:-1], edges[:-1] - 1) / np.diff(edges), y[-1])
+
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        a = selected[bucket]
+        # the average of the next bucket, the last point for the last bucket
+        cx, cy = next_x[bucket + 1], next_y[bucket + 1]
+        areas = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        selected[bucket + 1] = start + int(np.argmax(areas))
+    return selected
+
+
+def downsample_rows(rows: list, max_points: int, value: str = "close") -> list:
+    """
+    Keeps at most max_points rows of the export_nan list, chosen by LTTB on the `value` column.
+    Rows are kept whole, so candles and ichimoku lines of a kept row stay consistent.
+    """
+    if len(rows) <= max_points:
+        return rows
+    x = np.fromiter((row["time"] for row in rows), dtype=float, count=len(rows))
+    y = np.fromiter((row.get(value, np.nan) for row in rows), dtype=float, count=len(rows))
+    # rows without the value (if any) are placed on the line of their neighbours
+    missing = np.isnan(y)
+    if missing.all():
+        return rows[:: -(-len(rows) // max_points)]
+    if missing.any():
+        y[missing] = np.interp(x[missing], x[~missing], y[~missing])
+    return [rows[i] for i in lttb_indices(x, y, max_points)]
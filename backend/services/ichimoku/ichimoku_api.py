@@ -1,8 +1,10 @@
 import os
 import json
+import numpy as np
 import pandas as pd
-from datetime import timedelta
-from tinkoff.invest import CandleInterval, Client
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from tinkoff.invest import CandleInterval
 from tinkoff.invest.utils import now
 from dotenv import load_dotenv
 import logging
@@ -10,7 +12,10 @@ from pandas import DataFrame
 from pydantic import BaseModel, Field, PrivateAttr
 
 from ..paper_data.ticker_table_db import TickerTableDBManager
+from .candles_db import CandlesDbManager, CANDLE_FIELDS
 from models.models import Quotation, factor, Window, Candle, convert_quotation
+from services.tinkoff_client import tinkoff_client
+from .ichimoku_engine import DEFAULT_WINDOW
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -38,13 +43,63 @@ interval_type = {
     "Y": CandleInterval.CANDLE_INTERVAL_DAY,
 }
 
+# resampling mode: one base candle stream per ticker, coarser intervals are built locally
+RESAMPLE_CANDLES = os.getenv("ICHIMOKU_RESAMPLE", "false").lower() in ("1", "true")
+
+resample_type = {
+    "D": (CandleInterval.CANDLE_INTERVAL_10_MIN, None),
+    "3D": (CandleInterval.CANDLE_INTERVAL_10_MIN, "30min"),
+    "W": (CandleInterval.CANDLE_INTERVAL_10_MIN, "1h"),
+    "M": (CandleInterval.CANDLE_INTERVAL_10_MIN, "4h"),
+    "3M": (CandleInterval.CANDLE_INTERVAL_DAY, None),
+    "Y": (CandleInterval.CANDLE_INTERVAL_DAY, None),
+}
+
+
+def get_candle_source(period: str) -> tuple[CandleInterval, str | None]:
+    """Returns the interval requested from T-api for the period and the resample rule (None if not resampled)"""
+    if RESAMPLE_CANDLES:
+        return resample_type[period]
+    return interval_type[period], None
+
+
+candle_timedelta = {
+    CandleInterval.CANDLE_INTERVAL_10_MIN: timedelta(minutes=10),
+    CandleInterval.CANDLE_INTERVAL_30_MIN: timedelta(minutes=30),
+    CandleInterval.CANDLE_INTERVAL_HOUR: timedelta(hours=1),
+    CandleInterval.CANDLE_INTERVAL_4_HOUR: timedelta(hours=4),
+    CandleInterval.CANDLE_INTERVAL_DAY: timedelta(days=1),
+}
+
+# candles the scanner needs on every period: large + medium + 1 of the default window
+SCAN_CANDLES = DEFAULT_WINDOW.large + DEFAULT_WINDOW.medium + 1
+
+
+def get_candles_span(period: str, count: int) -> timedelta:
+    """
+    Calendar time holding at least `count` candles of the period.
+    Candles only form in trading hours, so the span is doubled and extended by a long weekend.
+    """
+    interval, rule = get_candle_source(period)
+    candle = pd.Timedelta(rule).to_pytimedelta() if rule is not None else candle_timedelta[interval]
+    return 2 * count * candle + timedelta(days=4)
+
+
+def get_history_depth(interval: CandleInterval) -> timedelta:
+    # candles of one interval are shared by all periods using it, so keep the longest window (and enough for the scanner)
+    return max(
+        max(timedelta_type[period], get_candles_span(period, SCAN_CANDLES))
+        for period in timedelta_type if get_candle_source(period)[0] == interval
+    )
+
+
+UNIX_EPOCH = pd.Timestamp(0, tz="UTC")
+
 
 class IchimokuApi(BaseModel):
     ticker: str
     period: str
 
-    _all_candles: list = []
-
     def make_candle(self, candle) -> dict:
         return {
             "time": candle.time,
@@ -56,7 +111,7 @@ class IchimokuApi(BaseModel):
         }
 
     def normalize_candles(self, all_candles: list) -> DataFrame:
-        return DataFrame(all_candles)
+        return DataFrame(all_candles, columns=["time", *CANDLE_FIELDS])
 
     def get_ichimoku(self, df: DataFrame, wi: Window = Window(small=9, medium=26, large=52)) -> DataFrame:
         df["tenkanSen"] = (df["high"].rolling(window=wi.small).max() + df["low"].rolling(window=wi.small).min()) / 2
@@ -66,37 +121,121 @@ class IchimokuApi(BaseModel):
         df["chikouSpan"] = df["close"].shift(-wi.medium)
         return df
 
+    def resample_candles(self, df: DataFrame, rule: str | None) -> DataFrame:
+        """OHLCV resampling of base candles into a coarser interval (bins aligned to UTC midnight)"""
+        if rule is None or df.empty:
+            return df
+        resampled = (
+            df.set_index("time")
+            .resample(rule, origin="epoch", label="left", closed="left")
+            .agg({"open": "first", "close": "last", "high": "max", "low": "min", "volume": "sum"})
+        )
+        return resampled.dropna(subset=["open"]).reset_index()[["time", *CANDLE_FIELDS]]
+
+    def get_fetch_start(self, store: CandlesDbManager, interval: CandleInterval) -> datetime:
+        # the last stored candle may be incomplete, so it is requested again
+        last_time = store.get_last_time()
+        return last_time if last_time is not None else now() - get_history_depth(interval)
+
+    def store_candles(self, store: CandlesDbManager, interval: CandleInterval, candles: list, window_start: datetime) -> list:
+        """Saves fetched candles and returns all stored candles of the interval from window_start"""
+        store.save_candles(candles)
+        store.clear_outdated_candles(now() - get_history_depth(interval))
+        logger.debug(f"store_candles: fetched {len(candles)} {interval.name} candles")
+        return store.get_candles(window_start)
+
+    def get_window_start(self, rule: str | None, count: int = 0) -> datetime:
+        """Start of the chart window of the period, or of a window holding `count` candles of its source if count is given"""
+        span = get_candles_span(self.period, count) if count else timedelta_type[self.period]
+        window_start = now() - span
+        if rule is not None:
+            # start from a bin boundary, so the first resampled candle is complete
+            window_start = pd.Timestamp(window_start).floor(rule).to_pydatetime()
+        return window_start
+
+    def build_frame(self, candles: list, rule: str | None) -> DataFrame:
+        df = self.normalize_candles(candles)
+        df = self.resample_candles(df, rule)
+        return self.get_ichimoku(df)
+
+    def load_candles(self, figi: str, interval: CandleInterval, window_start: datetime) -> list:
+        """
+        Returns stored candles of the interval from window_start.
+        Candles are kept in CandlesDbManager: only the tail after the last stored candle is requested from T-api.
+        """
+        store = CandlesDbManager(figi=figi, interval=interval.name)
+        from_ = self.get_fetch_start(store, interval)
+        with tinkoff_client.services() as client:
+            candles = [self.make_candle(candle) for candle in client.get_all_candles(figi=figi, from_=from_, interval=interval)]
+        return self.store_candles(store, interval, candles, window_start)
+
+    async def aload_candles(self, figi: str, interval: CandleInterval, window_start: datetime, client) -> list:
+        """Async load_candles: candles come from AsyncClient, sqlite steps run in the threadpool"""
+        store = CandlesDbManager(figi=figi, interval=interval.name)
+        from_ = await run_in_threadpool(self.get_fetch_start, store, interval)
+        candles = [self.make_candle(candle) async for candle in client.get_all_candles(figi=figi, from_=from_, interval=interval)]
+        return await run_in_threadpool(self.store_candles, store, interval, candles, window_start)
+
     def get_all_candles_by_period(self) -> DataFrame:
+        """
+        Returns candles for the period with ichimoku lines.
+        In resampling mode the candles are built from the shared base interval (see resample_type).
+        """
         figi = db_manager.get_figi_by_ticker(self.ticker)
+        interval, rule = get_candle_source(self.period)
         try:
-            self._all_candles.clear()
-            with Client(TOKEN) as client:
-                for candle in client.get_all_candles(
-                    figi=figi,
-                    from_=now() - timedelta_type[self.period],
-                    interval=interval_type[self.period],
-                ):
-                    self._all_candles.append(self.make_candle(candle))
-            df = self.normalize_candles(self._all_candles)
-            df = self.get_ichimoku(df)
+            candles = self.load_candles(figi, interval, self.get_window_start(rule))
+            df = self.build_frame(candles, rule)
             logger.info("get_all_candles_by_period: exported the data")
             return df
         except Exception as e:
             logger.error(f"Error fetching API data: {e}")
             raise
 
-    def export_nan(self, df: DataFrame) -> list:
-        result = []
-        for _, row in df.iterrows():
-            unix_time = int(row["time"].timestamp())
-            if row.isna().all():
-                result.append({"time": unix_time})
+    async def aget_all_candles_by_period(self, client=None) -> DataFrame:
+        """
+        Async get_all_candles_by_period, nothing blocking runs on the event loop.
+        client: AsyncClient services to share between several tickers, the shared channel is used if None.
+        """
+        figi = await run_in_threadpool(db_manager.get_figi_by_ticker, self.ticker)
+        interval, rule = get_candle_source(self.period)
+        try:
+            window_start = self.get_window_start(rule)
+            if client is None:
+                async with tinkoff_client.async_services() as client:
+                    candles = await self.aload_candles(figi, interval, window_start, client)
             else:
-                data_dict = {"time": unix_time}
-                for col in df.columns:
-                    if col != "time" and not pd.isna(row[col]):
-                        data_dict[col] = row[col]
-                result.append(data_dict)
+                candles = await self.aload_candles(figi, interval, window_start, client)
+            df = await run_in_threadpool(self.build_frame, candles, rule)
+            logger.info("aget_all_candles_by_period: exported the data")
+            return df
+        except Exception as e:
+            logger.error(f"Error fetching API data: {e}")
+            raise
+
+    def export_nan(self, df: DataFrame) -> list:
+        """
+        Exports the frame as a list of {"time": unix_seconds, col: value, ...} dicts without NaN values.
+        Works column-wise: rows are grouped by their NaN pattern, so dicts are built in bulk per pattern.
+        """
+        if df.empty:
+            return []
+        columns = [col for col in df.columns if col != "time"]
+        times = pd.to_datetime(df["time"], utc=True)
+        unix_time = ((times - UNIX_EPOCH) // pd.Timedelta(seconds=1)).tolist()
+        values = [df[col].tolist() for col in columns]
+        present = df[columns].notna().to_numpy()
+
+        result = [None] * len(df)
+        patterns, inverse = np.unique(present, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for pattern_id, pattern in enumerate(patterns):
+            rows = np.flatnonzero(inverse == pattern_id).tolist()
+            keys = ["time"] + [col for col, keep in zip(columns, pattern) if keep]
+            picked = [unix_time] + [col_values for col_values, keep in zip(values, pattern) if keep]
+            picked = [[col_values[row] for row in rows] for col_values in picked]
+            for row, record in zip(rows, zip(*picked)):
+                result[row] = dict(zip(keys, record))
         return result
 
     def get_exported_data(self) -> dict:
@@ -104,6 +243,3 @@ class IchimokuApi(BaseModel):
         json_data = self.export_nan(df)
         logger.info("get_exported_data: data exported successfully")
         return {"data": json_data}
-
-
-IchimokuApi(ticker="SBER", period="W").get_exported_data()
@@ -1,9 +1,11 @@
 # CRUD for db to store data from api
-import json
 import logging
 from datetime import datetime, timedelta
 
+from fastapi.concurrency import run_in_threadpool
+
 from models.db_model import SessionLocal, IchimokuIndexCache
+from models.cache_codec import encode_cache
 from services.ichimoku.ichimoku_api import IchimokuApi
 from pydantic import BaseModel, Field, PrivateAttr
 
@@ -22,6 +24,23 @@ def get_cache_validity(period: str) -> timedelta:
         return timedelta(hours=1)
 
 
+def get_max_staleness(period: str) -> timedelta:
+    # expired rows younger than this are served while refreshing in the background
+    if period in ["M", "3M", "Y"]:
+        return timedelta(days=7)
+    return timedelta(days=1)
+
+
+def get_cache_entries(tickers: list, period: str) -> dict:
+    """Returns {ticker: cache entry} of the tickers on the period in one query, regardless of age"""
+    session = SessionLocal()
+    try:
+        entries = session.query(IchimokuIndexCache).filter(IchimokuIndexCache.period == period, IchimokuIndexCache.ticker.in_(tickers)).all()
+        return {entry.ticker: entry for entry in entries}
+    finally:
+        session.close()
+
+
 class IchimokuDbManager(BaseModel):
     ticker: str
     period: str
@@ -39,11 +58,18 @@ class IchimokuDbManager(BaseModel):
         finally:
             session.close()
 
+    def get_cache_entry(self):
+        """Returns the cache entry regardless of its age (for stale-while-revalidate)"""
+        session = SessionLocal()
+        try:
+            return session.query(IchimokuIndexCache).filter_by(ticker=self.ticker, period=self.period).first()
+        finally:
+            session.close()
+
     def save_cache(self, data: dict):
         session = SessionLocal()
         try:
-            json_data = json.dumps(data)
-            cache_entry = IchimokuIndexCache(ticker=self.ticker, period=self.period, data=json_data, timestamp=datetime.now())
+            cache_entry = IchimokuIndexCache(ticker=self.ticker, period=self.period, data=encode_cache(data), timestamp=datetime.now())
             session.merge(cache_entry)
             session.commit()
         except Exception as e:
@@ -59,17 +85,30 @@ class IchimokuDbManager(BaseModel):
         self.save_cache(data)
         logger.info("Cache updated.")
 
-    def clear_outdated_cache(self):
-        # Deletes all cache entries that are older than the allowed cache validity
+    async def aupdate_cache(self, client=None):
+        # Async update_cache: candles come from AsyncClient, sqlite and pandas steps run in the threadpool
+        api_client = IchimokuApi(ticker=self.ticker, period=self.period)
+        df = await api_client.aget_all_candles_by_period(client)
+        data = await run_in_threadpool(api_client.export_nan, df)
+        await run_in_threadpool(self.save_cache, data)
+        logger.info("Cache updated.")
+
+    def clear_outdated_cache(self) -> int:
+        # Deletes cache entries of the period that are too old to be served even as stale
         session = SessionLocal()
         try:
-            validity = get_cache_validity(self.period)
-            threshold = datetime.now() - validity
-            rows_deleted = session.query(IchimokuIndexCache).filter(IchimokuIndexCache.timestamp < threshold).delete()
+            threshold = datetime.now() - get_max_staleness(self.period)
+            rows_deleted = (
+                session.query(IchimokuIndexCache)
+                .filter(IchimokuIndexCache.period == self.period, IchimokuIndexCache.timestamp < threshold)
+                .delete()
+            )
             session.commit()
             logger.info(f"Cleared {rows_deleted} outdated cache entries.")
+            return rows_deleted
         except Exception as e:
             logger.error(f"Error clearing outdated cache: {e}")
             session.rollback()
+            return 0
         finally:
             session.close()
@@ -0,0 +1,157 @@
+# incremental ichimoku: O(1) (amortized) update per candle instead of rolling() over the whole frame
+from collections import deque
+
+from models.models import Window
+
+DEFAULT_WINDOW = Window(small=9, medium=26, large=52)
+HISTORY_SIZE = 500  # committed candles kept to seed windows added later
+
+
+def window_key(window: Window) -> tuple:
+    return (window.small, window.medium, window.large)
+
+
+def check_window(window: Window) -> None:
+    """ValueError unless 1 <= small <= medium <= large and the kept history is enough to seed the window"""
+    key = window_key(window)
+    if not 1 <= window.small <= window.medium <= window.large:
+        raise ValueError(f"Window {key} must have 1 <= small <= medium <= large")
+    if window.large + window.medium > HISTORY_SIZE:
+        raise ValueError(f"Window {key} needs more than {HISTORY_SIZE} candles of history")
+
+
+class RollingHighLow:
+    """
+    Max of highs and min of lows over the last `size` candles (monotonic deques).
+    Committed candles are in the deques, the forming candle is only mixed in by midpoint().
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._highs = deque()  # (index, high), highs are decreasing
+        self._lows = deque()  # (index, low), lows are increasing
+
+    def commit(self, index: int, high: float, low: float) -> None:
+        while self._highs and self._highs[-1][1] <= high:
+            self._highs.pop()
+        self._highs.append((index, high))
+        while self._lows and self._lows[-1][1] >= low:
+            self._lows.pop()
+        self._lows.append((index, low))
+
+    def midpoint(self, index: int, high: float, low: float) -> float | None:
+        """(max + min) / 2 of the window ending at the forming candle `index`, None if there are not enough candles"""
+        if index + 1 < self.size:
+            return None
+        while self._highs and self._highs[0][0] <= index - self.size:
+            self._highs.popleft()
+        while self._lows and self._lows[0][0] <= index - self.size:
+            self._lows.popleft()
+        top = max(self._highs[0][1], high) if self._highs else high
+        bottom = min(self._lows[0][1], low) if self._lows else low
+        return (top + bottom) / 2
+
+
+class WindowState:
+    """Shifted values of one Window: senkou spans are taken from `medium` committed candles back"""
+
+    def __init__(self, window: Window):
+        self.window = window
+        self.spans_a = deque(maxlen=window.medium)  # (tenkan + kijun) / 2 of committed candles
+        self.spans_b = deque(maxlen=window.medium)  # large midpoint of committed candles
+        self.forming = (None, None)
+
+    def commit(self) -> None:
+        span_a, span_b = self.forming
+        self.spans_a.append(span_a)
+        self.spans_b.append(span_b)
+
+    def shifted(self, spans: deque) -> float | None:
+        return spans[0] if len(spans) == self.window.medium else None
+
+
+class IchimokuEngine:
+    """
+    Keeps ichimoku state of one candle series (ticker, interval) for any number of windows.
+    update() takes the newest candle (make_candle dict): the same time updates the forming candle,
+    a later time commits it and starts a new one. Returns rows in the export_nan format per window key:
+    [{"time": ..., "chikouSpan": ...}, {"time": ..., "open": ..., "tenkanSen": ..., ...}]
+    """
+
+    def __init__(self, windows: list[Window] | None = None, start_index: int = 0):
+        self._index = start_index  # index of the forming candle
+        self._forming: dict | None = None
+        self._history = deque(maxlen=HISTORY_SIZE)  # committed candles
+        self._rolling: dict[int, RollingHighLow] = {}
+        self._states: dict[tuple, WindowState] = {}
+        for window in windows or [DEFAULT_WINDOW]:
+            for size in (window.small, window.medium, window.large):
+                self._rolling.setdefault(size, RollingHighLow(size))
+            self._states[window_key(window)] = WindowState(window)
+
+    @classmethod
+    def from_candles(cls, candles: list, windows: list[Window] | None = None) -> "IchimokuEngine":
+        engine = cls(windows)
+        for candle in candles:
+            engine.update(candle)
+        return engine
+
+    @property
+    def windows(self) -> list[Window]:
+        return [state.window for state in self._states.values()]
+
+    def add_window(self, window: Window) -> None:
+        """Adds a window, seeding it from the kept history instead of the whole series"""
+        key = window_key(window)
+        if key in self._states:
+            return
+        check_window(window)
+        replay = IchimokuEngine([window], start_index=self._index - len(self._history))
+        for candle in self._history:
+            replay.update(candle)
+        if self._forming is not None:
+            replay.update(self._forming)
+        for size, rolling in replay._rolling.items():
+            self._rolling.setdefault(size, rolling)
+        self._states[key] = replay._states[key]
+
+    def update(self, candle: dict) -> dict:
+        if self._forming is not None:
+            if candle["time"] < self._forming["time"]:
+                return {}
+            if candle["time"] > self._forming["time"]:
+                self._commit()
+        self._forming = candle
+
+        midpoints = {size: rolling.midpoint(self._index, candle["high"], candle["low"]) for size, rolling in self._rolling.items()}
+        return {key: self._rows(state, midpoints) for key, state in self._states.items()}
+
+    def _rows(self, state: WindowState, midpoints: dict) -> list:
+        window = state.window
+        candle = self._forming
+        tenkan, kijun, span_b = midpoints[window.small], midpoints[window.medium], midpoints[window.large]
+        state.forming = ((tenkan + kijun) / 2 if tenkan is not None and kijun is not None else None, span_b)
+
+        row = {"time": int(candle["time"].timestamp())}
+        row.update({field: candle[field] for field in ["open", "close", "high", "low", "volume"]})
+        lines = {
+            "tenkanSen": tenkan,
+            "kijunSen": kijun,
+            "senkouSpanA": state.shifted(state.spans_a),
+            "senkouSpanB": state.shifted(state.spans_b),
+        }
+        row.update({name: value for name, value in lines.items() if value is not None})
+
+        rows = [row]
+        if len(self._history) >= window.medium:
+            rows.insert(0, {"time": int(self._history[-window.medium]["time"].timestamp()), "chikouSpan": candle["close"]})
+        return rows
+
+    def _commit(self) -> None:
+        candle = self._forming
+        for rolling in self._rolling.values():
+            rolling.commit(self._index, candle["high"], candle["low"])
+        for state in self._states.values():
+            state.commit()
+        self._history.append(candle)
+        self._index += 1
@@ -1,32 +1,138 @@
+import asyncio
 import logging
-import json
+from datetime import datetime
 
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
-from services.ichimoku.ichimoku_db import IchimokuDbManager
+from models.cache_codec import decode_cache
+from services.ichimoku.downsample import downsample_rows
+from services.ichimoku.ichimoku_db import IchimokuDbManager, get_cache_entries, get_cache_validity, get_max_staleness
+from services.single_flight import AsyncSingleFlight
+from services.tinkoff_client import tinkoff_client
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# one refresh per (ticker, period), concurrent cache misses wait for it
+ichimoku_refreshes = AsyncSingleFlight()
+# revalidations of stale entries, referenced until done so they are not garbage collected
+background_refreshes: set[asyncio.Task] = set()
+# downsampled variants per resolution: (ticker, period, max_points) -> (cache timestamp, rows)
+downsampled_cache: dict[tuple, tuple[datetime, list]] = {}
+DOWNSAMPLED_CACHE_SIZE = 1000  # the oldest variant is dropped beyond it
 
-def ichimoku_index_data(ticker: str, period: str):
-    db_manager = IchimokuDbManager(ticker=ticker, period=period)
-    cache = db_manager.get_cache()
 
-    if cache:  # check for valid cache
-        data = json.loads(cache.data)
+async def refresh_cache(db_manager: IchimokuDbManager, client=None):
+    """Returns the fresh cache entry, rows are read from it by load_data"""
+    # another refresh may have finished right before this one started
+    cache = await run_in_threadpool(db_manager.get_cache)
+    if cache is None:
+        await db_manager.aupdate_cache(client)
+        cache = await run_in_threadpool(db_manager.get_cache)
+    if cache is None:
+        raise HTTPException(status_code=500, detail="Cache update failed")
+    return cache
+
+
+def refresh_in_background(db_manager: IchimokuDbManager) -> None:
+    key = (db_manager.ticker, db_manager.period)
+    if ichimoku_refreshes.in_flight(key):
+        return
+
+    async def revalidate():
+        try:
+            await ichimoku_refreshes.do(key, refresh_cache, db_manager)
+        except Exception as e:
+            logger.error(f"Error revalidating stale cache {key}: {e}")
+
+    task = asyncio.create_task(revalidate())
+    background_refreshes.add(task)
+    task.add_done_callback(background_refreshes.discard)
+
+
+async def load_data(cache, max_points: int | None = None) -> list:
+    """Rows of the cache entry, downsampled to max_points if given (computed once per entry and resolution)"""
+    if max_points is None:
+        return await run_in_threadpool(decode_cache, cache.data)
+    key = (cache.ticker, cache.period, max_points)
+    cached = downsampled_cache.get(key)
+    if cached is None or cached[0] != cache.timestamp:
+        rows = await run_in_threadpool(lambda: downsample_rows(decode_cache(cache.data), max_points))
+        downsampled_cache.pop(key, None)
+        if len(downsampled_cache) >= DOWNSAMPLED_CACHE_SIZE:
+            downsampled_cache.pop(next(iter(downsampled_cache)))
+        cached = downsampled_cache[key] = (cache.timestamp, rows)
+    return cached[1]
+
+
+async def cached_response(db_manager: IchimokuDbManager, cache, max_points: int | None = None) -> dict | None:
+    """Response from the cache entry, None if there is no entry or it is too old to be served"""
+    if cache is None:
+        return None
+    age = datetime.now() - cache.timestamp
+    if age <= get_cache_validity(db_manager.period):  # check for valid cache
         logger.debug("Returning data from cache")
-        return {"data": data}
+        return {"data": await load_data(cache, max_points)}
+    if age <= get_max_staleness(db_manager.period):
+        logger.debug(f"Returning stale data ({age}), revalidating")
+        refresh_in_background(db_manager)
+        return {"data": await load_data(cache, max_points), "stale": True, "age": int(age.total_seconds())}
+    return None
+
+
+async def ichimoku_index_data(ticker: str, period: str, max_points: int | None = None):
+    """
+    Returns {"data": [...]} from cache.
+    Expired entries younger than get_max_staleness are served right away as
+    {"data": [...], "stale": True, "age": seconds} while the cache is refreshed in the background.
+    max_points: at most this many rows, downsampled with LTTB on close (all rows if None).
+    """
+    db_manager = IchimokuDbManager(ticker=ticker, period=period)
+    cache = await run_in_threadpool(db_manager.get_cache_entry)
+    response = await cached_response(db_manager, cache, max_points)
+    if response is not None:
+        return response
 
     try:
-        db_manager.update_cache()
-        cache = db_manager.get_cache()
-        if cache:
-            data = json.loads(cache.data)
-            logger.debug("Returning newly updated data")
-            return {"data": data}
-        else:
-            raise HTTPException(status_code=500, detail="Cache update failed")
+        cache = await ichimoku_refreshes.do((ticker, period), refresh_cache, db_manager)
+        logger.debug("Returning newly updated data")
+        return {"data": await load_data(cache, max_points)}
     except Exception as e:
         logger.error(f"Error updating cache: {e}")
         raise HTTPException(status_code=500, detail="Internal server error. Can't get any ichimoku data")
+
+
+async def ichimoku_batch_data(tickers: list, period: str):
+    """
+    Ichimoku of several tickers in one payload:
+    {"data": {"SBER": {"data": [...]}, "GAZP": {"data": [...], "stale": True, "age": 4000}}, "errors": ["VKCO"]}
+    Cache entries of all tickers are read in one query, misses are fetched concurrently through the shared async channel.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    entries = await run_in_threadpool(get_cache_entries, tickers, period)
+
+    result, misses = {}, []
+    for ticker in tickers:
+        db_manager = IchimokuDbManager(ticker=ticker, period=period)
+        response = await cached_response(db_manager, entries.get(ticker))
+        if response is not None:
+            result[ticker] = response
+        else:
+            misses.append(db_manager)
+
+    errors = []
+    if misses:
+        async with tinkoff_client.async_services() as client:
+            refreshed = await asyncio.gather(
+                *[ichimoku_refreshes.do((m.ticker, period), refresh_cache, m, client) for m in misses],
+                return_exceptions=True,
+            )
+        for db_manager, cache in zip(misses, refreshed):
+            if isinstance(cache, Exception):
+                logger.error(f"Error updating cache of {db_manager.ticker}: {cache}")
+                errors.append(db_manager.ticker)
+            else:
+                result[db_manager.ticker] = {"data": await load_data(cache)}
+
+    return {"data": {ticker: result[ticker] for ticker in tickers if ticker in result}, "errors": errors}
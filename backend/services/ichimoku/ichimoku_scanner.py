@@ -0,0 +1,147 @@
+# market-wide ichimoku signals: one vectorized pass over candles of all tickers stacked into 2d arrays
+import asyncio
+import logging
+import time
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from numpy.lib.stride_tricks import sliding_window_view
+
+from models.models import Window
+from services.paper_data.total_tickers import all_tickers
+from services.single_flight import AsyncSingleFlight
+from services.tinkoff_client import tinkoff_client
+from .candles_db import CANDLE_FIELDS
+from .ichimoku_api import IchimokuApi, get_candle_source, db_manager
+from .ichimoku_db import get_cache_validity
+from .ichimoku_engine import DEFAULT_WINDOW
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+SCAN_CONCURRENCY = 10  # tickers loaded at once through the shared async channel
+
+scan_cache: dict[tuple, tuple[float, list]] = {}  # (interval, rule, tickers) -> (monotonic time, ranked signals)
+scans = AsyncSingleFlight()
+
+
+def stack_candles(frames: list, size: int) -> dict:
+    """
+    Stacks the last `size` candles of every frame into (tickers, size) arrays of high, low and close.
+    Shorter series are padded with NaN on the left, so column -1 is the last candle of every ticker.
+    """
+    stacked = {field: np.full((len(frames), size), np.nan) for field in ["high", "low", "close"]}
+    for row, df in enumerate(frames):
+        tail = df.tail(size)
+        if tail.empty:
+            continue
+        for field, values in stacked.items():
+            values[row, size - len(tail):] = tail[field].to_numpy(dtype=float)
+    return stacked
+
+
+def rolling_midpoint(high: np.ndarray, low: np.ndarray, size: int) -> np.ndarray:
+    """(max high + min low) / 2 over `size` candles along the rows, the first size - 1 columns are NaN"""
+    result = np.full(high.shape, np.nan)
+    if high.shape[1] >= size:
+        result[:, size - 1:] = (sliding_window_view(high, size, axis=1).max(axis=2) + sliding_window_view(low, size, axis=1).min(axis=2)) / 2
+    return result
+
+
+def scan_signals(high: np.ndarray, low: np.ndarray, close: np.ndarray, wi: Window = DEFAULT_WINDOW) -> dict:
+    """
+    Signals on the last candle of every row, +1 bullish, -1 bearish, 0 none (also when there is not enough history):
+    tkCross - tenkan-sen crossed kijun-sen on the last candle
+    cloudBreak - close moved out of the cloud (above / below both senkou spans) on the last candle
+    chikou - close is above the high / below the low of `medium` candles back
+    Needs wi.large + wi.medium + 1 columns.
+    """
+    tenkan = rolling_midpoint(high, low, wi.small)
+    kijun = rolling_midpoint(high, low, wi.medium)
+    span_a = (tenkan + kijun) / 2
+    span_b = rolling_midpoint(high, low, wi.large)
+
+    with np.errstate(invalid="ignore"):
+        # a cross needs the lines on both candles: NaN of a short (left-padded) series is not a side
+        tk = np.sign(tenkan[:, -2:] - kijun[:, -2:])
+        tk_cross = np.where(np.isfinite(tk).all(axis=1) & (tk[:, 1] != tk[:, 0]), tk[:, 1], 0)
+
+        # senkou spans of the last two candles were calculated `medium` candles earlier
+        shifted = slice(-2 - wi.medium, -wi.medium)
+        cloud_top = np.fmax(span_a[:, shifted], span_b[:, shifted])
+        cloud_bottom = np.fmin(span_a[:, shifted], span_b[:, shifted])
+        position = np.where(close[:, -2:] > cloud_top, 1, 0) - np.where(close[:, -2:] < cloud_bottom, 1, 0)
+        full_cloud = (np.isfinite(span_a[:, shifted]) & np.isfinite(span_b[:, shifted]) & np.isfinite(close[:, -2:])).all(axis=1)
+        cloud_break = np.where(full_cloud & (position[:, 1] != position[:, 0]), position[:, 1], 0)
+
+        back = -1 - wi.medium
+        chikou = np.where(close[:, -1] > high[:, back], 1, 0) - np.where(close[:, -1] < low[:, back], 1, 0)
+
+    tk_cross = tk_cross.astype(int)
+    return {"tkCross": tk_cross, "cloudBreak": cloud_break, "chikou": chikou, "score": tk_cross + cloud_break + chikou}
+
+
+def rank_signals(tickers: list, close: np.ndarray, signals: dict) -> list:
+    """Tickers with any signal, strongest first: by |score|, then bullish before bearish"""
+    order = np.lexsort((-signals["score"], -np.abs(signals["score"])))
+    ranked = []
+    for row in order:
+        if not any(signals[name][row] for name in ["tkCross", "cloudBreak", "chikou"]):
+            continue
+        ranked.append({
+            "ticker": tickers[row],
+            "close": float(close[row, -1]),
+            **{name: int(values[row]) for name, values in signals.items()},
+        })
+    return ranked
+
+
+async def load_frame(ticker: str, period: str, client, semaphore: asyncio.Semaphore, wi: Window = DEFAULT_WINDOW):
+    """Last wi.large + wi.medium + 1 candles (with a margin) of the period's source, whatever the chart window is"""
+    api = IchimokuApi(ticker=ticker, period=period)
+    interval, rule = get_candle_source(period)
+    async with semaphore:
+        figi = await run_in_threadpool(db_manager.get_figi_by_ticker, ticker)
+        candles = await api.aload_candles(figi, interval, api.get_window_start(rule, wi.large + wi.medium + 1), client)
+    return await run_in_threadpool(lambda: api.resample_candles(api.normalize_candles(candles), rule)[["time", *CANDLE_FIELDS]])
+
+
+async def compute_scan(tickers: list, period: str, wi: Window = DEFAULT_WINDOW) -> list:
+    semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+    async with tinkoff_client.async_services() as client:
+        frames = await asyncio.gather(*[load_frame(ticker, period, client, semaphore, wi) for ticker in tickers], return_exceptions=True)
+
+    loaded = []
+    for ticker, df in zip(tickers, frames):
+        if isinstance(df, Exception):
+            logger.error(f"Scanner: can't load candles of {ticker}: {df}")
+        else:
+            loaded.append((ticker, df))
+
+    def calc():
+        stacked = stack_candles([df for _, df in loaded], wi.large + wi.medium + 1)
+        signals = scan_signals(stacked["high"], stacked["low"], stacked["close"], wi)
+        return rank_signals([ticker for ticker, _ in loaded], stacked["close"], signals)
+
+    return await run_in_threadpool(calc)
+
+
+async def ichimoku_scan(period: str, tickers: list | None = None) -> list:
+    """
+    Ranked ichimoku signals of the universe (all_tickers by default) on the period.
+    Results are cached per candle source: only the last candles are scanned, so periods sharing an interval
+    and resample rule (e.g. 3M and Y) load the same candles and share the scan.
+    """
+    tickers = tickers or all_tickers
+    key = (*get_candle_source(period), tuple(tickers))
+    cached = scan_cache.get(key)
+    if cached and time.monotonic() - cached[0] <= get_cache_validity(period).total_seconds():
+        return cached[1]
+
+    async def scan():
+        ranked = await compute_scan(tickers, period)
+        scan_cache[key] = (time.monotonic(), ranked)
+        logger.info(f"Scanner: {len(ranked)} signals among {len(tickers)} tickers on {period}")
+        return ranked
+
+    return await scans.do(key, scan)
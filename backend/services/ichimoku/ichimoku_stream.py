@@ -0,0 +1,239 @@
+# live ichimoku updates from one shared T-api market data stream
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from tinkoff.invest import AsyncClient, CandleInstrument, CandleInterval, SubscriptionInterval
+
+from models.models import Window
+from .candles_db import CANDLE_FIELDS
+from .ichimoku_api import IchimokuApi, get_candle_source, interval_type, db_manager, TOKEN
+from .ichimoku_engine import IchimokuEngine, DEFAULT_WINDOW, HISTORY_SIZE, check_window, window_key
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+subscription_type = {
+    CandleInterval.CANDLE_INTERVAL_10_MIN: SubscriptionInterval.SUBSCRIPTION_INTERVAL_10_MIN,
+    CandleInterval.CANDLE_INTERVAL_30_MIN: SubscriptionInterval.SUBSCRIPTION_INTERVAL_30_MIN,
+    CandleInterval.CANDLE_INTERVAL_HOUR: SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_HOUR,
+    CandleInterval.CANDLE_INTERVAL_4_HOUR: SubscriptionInterval.SUBSCRIPTION_INTERVAL_4_HOUR,
+    CandleInterval.CANDLE_INTERVAL_DAY: SubscriptionInterval.SUBSCRIPTION_INTERVAL_ONE_DAY,
+}
+candle_interval_type = {sub: interval for interval, sub in subscription_type.items()}
+
+UPDATES_QUEUE_SIZE = 100  # per watcher, the oldest update is dropped when a slow client falls behind
+RECONNECT_DELAY = 5  # seconds
+
+
+class CandleResampler:
+    """
+    Forming candle of a coarser interval built from base candles of the stream,
+    bins are the same as in IchimokuApi.resample_candles (aligned to UTC midnight).
+    """
+
+    def __init__(self, rule: str, candles: list = ()):
+        self.rule = rule
+        self._bin = None
+        self._candles: dict = {}  # base candles of the forming bin by time
+        for candle in candles:
+            self.update(candle)
+
+    def update(self, candle: dict) -> dict | None:
+        """Returns the forming coarse candle with the base candle mixed in, None for a candle of an earlier bin"""
+        bin_time = pd.Timestamp(candle["time"]).floor(self.rule).to_pydatetime()
+        if self._bin is not None and bin_time < self._bin:
+            return None
+        if bin_time != self._bin:
+            self._bin, self._candles = bin_time, {}
+        self._candles[candle["time"]] = candle
+        candles = [self._candles[time] for time in sorted(self._candles)]
+        return {
+            "time": bin_time,
+            "open": candles[0]["open"],
+            "close": candles[-1]["close"],
+            "high": max(c["high"] for c in candles),
+            "low": min(c["low"] for c in candles),
+            "volume": sum(c["volume"] for c in candles),
+        }
+
+
+class IchimokuStreamHub:
+    """
+    Fans out live ichimoku updates to websocket watchers.
+    Charts are keyed by (figi, interval, resample rule) of get_candle_source. Every (figi, interval) is subscribed once
+    in a single MarketDataStream, no matter how many clients and periods use it.
+    Lines are updated incrementally by IchimokuEngine, one engine per key for all watched windows.
+    Updates have the export_nan format: the last candle with its lines and the row whose chikouSpan changed.
+    """
+
+    def __init__(self):
+        self._watchers: dict[tuple, dict[asyncio.Queue, tuple]] = {}  # key -> {queue: window key}
+        self._engines: dict[tuple, IchimokuEngine] = {}
+        self._resamplers: dict[tuple, CandleResampler] = {}  # keys with a resample rule
+        self._sources: dict[tuple, set] = {}  # subscribed (figi, interval) -> watched keys
+        self._tickers: dict[tuple, str] = {}
+        self._seeding: dict[tuple, asyncio.Task] = {}
+        self._stream = None
+        self._task: asyncio.Task | None = None
+        self._api = IchimokuApi(ticker="", period="D")  # only for make_candle
+
+    ################# watchers #####################
+    async def resolve(self, ticker: str, period: str) -> tuple:
+        """Key of the ticker chart on the period, ValueError for an unknown period or ticker"""
+        if period not in interval_type:
+            raise ValueError(f"Unknown period: {period}")
+        try:
+            figi = await run_in_threadpool(db_manager.get_figi_by_ticker, ticker)
+        except Exception as e:
+            raise ValueError(f"Unknown ticker: {ticker}") from e
+        if not figi:
+            raise ValueError(f"Unknown ticker: {ticker}")
+        return (figi, *get_candle_source(period))
+
+    @asynccontextmanager
+    async def watch(self, ticker: str, period: str, window: Window = DEFAULT_WINDOW):
+        """Yields a queue with updates for the ticker chart on the period, ValueError for an invalid request"""
+        check_window(window)
+        key = await self.resolve(ticker, period)
+        await self._seed(key, ticker, period)
+        try:
+            self._engines[key].add_window(window)
+        except Exception:
+            if key not in self._watchers:
+                # nobody watches the seeded engine
+                self._engines.pop(key, None)
+                self._resamplers.pop(key, None)
+            raise
+
+        queue = asyncio.Queue(maxsize=UPDATES_QUEUE_SIZE)
+        if key not in self._watchers:
+            self._watchers[key] = {}
+            self._tickers[key] = ticker
+            source = key[:2]
+            if source not in self._sources:
+                self._sources[source] = set()
+                self._subscribe([source])
+            self._sources[source].add(key)
+        self._watchers[key][queue] = window_key(window)
+        self._ensure_running()
+        try:
+            yield queue
+        finally:
+            self._remove_watcher(key, queue)
+
+    def _remove_watcher(self, key: tuple, queue: asyncio.Queue) -> None:
+        watchers = self._watchers.get(key)
+        if watchers is None:
+            return
+        watchers.pop(queue, None)
+        if not watchers:
+            del self._watchers[key]
+            self._engines.pop(key, None)
+            self._resamplers.pop(key, None)
+            self._tickers.pop(key, None)
+            source = key[:2]
+            self._sources[source].discard(key)
+            if not self._sources[source]:
+                del self._sources[source]
+                self._unsubscribe([source])
+        if not self._watchers:
+            self._stop()
+
+    async def _seed(self, key: tuple, ticker: str, period: str) -> None:
+        """Loads the last candles of the chart once per key (concurrent watchers wait for the same load)"""
+        if key in self._engines:
+            return
+        if key not in self._seeding:
+            self._seeding[key] = asyncio.create_task(self._load_tail(key, ticker, period))
+        try:
+            await asyncio.shield(self._seeding[key])
+        finally:
+            self._seeding.pop(key, None)
+
+    async def _load_tail(self, key: tuple, ticker: str, period: str) -> None:
+        figi, interval, rule = key
+        api = IchimokuApi(ticker=ticker, period=period)
+        if rule is None:
+            df = await run_in_threadpool(api.get_all_candles_by_period)
+        else:
+            # base candles are kept to continue the forming coarse candle from the stream
+            candles = await run_in_threadpool(api.load_candles, figi, interval, api.get_window_start(rule))
+            df = await run_in_threadpool(api.build_frame, candles, rule)
+            self._resamplers[key] = CandleResampler(rule, candles)
+        tail = df[["time", *CANDLE_FIELDS]].tail(HISTORY_SIZE).to_dict("records")
+        self._engines[key] = IchimokuEngine.from_candles(tail)
+
+    ################# candles #####################
+    def on_candle(self, candle) -> None:
+        """Handles a candle from the stream: updates the forming candle or appends a new one in every chart of it"""
+        keys = self._sources.get((candle.figi, candle_interval_type.get(candle.interval)), ())
+        base = self._api.make_candle(candle) if keys else None
+        for key in list(keys):
+            engine = self._engines.get(key)
+            if engine is None:
+                continue
+            resampler = self._resamplers.get(key)
+            update = resampler.update(base) if resampler is not None else base
+            rows = engine.update(update) if update is not None else {}
+            if rows:
+                self._publish(key, rows)
+
+    def _publish(self, key: tuple, rows: dict) -> None:
+        ticker = self._tickers[key]
+        for queue, window in self._watchers.get(key, {}).items():
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait({"ticker": ticker, "data": rows[window]})
+
+    ################# T-api stream #####################
+    def _instruments(self, sources: list) -> list:
+        return [CandleInstrument(figi=figi, interval=subscription_type[interval]) for figi, interval in sources]
+
+    def _subscribe(self, sources: list) -> None:
+        if self._stream is not None and sources:
+            self._stream.candles.subscribe(self._instruments(sources))
+
+    def _unsubscribe(self, sources: list) -> None:
+        if self._stream is not None and sources:
+            self._stream.candles.unsubscribe(self._instruments(sources))
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def _stop(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+
+    async def _run(self) -> None:
+        while self._watchers:
+            try:
+                async with AsyncClient(TOKEN) as client:
+                    self._stream = client.create_market_data_stream()
+                    self._subscribe(list(self._sources))
+                    async for marketdata in self._stream:
+                        if marketdata.candle:
+                            self.on_candle(marketdata.candle)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ichimoku market data stream failed: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                self._stream = None
+
+    async def close(self) -> None:
+        self._stop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+ichimoku_hub = IchimokuStreamHub()
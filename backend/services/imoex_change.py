@@ -1,43 +1,60 @@
-import requests
-import xml.etree.ElementTree as ET
+import threading
+import time
 
-url = "https://iss.moex.com/iss/engines/stock/markets/index/boards/SNDX/securities/IMOEX.xml"
+from services import http_client
 
+# только нужные колонки marketdata в JSON: текущее значение и закрытие предыдущего дня
+url = "https://iss.moex.com/iss/engines/stock/markets/index/boards/SNDX/securities/IMOEX.json"
+params = {"iss.meta": "off", "iss.only": "marketdata", "marketdata.columns": "SECID,CURRENTVALUE,LASTVALUE"}
 
-def get_current_value(xml_content):
-    root = ET.fromstring(xml_content)
-    # ищем элемент data с id="marketdata" и внутри row с SECID="IMOEX"
-    for row in root.findall(".//data[@id='marketdata']/rows/row"):
-        if row.attrib.get("SECID") == "IMOEX":
-            return float(row.attrib.get("CURRENTVALUE"))
-    return None
+IMOEX_TTL = 5  # seconds a quote is served from memory
+cache = {"quote": None, "time": 0.0}
+lock = threading.Lock()
 
 
-def get_imoex_quote() -> dict:
-    """
-    Получает текущую котировку IMOEX.
+def get_market_values(payload: dict) -> tuple[float | None, float | None]:
+    """(CURRENTVALUE, LASTVALUE) строки IMOEX из ответа ISS"""
+    marketdata = payload.get("marketdata", {})
+    columns = marketdata.get("columns", [])
+    for row in marketdata.get("data", []):
+        values = dict(zip(columns, row))
+        if values.get("SECID") == "IMOEX":
+            return values.get("CURRENTVALUE"), values.get("LASTVALUE")
+    return None, None
 
-    Возвращает:
-      {
-         "price": текущее значение,
-         "abs_change": изменение от предыдущего запроса,
-         "percent_change": процентное изменение
-      }
-    """
+
+def fetch_imoex_quote() -> dict:
     try:
-        response = requests.get(url)
+        response = http_client.get(url, params=params)
         response.raise_for_status()
-        new_value = get_current_value(response.content)
-        if new_value is None:
+        current_value, prev_close = get_market_values(response.json())
+        if current_value is None:
             raise Exception("CURRENTVALUE не найден")
     except Exception as e:
         raise Exception(f"Ошибка получения данных: {e}")
 
     abs_change = 0.0
     percent_change = 0.0
-    if hasattr(get_imoex_quote, "prev_value") and get_imoex_quote.prev_value is not None:
-        abs_change = new_value - get_imoex_quote.prev_value
-        percent_change = (abs_change / get_imoex_quote.prev_value) * 100 if get_imoex_quote.prev_value != 0 else 0
-    get_imoex_quote.prev_value = new_value
+    if prev_close:
+        abs_change = current_value - prev_close
+        percent_change = (abs_change / prev_close) * 100
+
+    return {"price": round(current_value, 2), "abs_change": round(abs_change, 2), "percent_change": round(percent_change, 2)}
 
-    return {"price": round(new_value, 2), "abs_change": round(abs_change, 2), "percent_change": round(percent_change, 2)}
+
+def get_imoex_quote() -> dict:
+    """
+    Получает текущую котировку IMOEX (не чаще раза в IMOEX_TTL секунд).
+
+    Возвращает:
+      {
+         "price": текущее значение,
+         "abs_change": изменение от закрытия предыдущего дня,
+         "percent_change": процентное изменение
+      }
+    """
+    with lock:
+        if cache["quote"] is None or time.monotonic() - cache["time"] >= IMOEX_TTL:
+            cache["quote"] = fetch_imoex_quote()
+            cache["time"] = time.monotonic()
+        return cache["quote"]
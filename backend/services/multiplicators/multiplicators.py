@@ -3,10 +3,12 @@
 import os
 import logging
 from typing import List, Dict, Any
-from tinkoff.invest import Client
 from tinkoff.invest.schemas import GetAssetFundamentalsRequest
 from ..paper_data.ticker_table_db import TickerTableDBManager
 from ..paper_data.total_tickers import all_tickers
+from services.tinkoff_client import tinkoff_client
+from services.presenter import present
+from models.models import convert_datetime
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -39,72 +41,34 @@ class Multiplicators:
 
     def convert_api_data(self, api_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Конвертирует данные из API с масштабированием значений и добавлением единиц измерения.
+        Конвертирует данные из API с масштабированием значений и добавлением единиц измерения (см. services.presenter).
         """
-        unit_mapping = {
-            "market_capitalization": ("млрд руб", 1e9),
-            "ticker": ("", 1),
-            "currency": ("", 1),
-            "high_price_last_52_weeks": ("руб", 1),
-            "low_price_last_52_weeks": ("руб", 1),
-            "average_daily_volume_last_10_days": ("шт", 1),
-            "average_daily_volume_last_4_weeks": ("шт", 1),
-            "beta": ("", 1),
-            "free_float": ("%", 1),
-            "forward_annual_dividend_yield": ("%", 1),
-            "shares_outstanding": ("млн", 1e6),
-            "revenue_ttm": ("млрд руб", 1e9),
-            "ebitda_ttm": ("млрд руб", 1e9),
-            "net_income_ttm": ("млрд руб", 1e9),
-            "eps_ttm": ("руб", 1),
-            "pe_ratio_ttm": ("", 1),
-            "price_to_sales_ttm": ("", 1),
-            "price_to_book_ttm": ("", 1),
-            "total_enterprise_value_mrq": ("млрд руб", 1e9),
-            "ev_to_ebitda_mrq": ("", 1),
-            "roe": ("%", 1),
-            "roa": ("%", 1),
-            "roic": ("%", 1),
-            "total_debt_to_equity_mrq": ("", 1),
-            "total_debt_to_ebitda_mrq": ("", 1),
-            "current_ratio_mrq": ("", 1),
-            "five_years_average_dividend_yield": ("%", 1),
-            "dividend_payout_ratio_fy": ("%", 1),
-            "buy_back_ttm": ("млрд руб", 1e9),
-            "one_year_annual_revenue_growth_rate": ("%", 1),
-            "revenue_change_five_years": ("%", 1),
-            "eps_change_five_years": ("%", 1),
-            "ev_to_sales": ("", 1),
-            "ex_dividend_date": ("", 1),
-        }
-        result = {}
-        for key, value in api_data.items():
-            if key in unit_mapping and value is not None:
-                unit, divisor = unit_mapping[key]
-                if isinstance(value, str):
-                    formatted_value = value
-                elif isinstance(value, (int, float)):
-                    if divisor == 1:
-                        formatted_value = str(value) if isinstance(value, int) else f"{value:.2f}"
-                    else:
-                        formatted_value = f"{value / divisor:,.0f}".replace(",", " ")
-                else:
-                    formatted_value = str(value)
-                result[key] = {"value": formatted_value, "unit": unit}
-        return result
+        return present(api_data)
 
     def get_multiplicator_data_from_api(self) -> Dict[str, Any]:
         """
         Получает данные мультипликаторов для всех активов через API.
         Возвращает словарь, где ключ – тикер, значение – конвертированные данные.
         """
+        conv_multip_res = {ticker: self.convert_api_data(data) for ticker, data in self.get_raw_multiplicator_data_from_api().items()}
+        logger.debug(f"conv_multip_res: {conv_multip_res}")
+        return conv_multip_res
+
+    def get_raw_multiplicator_data_from_api(self) -> Dict[str, Any]:
+        """
+        Получает данные мультипликаторов для всех активов одним запросом к API.
+        Возвращает словарь, где ключ – тикер, значение – значения из API без конвертации (даты в ISO 8601).
+        """
         mult_res = {}
-        conv_multip_res = {}
-        with Client(self.token) as client:
+        with tinkoff_client.services() as client:
             request = GetAssetFundamentalsRequest(assets=self.get_asset_uids())
             response = client.instruments.get_asset_fundamentals(request=request)
             for res in response.fundamentals:
                 ticker = self.db_manager.get_ticker_by_uid(res.asset_uid)
+                if not ticker:
+                    # актив не из таблицы тикеров: без тикера его не сохранить в кэш
+                    logger.warning(f"get_raw_multiplicator_data_from_api: нет тикера для asset_uid {res.asset_uid}, пропущен")
+                    continue
                 mult_res[ticker] = {
                     "market_capitalization": res.market_capitalization,
                     "ticker": ticker,
@@ -135,22 +99,25 @@ class Multiplicators:
                     "revenue_change_five_years": res.revenue_change_five_years,
                     "eps_change_five_years": res.eps_change_five_years,
                     "ev_to_sales": res.ev_to_sales,
-                    "ex_dividend_date": res.ex_dividend_date,
+                    "ex_dividend_date": convert_datetime(res.ex_dividend_date),
                 }
-                logger.debug(f"mult_res: {mult_res}")
-                conv_multip_res[ticker] = self.convert_api_data(mult_res[ticker])
-        logger.debug(f"conv_multip_res: {conv_multip_res}")
-        return conv_multip_res
+        logger.debug(f"mult_res: {mult_res}")
+        return mult_res
 
     def get_divs_from_multiplicator_data_from_api(self, ticker: str) -> Dict[str, Any]:
         """
         Используется для получения данных по дивидендам для указанного тикера
         через API мультипликаторов.
         """
+        return self.convert_api_data(self.get_raw_divs_from_multiplicator_data_from_api(ticker))
+
+    def get_raw_divs_from_multiplicator_data_from_api(self, ticker: str) -> Dict[str, Any]:
+        """
+        Дивидендные поля мультипликаторов для указанного тикера без конвертации.
+        """
         divs_res = {}
-        conv_divs_res = {}
         uid = self.db_manager.get_uid_by_ticker(ticker)
-        with Client(self.token) as client:
+        with tinkoff_client.services() as client:
             request = GetAssetFundamentalsRequest(assets=[uid])
             response = client.instruments.get_asset_fundamentals(request=request)
             for res in response.fundamentals:
@@ -160,5 +127,4 @@ class Multiplicators:
                     "dividend_payout_ratio_fy": res.dividend_payout_ratio_fy,
                     "forward_annual_dividend_yield": res.forward_annual_dividend_yield,
                 }
-                conv_divs_res = self.convert_api_data(divs_res)
-        return conv_divs_res
+        return divs_res
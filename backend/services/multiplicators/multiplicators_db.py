@@ -1,19 +1,30 @@
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import json
+
+from sqlalchemy.dialects.sqlite import insert
 
 from models.db_model import SessionLocal, MultiplicatorsCache
+from models.cache_codec import encode_cache, decode_cache
 from services.multiplicators.multiplicators import Multiplicators
+from services.multiplicators.screener import FundamentalsSnapshot
+from services.presenter import is_presented
 from ..paper_data.total_tickers import missing_tickers, api_tickers, all_tickers
+from ..single_flight import SingleFlight
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# один запрос фундаментальных данных на всех, сколько бы тикеров ни промахнулось по кэшу одновременно
+multiplicators_refreshes = SingleFlight()
+# числовые значения всех тикеров для скринера, обновляются вместе с кэшем
+fundamentals_snapshot = FundamentalsSnapshot()
+
 
 class MultiplicatorsDBManager(BaseModel):
     """
     Класс для управления сохранением и обновлением кэша данных по мультипликаторам.
+    В кэше хранятся сырые значения из API, форматирование – в services.presenter.
 
     При вызове проверяется наличие кэшированных данных по мультипликаторам (полученных
     через метод get_multiplicator_data_from_api). Если сохранённые данные старше, чем cache_duration,
@@ -40,7 +51,9 @@ class MultiplicatorsDBManager(BaseModel):
         try:
             cache = session.query(MultiplicatorsCache).filter(MultiplicatorsCache.ticker == ticker).first()
             if cache and (datetime.now() - cache.timestamp) < self.cache_duration:
-                return json.loads(cache.data)
+                data = decode_cache(cache.data)
+                # строки, сохранённые уже отформатированными, обновляются
+                return None if is_presented(data) else data
             return None
         finally:
             session.close()
@@ -49,37 +62,97 @@ class MultiplicatorsDBManager(BaseModel):
         """
         Сохраняет данные по мультипликаторам для указанного тикера в кэше.
 
-        Данные сериализуются в JSON-формате, а время обновления устанавливается равным текущему.
+        Данные сериализуются кодеком кэша (encode_cache), а время обновления устанавливается равным текущему.
         """
         session = self.get_session()
         try:
-            cache = MultiplicatorsCache(ticker=ticker, data=json.dumps(data, default=str), timestamp=datetime.now())
+            cache = MultiplicatorsCache(ticker=ticker, data=encode_cache(data), timestamp=datetime.now())
             session.merge(cache)
             session.commit()
         finally:
             session.close()
 
+    def save_all(self, all_data: dict) -> None:
+        """
+        Сохраняет данные всех тикеров ({тикер: данные}) одной транзакцией (upsert по тикеру).
+        """
+        now = datetime.now()
+        rows = [{"ticker": ticker, "data": encode_cache(data), "timestamp": now} for ticker, data in all_data.items()]
+        if not rows:
+            return
+        session = self.get_session()
+        try:
+            stmt = insert(MultiplicatorsCache).values(rows)
+            stmt = stmt.on_conflict_do_update(index_elements=["ticker"], set_={"data": stmt.excluded.data, "timestamp": stmt.excluded.timestamp})
+            session.execute(stmt)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def refresh_all(self) -> dict:
+        """
+        Запрашивает мультипликаторы всех тикеров одним вызовом API и сохраняет каждый из них в кэш.
+        Числовые значения загружаются в fundamentals_snapshot.
+        """
+        all_data = Multiplicators().get_raw_multiplicator_data_from_api()
+        self.save_all(all_data)
+        fundamentals_snapshot.load(all_data)
+        logger.info(f"refresh_all: cached multiplicators of {len(all_data)} tickers")
+        return all_data
+
     def update_cache(self, ticker: str) -> dict:
         """
         Возвращает данные по мультипликаторам для заданного тикера.
 
         Если существует действующий кэш (возраст которого меньше cache_duration),
-        он возвращается. Иначе данные запрашиваются через Multiplicators API, сохраняются и возвращаются.
+        он возвращается. Иначе кэш всех тикеров обновляется через refresh_all,
+        одновременные промахи ждут одного общего обновления.
         """
-        self.clear_outdated_cache()
-
         cached_data = self.get_cache(ticker)
         logger.debug(f"cached data is None:{cached_data is None}")
         if cached_data is not None:
             return cached_data
 
-        all_data = Multiplicators().get_multiplicator_data_from_api()
-        new_data = all_data.get(ticker, {})
-
-        self.save_cache(ticker, new_data)
+        all_data = multiplicators_refreshes.do("all", self.refresh_all)
+        new_data = all_data.get(ticker)
+        if new_data is None:
+            # тикера нет в ответе API: пустые данные кэшируются, чтобы не повторять общий запрос
+            new_data = {}
+            self.save_cache(ticker, new_data)
         return new_data
 
-    def clear_outdated_cache(self) -> None:
+    def get_all_cache(self) -> tuple[dict, datetime | None]:
+        """
+        Действующий кэш всех тикеров: ({тикер: данные}, время самой старой записи).
+        """
+        session = self.get_session()
+        try:
+            outdated_time = datetime.now() - self.cache_duration
+            rows = session.query(MultiplicatorsCache).filter(MultiplicatorsCache.timestamp >= outdated_time).all()
+        finally:
+            session.close()
+        all_data = {row.ticker: decode_cache(row.data) for row in rows}
+        all_data = {ticker: data for ticker, data in all_data.items() if not is_presented(data)}
+        oldest = min((row.timestamp for row in rows if row.ticker in all_data), default=None)
+        return all_data, oldest
+
+    def get_snapshot(self) -> FundamentalsSnapshot:
+        """
+        fundamentals_snapshot, если пуст или старше cache_duration – загружается из кэша,
+        а без действующего кэша обновляется через refresh_all.
+        """
+        if not fundamentals_snapshot.is_fresh(self.cache_duration):
+            all_data, oldest = self.get_all_cache()
+            if all_data:
+                fundamentals_snapshot.load(all_data, loaded_at=oldest)
+            else:
+                multiplicators_refreshes.do("all", self.refresh_all)
+        return fundamentals_snapshot
+
+    def clear_outdated_cache(self) -> int:
         """
         Удаляет устаревшие записи кэша из базы данных.
 
@@ -88,7 +161,8 @@ class MultiplicatorsDBManager(BaseModel):
         session = self.get_session()
         try:
             outdated_time = datetime.now() - self.cache_duration
-            session.query(MultiplicatorsCache).filter(MultiplicatorsCache.timestamp < outdated_time).delete()
+            rows_deleted = session.query(MultiplicatorsCache).filter(MultiplicatorsCache.timestamp < outdated_time).delete()
             session.commit()
+            return rows_deleted
         finally:
             session.close()
@@ -0,0 +1,143 @@
+# columnar snapshot of GetAssetFundamentals of all tickers and vectorized filter/sort over it
+import logging
+import operator
+import re
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# numeric fields of Multiplicators.get_raw_multiplicator_data_from_api
+NUMERIC_FIELDS = [
+    "market_capitalization",
+    "high_price_last_52_weeks",
+    "low_price_last_52_weeks",
+    "average_daily_volume_last_10_days",
+    "average_daily_volume_last_4_weeks",
+    "beta",
+    "free_float",
+    "shares_outstanding",
+    "revenue_ttm",
+    "ebitda_ttm",
+    "net_income_ttm",
+    "eps_ttm",
+    "pe_ratio_ttm",
+    "price_to_sales_ttm",
+    "price_to_book_ttm",
+    "total_enterprise_value_mrq",
+    "ev_to_ebitda_mrq",
+    "roe",
+    "roa",
+    "roic",
+    "total_debt_to_equity_mrq",
+    "total_debt_to_ebitda_mrq",
+    "buy_back_ttm",
+    "one_year_annual_revenue_growth_rate",
+    "revenue_change_five_years",
+    "eps_change_five_years",
+    "ev_to_sales",
+]
+
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq, "!=": operator.ne}
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*$")
+
+
+def to_float(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+class FundamentalsSnapshot:
+    """
+    Fundamentals of all tickers as one float64 array per field (NaN where the API has no value).
+    load() builds new arrays and swaps them in one assignment, so readers never see a half-built snapshot.
+    """
+
+    def __init__(self):
+        self._data: tuple[np.ndarray, dict[str, np.ndarray]] | None = None
+        self.loaded_at: datetime | None = None
+
+    def load(self, raw_data: dict, loaded_at: datetime | None = None) -> None:
+        """
+        raw_data: {ticker: {field: value}} as from get_raw_multiplicator_data_from_api.
+        loaded_at: when the data was fetched from the API, now if None.
+        """
+        tickers = np.array(sorted(raw_data), dtype=object)
+        columns = {field: np.array([to_float(raw_data[ticker].get(field)) for ticker in tickers], dtype=np.float64) for field in NUMERIC_FIELDS}
+        self.loaded_at = loaded_at or datetime.now()  # set first: is_fresh() reads it once _data is set
+        self._data = (tickers, columns)
+        logger.debug(f"FundamentalsSnapshot: loaded {len(tickers)} tickers")
+
+    def is_fresh(self, max_age) -> bool:
+        return self._data is not None and datetime.now() - self.loaded_at < max_age
+
+    @property
+    def data(self) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        if self._data is None:
+            return np.array([], dtype=object), {field: np.array([], dtype=np.float64) for field in NUMERIC_FIELDS}
+        return self._data
+
+
+def check_field(field: str) -> str:
+    if field not in NUMERIC_FIELDS:
+        raise ValueError(f"Unknown field: {field}")
+    return field
+
+
+def parse_filter(expression: str | None) -> list:
+    """'pe_ratio_ttm<5,roe>20' -> [("pe_ratio_ttm", operator.lt, 5.0), ("roe", operator.gt, 20.0)]"""
+    conditions = []
+    for part in (expression or "").split(","):
+        if not part.strip():
+            continue
+        match = CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"Invalid filter condition: {part.strip()}")
+        field, op, value = match.groups()
+        conditions.append((check_field(field), OPERATORS[op], float(value)))
+    return conditions
+
+
+def parse_sort(expression: str | None) -> list:
+    """'-roe,pe_ratio_ttm' -> [("roe", True), ("pe_ratio_ttm", False)], True for descending"""
+    keys = []
+    for part in (expression or "").split(","):
+        part = part.strip()
+        if part:
+            descending = part.startswith("-")
+            keys.append((check_field(part.lstrip("-+")), descending))
+    return keys
+
+
+def screen(snapshot: FundamentalsSnapshot, filter: str | None = None, sort: str | None = None, limit: int | None = None, fields: str | None = None) -> dict:
+    """
+    Rows of the tickers matching every filter condition, sorted by the sort keys (missing values last).
+    {"total": matched tickers, "rows": [{"ticker": "SBER", "pe_ratio_ttm": 4.2, ...}, ...]}, at most limit rows.
+    Raises ValueError for unknown fields or malformed expressions.
+    """
+    conditions = parse_filter(filter)
+    sort_keys = parse_sort(sort)
+    selected = [check_field(field.strip()) for field in fields.split(",") if field.strip()] if fields else NUMERIC_FIELDS
+    tickers, columns = snapshot.data
+
+    mask = np.ones(len(tickers), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for field, op, value in conditions:
+            mask &= op(columns[field], value) & ~np.isnan(columns[field])  # NaN never matches, also for !=
+    index = np.flatnonzero(mask)
+
+    if sort_keys:
+        # lexsort sorts by the last key first; NaN stays last, also for negated (descending) keys
+        index = index[np.lexsort([-columns[field][index] if descending else columns[field][index] for field, descending in reversed(sort_keys)])]
+    total = len(index)
+    if limit is not None:
+        index = index[: max(limit, 0)]
+
+    values = {field: columns[field][index] for field in selected}
+    rows = [
+        {"ticker": tickers[i], **{field: None if np.isnan(values[field][n]) else float(values[field][n]) for field in selected}}
+        for n, i in enumerate(index)
+    ]
+    return {"total": total, "rows": rows}
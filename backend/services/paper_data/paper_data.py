@@ -5,7 +5,7 @@ from pandas import DataFrame
 import pandas as pd
 from dotenv import load_dotenv
 import json
-from tinkoff.invest import Client, InstrumentIdType, AssetResponse
+from tinkoff.invest import InstrumentIdType, AssetResponse, InstrumentStatus
 import os
 import logging
 
@@ -16,6 +16,7 @@ load_dotenv()
 TOKEN = os.getenv("INVEST_TOKEN")
 
 from models.models import convert_quotation, Quotation
+from services.tinkoff_client import tinkoff_client
 
 from .total_tickers import api_tickers
 
@@ -35,7 +36,7 @@ class PaperData(BaseModel):
         Returns uid-ticker-figi dict from T-api for all tickers.
         Used in TickerTableDBManager.
         """
-        with Client(TOKEN) as client:
+        with tinkoff_client.services() as client:
             instruments = client.instruments.find_instrument(query=ticker)
             for instrument in instruments.instruments:
                 if instrument.ticker == ticker:
@@ -52,16 +53,38 @@ class PaperData(BaseModel):
                         "isin": details.instrument.isin,
                         "uid": details.instrument.asset_uid,
                         "currency": details.instrument.currency,
+                        "class_code": details.instrument.class_code,
                     }
         return None
 
+    def get_all_uid_ticker_figi_data(self, class_code: str = "TQBR") -> list[dict]:
+        """
+        Returns uid-ticker-figi dicts of all shares of the class in one shares() call.
+        Used in TickerTableDBManager.sync_all().
+        """
+        with tinkoff_client.services() as client:
+            shares = client.instruments.shares(instrument_status=InstrumentStatus.INSTRUMENT_STATUS_BASE).instruments
+        logger.debug(f"shares: {len(shares)} instruments")
+        return [
+            {
+                "ticker": share.ticker,
+                "figi": share.figi,
+                "isin": share.isin,
+                "uid": share.asset_uid,
+                "currency": share.currency,
+                "class_code": share.class_code,
+            }
+            for share in shares
+            if share.class_code == class_code
+        ]
+
     def get_main_data_on_share_by_uid(self, uid: str) -> dict:
         """
         Returns paper main data by uid.
         Used in PaperDataDBManager.
         """
         # uid = "4b449b8c-7433-479f-9cad-53aa8226a28c"
-        with Client(TOKEN) as client:
+        with tinkoff_client.services() as client:
 
             asset_response: AssetResponse = client.instruments.get_asset_by(id=uid)
             res = asset_response.asset
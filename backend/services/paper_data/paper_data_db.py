@@ -2,10 +2,10 @@ import os
 import pathlib
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import json
 import logging
 
 from models.db_model import SessionLocal, PaperDataCache
+from models.cache_codec import encode_cache, decode_cache
 from .paper_data import PaperData
 from .ticker_table_db import TickerTableDBManager
 
@@ -31,7 +31,7 @@ class PaperDataDBManager(BaseModel):
             cache = session.query(PaperDataCache).filter(PaperDataCache.ticker == ticker).first()
             if cache:
                 if datetime.now() - cache.timestamp < self.cache_duration:
-                    return json.loads(cache.data)
+                    return decode_cache(cache.data)
             return None
         finally:
             session.close()
@@ -39,8 +39,8 @@ class PaperDataDBManager(BaseModel):
     def save_cache(self, ticker: str, data: dict) -> None:
         session = self.get_session()
         try:
-            # use default=str to convert datetime objects to strings
-            cache = PaperDataCache(ticker=ticker, data=json.dumps(data, default=str), timestamp=datetime.now())
+            # datetime objects are stored as strings (see encode_cache)
+            cache = PaperDataCache(ticker=ticker, data=encode_cache(data), timestamp=datetime.now())
             session.merge(cache)
             session.commit()
         finally:
@@ -50,8 +50,6 @@ class PaperDataDBManager(BaseModel):
         """
         Updates the cache if not available or outdated.
         """
-        self.clear_outdated_cache()
-
         cached_data = self.get_cache(ticker)
         logger.debug(f"cached_data is None:{cached_data is None}")
         if cached_data is not None:
@@ -65,12 +63,13 @@ class PaperDataDBManager(BaseModel):
         logger.debug(f"get new_data")
         return new_data
 
-    def clear_outdated_cache(self) -> None:
+    def clear_outdated_cache(self) -> int:
         session = self.get_session()
         try:
             outdated_time = datetime.now() - self.cache_duration
-            session.query(PaperDataCache).filter(PaperDataCache.timestamp < outdated_time).delete()
+            rows_deleted = session.query(PaperDataCache).filter(PaperDataCache.timestamp < outdated_time).delete()
             logger.info("cleared cache")
             session.commit()
+            return rows_deleted
         finally:
             session.close()
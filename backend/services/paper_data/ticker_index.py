@@ -0,0 +1,64 @@
+# in-process ticker <-> uid <-> figi <-> isin index over TickerTable
+import logging
+import threading
+
+from models.db_model import TickerTable
+
+logger = logging.getLogger(__name__)
+
+INDEX_FIELDS = ["ticker", "uid", "figi", "isin"]
+RECORD_FIELDS = INDEX_FIELDS + ["currency", "class_code"]
+
+
+def record_from_row(row: TickerTable) -> dict:
+    return {field: getattr(row, field) for field in RECORD_FIELDS}
+
+
+class TickerIndex:
+    """
+    Lookups of a TickerTable record by any of INDEX_FIELDS in O(1).
+    The whole table is loaded on the first lookup and after invalidate(). A reload builds new maps and swaps
+    them in one assignment, so readers never see a half-built index.
+    """
+
+    def __init__(self):
+        self._maps: dict[str, dict[str, dict]] | None = None  # field -> {value: record}
+        self._version = 0  # bumped by invalidate(), a load started before it is not kept
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._maps = None
+
+    def lookup(self, field: str, value: str, session_factory) -> dict | None:
+        return self.maps(session_factory)[field].get(value)
+
+    def maps(self, session_factory) -> dict:
+        maps = self._maps
+        if maps is None:
+            maps = self._load(session_factory)
+        return maps
+
+    def _load(self, session_factory) -> dict:
+        version = self._version
+        session = session_factory()
+        try:
+            rows = session.query(TickerTable).all()
+        finally:
+            session.close()
+
+        maps = {field: {} for field in INDEX_FIELDS}
+        for row in rows:
+            record = record_from_row(row)
+            for field in INDEX_FIELDS:
+                if record[field]:
+                    maps[field][record[field]] = record
+        with self._lock:
+            if self._version == version:
+                self._maps = maps
+        logger.debug(f"TickerIndex: loaded {len(rows)} tickers")
+        return maps
+
+
+ticker_index = TickerIndex()
@@ -3,17 +3,31 @@ import os
 import pathlib
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import json
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert
 
 from models.db_model import SessionLocal, TickerTable
 from .paper_data import PaperData
 import pandas as pd
 import logging
 from .total_tickers import all_tickers
+from .ticker_index import ticker_index, record_from_row, RECORD_FIELDS
+from ..single_flight import SingleFlight
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+UPSERT_CHUNK = 100  # keeps the statement below sqlite's bound parameters limit
+SYNC_INTERVAL = timedelta(hours=1)  # unknown tickers don't trigger a new shares() call more often
+directory_syncs = SingleFlight()
+last_sync: datetime | None = None
+
+
+def to_row(ticker: str, record: dict, timestamp: datetime) -> dict:
+    # empty identifiers are stored as NULL, so they don't clash in the unique indexes
+    return {**{field: record.get(field) or None for field in RECORD_FIELDS}, "ticker": ticker, "timestamp": timestamp}
+
 
 class TickerTableDBManager(BaseModel):
     """
@@ -36,7 +50,7 @@ class TickerTableDBManager(BaseModel):
             cache = session.query(TickerTable).filter(TickerTable.ticker == ticker).first()
             if cache:
                 if datetime.now() - cache.timestamp < self.cache_duration:
-                    return json.loads(cache.data)
+                    return record_from_row(cache)
             return None
         finally:
             session.close()
@@ -44,55 +58,141 @@ class TickerTableDBManager(BaseModel):
     def save_cache(self, ticker: str, data: dict) -> None:
         session = self.get_session()
         try:
-            # use default=str to convert datetime objects to strings
-            cache = TickerTable(ticker=ticker, data=json.dumps(data, default=str), timestamp=datetime.now())
-            session.merge(cache)
+            row = to_row(ticker, data, datetime.now())
+            self.delete_conflicts(session, [row])
+            session.merge(TickerTable(**row))
             session.commit()
         finally:
             session.close()
+        ticker_index.invalidate()
 
-    def update_cache(self, ticker: str) -> json:
+    def delete_conflicts(self, session, rows: list) -> None:
+        """
+        Deletes rows of other tickers holding a figi/uid/isin of the new rows (e.g. after a ticker change).
+        Binds up to 4 parameters per row, callers pass at most UPSERT_CHUNK rows.
+        """
+        tickers = [row["ticker"] for row in rows]
+        conditions = [
+            getattr(TickerTable, field).in_([row[field] for row in rows if row[field]]) for field in ["figi", "uid", "isin"]
+        ]
+        session.query(TickerTable).filter(TickerTable.ticker.notin_(tickers), or_(*conditions)).delete(synchronize_session=False)
+
+    def update_cache(self, ticker: str) -> dict:
         """
         Updates the cache if not available or outdated.
         Uses PaperData.get_uid_ticker_figi_data_by_ticker() to get fresh data.
         """
-        self.clear_outdated_cache()
-
         cached_data = self.get_cache(ticker)
         if cached_data is not None:
             return cached_data
 
         paper_data_instance = PaperData()
-        new_data: json = json.dumps(paper_data_instance.get_uid_ticker_figi_data_by_ticker(ticker), default=str)
+        new_data: dict = paper_data_instance.get_uid_ticker_figi_data_by_ticker(ticker)
         self.save_cache(ticker, new_data)
         return new_data
 
-    def clear_outdated_cache(self) -> None:
+    def sync_all(self) -> int:
+        """
+        Upserts all TQBR shares from one T-api shares() call into the table in a single transaction.
+        Returns the number of synced tickers.
+        """
+        global last_sync
+        records = PaperData().get_all_uid_ticker_figi_data()
+        now = datetime.now()
+        rows = [to_row(record["ticker"], record, now) for record in records]
+        session = self.get_session()
+        try:
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                chunk = rows[start : start + UPSERT_CHUNK]
+                self.delete_conflicts(session, chunk)
+                stmt = insert(TickerTable).values(chunk)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["ticker"], set_={field: stmt.excluded[field] for field in [*RECORD_FIELDS[1:], "timestamp"]}
+                )
+                session.execute(stmt)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        last_sync = now
+        ticker_index.invalidate()
+        logger.info(f"sync_all: synced {len(rows)} tickers")
+        return len(rows)
+
+    def sync_if_due(self) -> None:
+        """sync_all, unless it ran less than SYNC_INTERVAL ago. Concurrent callers share one sync."""
+        if last_sync is not None and datetime.now() - last_sync < SYNC_INTERVAL:
+            return
+        try:
+            directory_syncs.do("shares", self.sync_all)
+        except Exception as e:
+            logger.error(f"Error syncing the instrument directory: {e}")
+
+    def clear_outdated_cache(self) -> int:
         session = self.get_session()
         try:
             outdated_time = datetime.now() - self.cache_duration
-            session.query(TickerTable).filter(TickerTable.timestamp < outdated_time).delete()
+            rows_deleted = session.query(TickerTable).filter(TickerTable.timestamp < outdated_time).delete()
             session.commit()
         finally:
             session.close()
+        if rows_deleted:
+            ticker_index.invalidate()
+        return rows_deleted
 
     ################### get data from DB #################
+    def get_record(self, field: str, value: str) -> dict | None:
+        """
+        TickerTable record (ticker, uid, figi, isin, currency, class_code) by any of ticker/uid/figi/isin.
+        Read from the in-process index. A miss is checked with one indexed query, as another process may have added the row.
+        """
+        record = ticker_index.lookup(field, value, self.get_session)
+        if record is None:
+            session = self.get_session()
+            try:
+                row = session.query(TickerTable).filter(getattr(TickerTable, field) == value).first()
+            finally:
+                session.close()
+            if row is not None:
+                ticker_index.invalidate()
+                record = record_from_row(row)
+        return record
+
+    def get_record_by_ticker(self, ticker: str) -> dict:
+        # unknown tickers are loaded by one shares() sync, tickers missing from it are fetched one by one
+        record = self.get_record("ticker", ticker)
+        if record is None:
+            self.sync_if_due()
+            record = self.get_record("ticker", ticker)
+        if record is None:
+            self.update_cache(ticker)
+            record = self.get_record("ticker", ticker)
+        return record
+
     def get_uid_by_ticker(self, ticker: str) -> str:
-        data = self.update_cache(ticker)
-        return json.loads(data)["uid"]
+        return self.get_record_by_ticker(ticker)["uid"]
 
     def get_figi_by_ticker(self, ticker: str) -> str:
-        data = self.update_cache(ticker)
-        return json.loads(data)["figi"]
+        return self.get_record_by_ticker(ticker)["figi"]
 
     def get_ticker_by_uid(self, uid: str) -> str:
-        for ticker in all_tickers:
-            data = json.loads(self.update_cache(ticker))
-            if data["uid"] == uid:
-                return ticker
-
-
-db = TickerTableDBManager()
+        record = self.get_record("uid", uid)
+        if record is None:
+            self.sync_if_due()
+            record = self.get_record("uid", uid)
+        if record is None:
+            # load the tickers that are not in the table yet
+            known = ticker_index.maps(self.get_session)["ticker"]
+            for ticker in all_tickers:
+                if ticker not in known:
+                    self.update_cache(ticker)
+            record = self.get_record("uid", uid)
+        return record["ticker"] if record else None
+
+# db = TickerTableDBManager()
 # print(db.update_cache("OZON"))
 # print(db.get_uid_by_ticker("T"))
-print(db.get_ticker_by_uid("T"))
+# print(db.get_ticker_by_uid("T"))
+# print(db.sync_all())
@@ -3,7 +3,7 @@ import json
 from bs4 import BeautifulSoup
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
+from services import http_client
 import logging
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel
@@ -40,7 +40,7 @@ class ParsePE(BaseModel):
 
         try:
             url = f"https://smart-lab.ru/q/{ticker}/MSFO/p_e/"
-            response = requests.get(url)
+            response = http_client.get(url)
             response.raise_for_status()
             html = response.text
 
@@ -1,10 +1,10 @@
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-import json
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from models.db_model import SessionLocal, PECache, SectorPECache
+from models.cache_codec import encode_cache, decode_cache
 from .parse_pe import ParsePE
 
 logger = logging.getLogger(__name__)
@@ -40,7 +40,7 @@ class PeDBManager(BaseModel):
             if record:
                 age = datetime.now() - record.timestamp
                 if age < self.cache_duration:
-                    result = json.loads(record.data)
+                    result = decode_cache(record.data)
                     return self._rename_pe_field(result)
                 else:
                     return self.update_company_pe(ticker)
@@ -62,7 +62,7 @@ class PeDBManager(BaseModel):
             if record:
                 age = datetime.now() - record.timestamp
                 if age < self.cache_duration:
-                    result = json.loads(record.data)
+                    result = decode_cache(record.data)
                     return self._rename_pe_field(result)
                 else:
                     return self.update_sector_pe(sector)
@@ -137,7 +137,7 @@ class PeDBManager(BaseModel):
     def save_company_pe(self, ticker: str, data: dict) -> None:
         session = self.get_session()
         try:
-            record = PECache(ticker=ticker, data=json.dumps(data, default=str), timestamp=datetime.now())
+            record = PECache(ticker=ticker, data=encode_cache(data), timestamp=datetime.now())
             session.merge(record)
             session.commit()
         finally:
@@ -146,13 +146,13 @@ class PeDBManager(BaseModel):
     def save_sector_pe(self, sector: str, data: dict) -> None:
         session = self.get_session()
         try:
-            record = SectorPECache(sector=sector, data=json.dumps(data, default=str), timestamp=datetime.now())
+            record = SectorPECache(sector=sector, data=encode_cache(data), timestamp=datetime.now())
             session.merge(record)
             session.commit()
         finally:
             session.close()
 
-    def clear_outdated_cache(self) -> None:
+    def clear_outdated_cache(self) -> int:
         """
         Удаляет записи, добавленные более 3 месяцев назад.
         """
@@ -163,11 +163,12 @@ class PeDBManager(BaseModel):
             deleted_sectors = session.query(SectorPECache).filter(SectorPECache.timestamp < outdated_time).delete()
             session.commit()
             logger.debug(f"Deleted {deleted_companies} old company PE records and {deleted_sectors} old sector records.")
+            return deleted_companies + deleted_sectors
         finally:
             session.close()
 
 
-man = PeDBManager()
+# man = PeDBManager()
 
-print(man.get_company_pe("SBER"))
-print(man.get_sector_mean_pe("banks"))
+# print(man.get_company_pe("SBER"))
+# print(man.get_sector_mean_pe("banks"))
@@ -0,0 +1,81 @@
+# formatting of raw cached values at the response edge: {"field": {"value": "1 234", "unit": "млрд руб"}}
+from typing import Any, Dict
+
+# поле: (единица, делитель)
+FIELD_FORMATS = {
+    # мультипликаторы (GetAssetFundamentals)
+    "market_capitalization": ("млрд руб", 1e9),
+    "ticker": ("", 1),
+    "currency": ("", 1),
+    "high_price_last_52_weeks": ("руб", 1),
+    "low_price_last_52_weeks": ("руб", 1),
+    "average_daily_volume_last_10_days": ("шт", 1),
+    "average_daily_volume_last_4_weeks": ("шт", 1),
+    "beta": ("", 1),
+    "free_float": ("%", 1),
+    "forward_annual_dividend_yield": ("%", 1),
+    "shares_outstanding": ("млн", 1e6),
+    "revenue_ttm": ("млрд руб", 1e9),
+    "ebitda_ttm": ("млрд руб", 1e9),
+    "net_income_ttm": ("млрд руб", 1e9),
+    "eps_ttm": ("руб", 1),
+    "pe_ratio_ttm": ("", 1),
+    "price_to_sales_ttm": ("", 1),
+    "price_to_book_ttm": ("", 1),
+    "total_enterprise_value_mrq": ("млрд руб", 1e9),
+    "ev_to_ebitda_mrq": ("", 1),
+    "roe": ("%", 1),
+    "roa": ("%", 1),
+    "roic": ("%", 1),
+    "total_debt_to_equity_mrq": ("", 1),
+    "total_debt_to_ebitda_mrq": ("", 1),
+    "current_ratio_mrq": ("", 1),
+    "five_years_average_dividend_yield": ("%", 1),
+    "dividend_payout_ratio_fy": ("%", 1),
+    "buy_back_ttm": ("млрд руб", 1e9),
+    "one_year_annual_revenue_growth_rate": ("%", 1),
+    "revenue_change_five_years": ("%", 1),
+    "eps_change_five_years": ("%", 1),
+    "ev_to_sales": ("", 1),
+    "ex_dividend_date": ("", 1),
+    # дивиденды (GetDividends)
+    "dividend_net": ("руб", 1),
+    "yield_value": ("%", 1),
+    "close_price": ("руб", 1),
+    "payment_date": ("", 1),
+    "declared_date": ("", 1),
+    "last_buy_date": ("", 1),
+    "record_date": ("", 1),
+    "dividend_type": ("", 1),
+    "regularity": ("", 1),
+    "created_at": ("", 1),
+}
+
+
+def format_value(value: Any, divisor: float) -> str:
+    """float: 2 знака, с делителем: целое с пробелами между тысячами, остальное строкой"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if divisor != 1:
+            return f"{value / divisor:,.0f}".replace(",", " ")
+        return str(value) if isinstance(value, int) else f"{value:.2f}"
+    return str(value)
+
+
+def present(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Сырые значения {поле: значение} в формат ответа {поле: {"value": строка, "unit": единица}}.
+    Поля без формата и пустые значения пропускаются.
+    """
+    result = {}
+    for key, value in data.items():
+        if key in FIELD_FORMATS and value is not None:
+            unit, divisor = FIELD_FORMATS[key]
+            result[key] = {"value": format_value(value, divisor), "unit": unit}
+    return result
+
+
+def is_presented(data: Any) -> bool:
+    """True для данных уже в формате ответа (строки кэша до хранения сырых значений)"""
+    return isinstance(data, dict) and any(isinstance(value, dict) and set(value) == {"value", "unit"} for value in data.values())
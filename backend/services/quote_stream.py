@@ -0,0 +1,182 @@
+# live quotes for all_tickers and IMOEX from one shared T-api last price stream and one IMOEX poller
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi.concurrency import run_in_threadpool
+from tinkoff.invest import AsyncClient, LastPriceInstrument
+from tinkoff.invest.utils import quotation_to_decimal
+
+from services.imoex_change import get_imoex_quote
+from services.paper_data.total_tickers import all_tickers
+from services.share_price import quote_service, db_manager, TOKEN
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+IMOEX = "IMOEX"
+IMOEX_POLL_INTERVAL = 5  # seconds
+HEARTBEAT_INTERVAL = 15  # seconds, keeps proxies from closing idle connections
+RECONNECT_DELAY = 5  # seconds
+
+
+class LatestUpdates:
+    """
+    Mailbox of one client: only the newest update per ticker is kept.
+    A slow client skips intermediate ticks instead of buffering them, so its memory is bounded by the number of tickers.
+    """
+
+    def __init__(self):
+        self._updates: dict[str, dict] = {}
+        self._ready = asyncio.Event()
+
+    def put(self, key: str, update: dict) -> None:
+        self._updates.pop(key, None)  # re-insert, so updates are delivered in the order of their last change
+        self._updates[key] = update
+        self._ready.set()
+
+    async def get(self, timeout: float | None = None) -> list:
+        """Waits for updates and takes all of them, [] on timeout"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        updates = list(self._updates.values())
+        self._updates.clear()
+        self._ready.clear()
+        return updates
+
+
+class QuoteStreamHub:
+    """
+    Fans out quote updates to SSE clients.
+    All tickers share one MarketDataStream last price subscription and IMOEX one poller, however many clients are connected.
+    Both run only while somebody listens. Prices are recorded in quote_service, so polling endpoints reuse them.
+    """
+
+    def __init__(self, tickers: list | None = None):
+        self.tickers = tickers or all_tickers
+        self._clients: set[LatestUpdates] = set()
+        self._latest: dict[str, dict] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._reload: asyncio.Task | None = None
+
+    @asynccontextmanager
+    async def subscribe(self):
+        """Yields the mailbox of a new client, pre-filled with the latest known quotes"""
+        client = LatestUpdates()
+        for key, update in self._latest.items():
+            client.put(key, update)
+        self._clients.add(client)
+        self._ensure_running()
+        try:
+            yield client
+        finally:
+            self._clients.discard(client)
+            if not self._clients:
+                await self.close()
+
+    def publish(self, key: str, quote: dict) -> None:
+        update = {"ticker": key, **quote}
+        if self._latest.get(key) == update:
+            return
+        self._latest[key] = update
+        for client in self._clients:
+            client.put(key, update)
+
+    ################# upstream #####################
+    def _ensure_running(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run_prices()), asyncio.create_task(self._run_imoex())]
+
+    async def _load_quotes(self) -> None:
+        """Loads current quotes and closes of the tickers in one call each and publishes them"""
+        quotes = await run_in_threadpool(quote_service.get_quotes, self.tickers)
+        for ticker, quote in quotes.items():
+            self.publish(ticker, quote)
+
+    async def _reload_quotes(self) -> None:
+        try:
+            await self._load_quotes()
+        except Exception as e:
+            logger.error(f"Quote stream: reloading quotes failed: {e}")
+
+    async def _load_figis(self) -> dict:
+        """{figi: ticker} of the tickers, also loads current quotes and closes"""
+        await self._load_quotes()
+        figis = {}
+        for ticker in self.tickers:
+            try:
+                figis[await run_in_threadpool(db_manager.get_figi_by_ticker, ticker)] = ticker
+            except Exception as e:
+                logger.error(f"Quote stream: no figi for {ticker}: {e}")
+        return figis
+
+    def on_last_price(self, ticker: str, price: float) -> None:
+        """
+        Publishes the streamed price, its quote comes from memory so the event loop never waits for T-api.
+        After a session rollover closes are reloaded in the threadpool and the quotes are published again.
+        """
+        quote_service.record_price(ticker, price)
+        if quote_service.close_due(ticker) and (self._reload is None or self._reload.done()):
+            self._reload = asyncio.create_task(self._reload_quotes())
+        quote = quote_service.quote(ticker)
+        if quote:
+            self.publish(ticker, quote)
+
+    async def _run_prices(self) -> None:
+        while True:
+            try:
+                figis = await self._load_figis()
+                async with AsyncClient(TOKEN) as client:
+                    stream = client.create_market_data_stream()
+                    stream.last_price.subscribe([LastPriceInstrument(figi=figi) for figi in figis])
+                    async for marketdata in stream:
+                        last_price = marketdata.last_price
+                        if last_price and last_price.figi in figis:
+                            self.on_last_price(figis[last_price.figi], float(quotation_to_decimal(last_price.price)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Quote stream: last price stream failed: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _run_imoex(self) -> None:
+        while True:
+            try:
+                self.publish(IMOEX, await run_in_threadpool(get_imoex_quote))
+            except Exception as e:
+                logger.error(f"Quote stream: IMOEX poll failed: {e}")
+            await asyncio.sleep(IMOEX_POLL_INTERVAL)
+
+    async def close(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        if self._reload is not None:
+            tasks.append(self._reload)
+            self._reload = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def format_event(update: dict) -> str:
+    return f"event: quote\ndata: {json.dumps(update)}\n\n"
+
+
+async def quote_events(hub: "QuoteStreamHub"):
+    """SSE body: one `quote` event per update, a comment line as heartbeat"""
+    async with hub.subscribe() as client:
+        while True:
+            updates = await client.get(timeout=HEARTBEAT_INTERVAL)
+            if not updates:
+                yield ": heartbeat\n\n"
+            for update in updates:
+                yield format_event(update)
+
+
+quote_hub = QuoteStreamHub()
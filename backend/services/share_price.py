@@ -1,23 +1,146 @@
-from tinkoff.invest import Client, Quotation
+import threading
+import time
+from collections import deque
+from datetime import date
+
+from tinkoff.invest import InstrumentClosePriceRequest
 from tinkoff.invest.utils import quotation_to_decimal
 from dotenv import load_dotenv
+import logging
 import os
 
 from services.paper_data.ticker_table_db import TickerTableDBManager
+from services.tinkoff_client import tinkoff_client
+
 
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 TOKEN = os.environ["INVEST_TOKEN"]
 db_manager = TickerTableDBManager()  # ticker-figi-uid table
 
 
+QUOTE_TTL = 3  # seconds a price is served from memory
+HISTORY_SIZE = 64  # prices kept per ticker
+CLOSES_RETRY = 60  # seconds before loading closes again after a failure
+
+
+def get_last_prices(figis: list) -> dict:
+    """{figi: last price} of all figis from one GetLastPrices call"""
+    with tinkoff_client.services() as client:
+        response = client.market_data.get_last_prices(figi=figis)
+    return {last_price.figi: float(quotation_to_decimal(last_price.price)) for last_price in response.last_prices}
+
+
+def get_close_prices(figis: list) -> dict:
+    """{figi: close price of the previous session} of all figis from one GetClosePrices call"""
+    with tinkoff_client.services() as client:
+        response = client.market_data.get_close_prices(instruments=[InstrumentClosePriceRequest(instrument_id=figi) for figi in figis])
+    return {close_price.figi: float(quotation_to_decimal(close_price.price)) for close_price in response.close_prices}
+
+
+class QuoteService:
+    """
+    Per-ticker quotes served from memory.
+    Every ticker has a ring buffer of its last prices (monotonic time, price). A price younger than ttl is served as is,
+    older ones are refreshed for all requested tickers with one GetLastPrices call.
+    Changes are computed against the previous session close, or the ticker's own previous print if the close is unknown.
+    Closes are reloaded once the day changes, however fresh the prices are.
+    """
+
+    def __init__(self, ttl: float = QUOTE_TTL, history_size: int = HISTORY_SIZE):
+        self.ttl = ttl
+        self.history_size = history_size
+        self._history: dict[str, deque] = {}
+        self._prev_close: dict[str, tuple[date, float | None]] = {}  # ticker -> (day it was loaded, close)
+        self._closes_retry_at = 0.0  # monotonic time, closes are not requested before it after a failure
+        self._lock = threading.Lock()  # one refresh at a time, waiting callers reuse its prices
+
+    def record_price(self, ticker: str, price: float, at: float | None = None) -> None:
+        history = self._history.setdefault(ticker, deque(maxlen=self.history_size))
+        history.append((time.monotonic() if at is None else at, price))
+
+    def history(self, ticker: str) -> list:
+        return list(self._history.get(ticker, ()))
+
+    def _is_fresh(self, ticker: str, now: float) -> bool:
+        history = self._history.get(ticker)
+        return bool(history) and now - history[-1][0] < self.ttl
+
+    def close_due(self, ticker: str, now: float | None = None) -> bool:
+        """True if the previous close of the ticker was not loaded today"""
+        now = time.monotonic() if now is None else now
+        return self._prev_close.get(ticker, (None,))[0] != date.today() and now >= self._closes_retry_at
+
+    def _figis(self, tickers: list) -> dict:
+        figis = {}
+        for ticker in tickers:
+            try:
+                figis[ticker] = db_manager.get_figi_by_ticker(ticker)
+            except Exception as e:
+                logger.error(f"No figi for {ticker}: {e}")
+        return {ticker: figi for ticker, figi in figis.items() if figi}
+
+    def _refresh(self, tickers: list) -> None:
+        with self._lock:
+            now = time.monotonic()
+            figis = self._figis([ticker for ticker in tickers if not self._is_fresh(ticker, now) or self.close_due(ticker, now)])
+            stale = {ticker: figi for ticker, figi in figis.items() if not self._is_fresh(ticker, now)}
+            if stale:
+                prices = get_last_prices(list(dict.fromkeys(stale.values())))
+                for ticker, figi in stale.items():
+                    if figi in prices:
+                        self.record_price(ticker, prices[figi], now)
+            self._refresh_closes(figis)
+
+    def _refresh_closes(self, figis: dict) -> None:
+        today = date.today()
+        missing = {ticker: figi for ticker, figi in figis.items() if self.close_due(ticker)}
+        if not missing:
+            return
+        try:
+            closes = get_close_prices(list(dict.fromkeys(missing.values())))
+        except Exception as e:
+            logger.error(f"Error fetching close prices: {e}")
+            self._closes_retry_at = time.monotonic() + CLOSES_RETRY
+            return
+        # a ticker without a close (e.g. a new listing) is not asked again until tomorrow
+        for ticker, figi in missing.items():
+            self._prev_close[ticker] = (today, closes.get(figi) or None)
+
+    def quote(self, ticker: str) -> dict | None:
+        """Quote from memory only (no T-api call), None if the ticker has no price yet"""
+        history = self._history.get(ticker)
+        if not history:
+            return None
+        current_price = history[-1][1]
+        base = self._prev_close.get(ticker, (None, None))[1]
+        if base is None:
+            # the previous different print of the ticker
+            base = next((price for _, price in reversed(history) if price != current_price), current_price)
+
+        abs_change = current_price - base
+        percent_change = (abs_change / base) * 100 if base else 0.0
+        return {"price": round(current_price, 2), "abs_change": round(abs_change, 2), "percent_change": round(percent_change, 2)}
+
+    def get_quotes(self, tickers: list) -> dict:
+        """{ticker: price/abs_change/percent_change}, tickers without a figi or a price are skipped"""
+        now = time.monotonic()
+        if not all(self._is_fresh(ticker, now) and not self.close_due(ticker, now) for ticker in tickers):
+            self._refresh(tickers)
+        quotes = {ticker: self.quote(ticker) for ticker in tickers}
+        return {ticker: quote for ticker, quote in quotes.items() if quote is not None}
+
+
+quote_service = QuoteService()
+
+
 def get_realtime_quote(ticker: str) -> dict:
     """
-    Получает текущие котировки акции и рассчитывает изменения.
+    Получает текущие котировки акции и рассчитывает изменения (см. QuoteService).
 
     Args:
-        figi (str): FIGI акции (например, 'BBG004730N88')
-        token (str): API-токен Tinkoff Invest
+        ticker (str): тикер акции (например, 'SBER')
 
     Returns:
         dict: {
@@ -26,26 +149,15 @@ def get_realtime_quote(ticker: str) -> dict:
             'percent_change': изменение в процентах
         }
     """
+    return quote_service.get_quotes([ticker]).get(ticker, {})
 
-    figi: str = db_manager.get_figi_by_ticker(ticker)
-    if not figi:
-        return {}
-
-    # кеширование предыдущей цены в атрибуте функции
-    if not hasattr(get_realtime_quote, "prev_price"):
-        get_realtime_quote.prev_price = None
-
-    with Client(TOKEN) as client:
-        response = client.market_data.get_last_prices(figi=[figi])
-        current_price = float(quotation_to_decimal(response.last_prices[0].price))
-
-    abs_change = 0.0
-    percent_change = 0.0
 
-    if get_realtime_quote.prev_price is not None:
-        abs_change = current_price - get_realtime_quote.prev_price
-        percent_change = (abs_change / get_realtime_quote.prev_price) * 100
-
-    get_realtime_quote.prev_price = current_price
+def get_realtime_quotes(tickers: list) -> dict:
+    """
+    Котировки нескольких акций одним запросом GetLastPrices.
 
-    return {"price": round(current_price, 2), "abs_change": round(abs_change, 2), "percent_change": round(percent_change, 2)}
+    Returns:
+        dict: {"SBER": {'price': ..., 'abs_change': ..., 'percent_change': ...}, ...}
+        Тикеры без figi или без цены пропускаются.
+    """
+    return quote_service.get_quotes(tickers)
@@ -0,0 +1,138 @@
+# one long-lived T-api gRPC channel per process (sync and async) instead of a new Client(TOKEN) per call
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from dotenv import load_dotenv
+from tinkoff.invest import AsyncClient, Client
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+TOKEN = os.environ["INVEST_TOKEN"]
+
+# gRPC status codes after which the channel is dropped and the next call reconnects
+RECONNECT_CODES = {"UNAVAILABLE"}
+
+
+def is_channel_error(error: Exception) -> bool:
+    # RequestError of tinkoff.invest has .code, grpc.RpcError has .code()
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if getattr(code, "name", None) in RECONNECT_CODES:
+        return True
+    return isinstance(error, ValueError) and "closed channel" in str(error)
+
+
+class TinkoffClient:
+    """
+    Shared T-api services stubs.
+    services() / async_services() are drop-in for `with Client(TOKEN) as client` / `async with AsyncClient(TOKEN) as client`,
+    but the channel is opened once and kept. A call failing with a channel error drops the channel, the next one reconnects.
+    Only the channel the failed call used is dropped, a channel reopened meanwhile by another call is kept.
+    The async channel belongs to the event loop it was opened in, another loop gets its own.
+    """
+
+    def __init__(self, token: str = TOKEN, client=None, async_client=None):
+        self.token = token
+        self._client_factory = client or Client
+        self._async_client_factory = async_client or AsyncClient
+        self._client = None  # (Client, its services)
+        self._async_client = None  # (AsyncClient, its services)
+        self._async_loop = None  # loop of the async channel
+        self._async_lock: asyncio.Lock | None = None
+        self._lock = threading.Lock()
+        self.connects = 0  # channels opened, sync and async
+
+    ################# sync #####################
+    def _connect(self) -> tuple:
+        """(Client, its services) of the current channel, opened if there is none"""
+        with self._lock:
+            if self._client is None:
+                client = self._client_factory(self.token)
+                self._client = (client, client.__enter__())
+                self.connects += 1
+                logger.debug("T-api: sync channel opened")
+            return self._client
+
+    def _drop(self, client: tuple | None = None) -> None:
+        """Closes the channel if it is still the current one (any current one if client is None)"""
+        with self._lock:
+            if client is None:
+                client = self._client
+            if client is None or self._client is not client:
+                return
+            self._client = None
+        try:
+            client[0].__exit__(None, None, None)
+        except Exception as e:
+            logger.error(f"T-api: closing sync channel failed: {e}")
+
+    @contextmanager
+    def services(self):
+        client = self._client or self._connect()
+        try:
+            yield client[1]
+        except Exception as e:
+            if is_channel_error(e):
+                logger.error(f"T-api: sync channel failed, reconnecting on next call: {e}")
+                self._drop(client)
+            raise
+
+    ################# async #####################
+    async def _aconnect(self) -> tuple:
+        """(AsyncClient, its services) of the current channel of the running loop, opened if there is none"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # a channel opened in another (finished) loop can't be used here
+            self._async_loop, self._async_lock, self._async_client = loop, asyncio.Lock(), None
+        async with self._async_lock:
+            if self._async_client is None:
+                client = self._async_client_factory(self.token)
+                self._async_client = (client, await client.__aenter__())
+                self.connects += 1
+                logger.debug("T-api: async channel opened")
+            return self._async_client
+
+    async def _adrop(self, client: tuple | None = None) -> None:
+        """Closes the async channel if it is still the current one (any current one if client is None)"""
+        if client is None:
+            client = self._async_client
+        if client is None or self._async_client is not client:
+            return
+        self._async_client = None
+        if self._async_loop is asyncio.get_running_loop():
+            try:
+                await client[0].__aexit__(None, None, None)
+            except Exception as e:
+                logger.error(f"T-api: closing async channel failed: {e}")
+
+    @asynccontextmanager
+    async def async_services(self):
+        client = await self._aconnect()
+        try:
+            yield client[1]
+        except Exception as e:
+            if is_channel_error(e):
+                logger.error(f"T-api: async channel failed, reconnecting on next call: {e}")
+                await self._adrop(client)
+            raise
+
+    ################# lifespan #####################
+    async def start(self) -> None:
+        """Opens both channels up front, so the first requests don't pay for the handshake"""
+        self._connect()
+        await self._aconnect()
+
+    async def close(self) -> None:
+        self._drop()
+        await self._adrop()
+
+
+tinkoff_client = TinkoffClient()
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import cache_codec
+from models.cache_codec import codecs, available_codecs, encode_cache, decode_cache
+from models.db_model import Base, DividendsCache, IchimokuIndexCache
+from models.db_migrations import migrate_cache_blobs
+
+DATA = {"ticker": "SBER", "rows": [{"time": 1, "close": 301.5, "tenkanSen": None}], "date": datetime(2024, 1, 2), "name": "Сбербанк"}
+EXPECTED = json.loads(json.dumps(DATA, default=str))
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_codec_roundtrip(name):
+    blob = codecs[name].encode(DATA)
+    assert blob[0] == codecs[name].header[0]
+    assert decode_cache(blob) == EXPECTED
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_unsupported_types_are_not_stringified(name):
+    with pytest.raises(TypeError):
+        codecs[name].encode({"price": Decimal("1.5")})
+
+
+def test_json_zlib_is_always_available():
+    assert "json+zlib" in available_codecs()
+
+
+def test_unknown_codec_in_env(monkeypatch):
+    monkeypatch.setenv("CACHE_CODEC", "bzip9")
+    with pytest.raises(ValueError):
+        cache_codec.default_codec()
+
+
+def test_legacy_json_text_is_decoded():
+    assert decode_cache(json.dumps(DATA, default=str)) == EXPECTED
+    assert decode_cache(json.dumps(DATA, default=str).encode()) == EXPECTED
+
+
+def test_encoded_blob_is_smaller():
+    rows = [{"time": i, "open": 100.0 + i, "close": 101.0 + i, "tenkanSen": 100.5 + i} for i in range(1000)]
+    assert len(encode_cache(rows)) * 2 < len(json.dumps(rows))
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    yield engine, sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_cache_column_stores_blobs_and_legacy_text(session_factory):
+    engine, Session = session_factory
+    session = Session()
+    session.add(DividendsCache(ticker="NEW", data=encode_cache(DATA), timestamp=datetime.now()))
+    session.add(DividendsCache(ticker="OLD", data=json.dumps(DATA, default=str), timestamp=datetime.now()))
+    session.commit()
+    session.close()
+
+    session = Session()
+    rows = {row.ticker: row.data for row in session.query(DividendsCache)}
+    session.close()
+    assert isinstance(rows["NEW"], bytes)
+    assert decode_cache(rows["NEW"]) == decode_cache(rows["OLD"]) == EXPECTED
+
+
+def test_migrate_cache_blobs(session_factory):
+    engine, Session = session_factory
+    with engine.begin() as connection:
+        for ticker in ["SBER", "GAZP"]:
+            connection.execute(
+                text("INSERT INTO ichimoku_index_cache (ticker, period, data, timestamp) VALUES (:ticker, 'W', :data, :timestamp)"),
+                {"ticker": ticker, "data": json.dumps(DATA, default=str), "timestamp": datetime.now()},
+            )
+
+    assert migrate_cache_blobs(engine) == 2
+    assert migrate_cache_blobs(engine) == 0
+
+    session = Session()
+    entries = session.query(IchimokuIndexCache).all()
+    session.close()
+    assert all(isinstance(entry.data, bytes) and decode_cache(entry.data) == EXPECTED for entry in entries)
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.db_model import Base, IchimokuIndexCache
+from services.cache_janitor import CacheJanitor, default_sweeps
+from services.ichimoku import ichimoku_db
+
+
+def test_sweep_collects_metrics_and_survives_failures():
+    def broken():
+        raise RuntimeError("database is locked")
+
+    janitor = CacheJanitor({"a": lambda: 3, "b": broken, "c": lambda: None})
+    assert janitor.sweep() == {"a": 3, "c": 0}
+    janitor.sweep()
+    assert janitor.metrics["runs"] == 2
+    assert janitor.metrics["errors"] == 2
+    assert janitor.metrics["deleted"] == {"a": 6, "c": 0}
+    assert janitor.metrics["last_deleted"] == {"a": 3, "c": 0}
+    assert janitor.metrics["last_run"] is not None
+
+
+def test_runs_on_schedule_until_stopped():
+    calls = []
+    janitor = CacheJanitor({"a": lambda: calls.append(1) or 1}, interval=0.05)
+
+    async def scenario():
+        janitor.start()
+        await asyncio.sleep(0.22)
+        await janitor.stop()
+        stopped_at = len(calls)
+        await asyncio.sleep(0.1)
+        return stopped_at
+
+    stopped_at = asyncio.run(scenario())
+    assert 3 <= stopped_at <= 6
+    assert len(calls) == stopped_at
+
+
+def test_default_sweeps_cover_every_cache_table():
+    names = set(default_sweeps())
+    assert {"ticker_table", "paper_data_cache", "multiplicators_cache", "dividends_cache", "pe_cache"} <= names
+    assert {f"ichimoku_index_cache:{period}" for period in ["D", "3D", "W", "M", "3M", "Y"]} <= names
+
+
+def test_ichimoku_sweep_keeps_servable_stale_entries(monkeypatch):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(ichimoku_db, "SessionLocal", Session)
+
+    session = Session()
+    for ticker, period, age in [("SBER", "D", 2), ("SBER", "M", 2), ("SBER", "Y", 8)]:
+        session.add(IchimokuIndexCache(ticker=ticker, period=period, data=b"[]", timestamp=datetime.now() - timedelta(days=age)))
+    session.commit()
+    session.close()
+
+    deleted = CacheJanitor({name: sweep for name, sweep in default_sweeps().items() if name.startswith("ichimoku")}).sweep()
+    assert sum(deleted.values()) == 2
+
+    session = Session()
+    assert [(entry.ticker, entry.period) for entry in session.query(IchimokuIndexCache)] == [("SBER", "M")]
+    session.close()
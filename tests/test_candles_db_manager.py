@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models.db_model import Base, IchimokuCandles
+from services.ichimoku.candles_db import CandlesDbManager
+
+engine = create_engine("sqlite:///:memory:")
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_candles(start: int, count: int, close: float = 100.0) -> list:
+    return [
+        {"time": START + timedelta(days=i), "open": close, "close": close, "high": close + 1, "low": close - 1, "volume": i}
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def override_session(monkeypatch):
+    monkeypatch.setattr(CandlesDbManager, "get_session", lambda self: TestSessionLocal())
+    yield
+    session = TestSessionLocal()
+    session.query(IchimokuCandles).delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def store():
+    return CandlesDbManager(figi="FIGI", interval="CANDLE_INTERVAL_DAY")
+
+
+def test_get_last_time_empty(store):
+    assert store.get_last_time() is None
+    assert store.get_candles(START) == []
+
+
+def test_save_and_get_candles(store):
+    store.save_candles(make_candles(0, 5))
+    assert store.get_last_time() == START + timedelta(days=4)
+    candles = store.get_candles(START + timedelta(days=2))
+    assert [c["time"] for c in candles] == [START + timedelta(days=i) for i in range(2, 5)]
+    assert candles[0]["volume"] == 2
+
+
+def test_save_candles_overwrites_last_candle(store):
+    store.save_candles(make_candles(0, 3))
+    store.save_candles(make_candles(2, 2, close=200.0))
+    candles = store.get_candles(START)
+    assert len(candles) == 4
+    assert candles[2]["close"] == 200.0
+
+
+def test_candles_are_separated_by_interval(store):
+    store.save_candles(make_candles(0, 3))
+    other = CandlesDbManager(figi="FIGI", interval="CANDLE_INTERVAL_HOUR")
+    assert other.get_last_time() is None
+
+
+def test_clear_outdated_candles(store):
+    store.save_candles(make_candles(0, 5))
+    store.clear_outdated_candles(START + timedelta(days=3))
+    assert [c["volume"] for c in store.get_candles(START)] == [3, 4]
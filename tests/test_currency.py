@@ -3,6 +3,7 @@ from datetime import date
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..models.db_model import Base, CurrencyRates
+from ..services import cbr_currency
 from ..services.cbr_currency import Currency
 
 TEST_ENGINE = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
@@ -10,8 +11,6 @@ TestingSessionLocal = sessionmaker(bind=TEST_ENGINE)
 Base.metadata.create_all(bind=TEST_ENGINE)
 Currency.cache_db.__globals__["SessionLocal"] = TestingSessionLocal
 
-import requests
-
 
 def dummy_get(url):
     class DummyResponse:
@@ -44,7 +43,9 @@ def dummy_get(url):
     return DummyResponse()
 
 
-requests.get = dummy_get
+@pytest.fixture(autouse=True)
+def fake_http(monkeypatch):
+    monkeypatch.setattr(cbr_currency.http_client, "get", dummy_get)
 
 
 @pytest.fixture
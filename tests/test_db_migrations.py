@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models.db_model import Base, TickerTable
+from models.db_migrations import migrate_ticker_table
+
+
+def test_migrate_ticker_table():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    sber = {"ticker": "SBER", "figi": "BBG004730N88", "uid": "uid_sber", "isin": "RU0009029540", "currency": "rub"}
+    gazp = {"ticker": "GAZP", "figi": "BBG004730RP0", "uid": "uid_gazp", "isin": "", "currency": "rub"}
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE uid_figi_ticker_table (ticker VARCHAR PRIMARY KEY, data TEXT, timestamp DATETIME)"))
+        rows = [
+            ("SBER", json.dumps(json.dumps(sber))),  # double encoded by the old update_cache
+            ("GAZP", json.dumps(gazp)),
+            ("DUPE", json.dumps({**sber, "ticker": "DUPE"})),  # clashes with SBER figi
+            ("NONE", json.dumps(None)),
+        ]
+        for ticker, data in rows:
+            connection.execute(
+                text("INSERT INTO uid_figi_ticker_table VALUES (:ticker, :data, :timestamp)"),
+                {"ticker": ticker, "data": data, "timestamp": datetime(2025, 1, 2, 3, 4, 5)},
+            )
+
+    assert migrate_ticker_table(engine) == 2
+    assert migrate_ticker_table(engine) == 0
+
+    session = sessionmaker(bind=engine)()
+    rows = {row.ticker: row for row in session.query(TickerTable)}
+    session.close()
+    assert sorted(rows) == ["GAZP", "SBER"]
+    assert rows["SBER"].figi == "BBG004730N88" and rows["SBER"].uid == "uid_sber"
+    assert rows["GAZP"].isin is None
+    assert rows["SBER"].timestamp == datetime(2025, 1, 2, 3, 4, 5)
+
+
+def test_migrate_without_legacy_table():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    assert migrate_ticker_table(engine) == 0
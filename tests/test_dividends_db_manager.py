@@ -5,10 +5,11 @@ from unittest.mock import patch, MagicMock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models.db_model import Base, DividendsCache
+from models.cache_codec import decode_cache
 from services.paper_data.ticker_table_db import TickerTableDBManager
 from services.dividends.dividends_db import DividendsDBManager
 
-MOCK_DIVIDEND_DATA = {"dividend_yield_daily_ttm": {"value": "10.50", "unit": "%"}, "payment_date": {"value": "2024-07-21", "unit": ""}}
+MOCK_DIVIDEND_DATA = {"yield_value": 10.5, "payment_date": "2024-07-21 00:00:00+00:00", "five_years_average_dividend_yield": 8.75}
 engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=engine)
 Base.metadata.create_all(bind=engine)
@@ -25,7 +26,7 @@ def test_db_session():
 def mock_dividends_manager(test_db_session):
     mock_ticker_db_manager = MagicMock(spec=TickerTableDBManager)
     mock_ticker_db_manager.get_figi_by_ticker.return_value = "dummy_figi"
-    with patch("services.dividends.dividends_db.get_extended_dividend_data_by_ticker", return_value=MOCK_DIVIDEND_DATA), patch.object(
+    with patch("services.dividends.dividends_db.get_raw_extended_dividend_data_by_ticker", return_value=MOCK_DIVIDEND_DATA), patch.object(
         DividendsDBManager, "get_session", return_value=test_db_session
     ):
         manager = DividendsDBManager()
@@ -46,7 +47,7 @@ def test_save_cache(mock_dividends_manager, test_db_session):
     mock_dividends_manager.save_cache(ticker, data)
     cache_record = test_db_session.query(DividendsCache).filter(DividendsCache.ticker == ticker).first()
     assert cache_record is not None
-    assert json.loads(cache_record.data) == data
+    assert decode_cache(cache_record.data) == data
     assert (datetime.now() - cache_record.timestamp).total_seconds() < 10
 
 
@@ -2,16 +2,16 @@ import json
 import pytest
 from unittest.mock import patch, MagicMock, Mock
 from datetime import datetime, timedelta
-from services.dividends.dividends import get_extended_dividend_data_by_ticker, get_dividend_data_by_ticker
+from services.dividends.dividends import get_extended_dividend_data_by_ticker, get_dividend_data_by_ticker, get_raw_extended_dividend_data_by_ticker
 from services.multiplicators.multiplicators import Multiplicators
 from models.models import Quotation
 
 
 @pytest.fixture
 def mock_client():
-    with patch("services.dividends.dividends.Client") as mock:
+    with patch("services.dividends.dividends.tinkoff_client") as mock:
         client_instance = Mock()
-        mock.return_value.__enter__.return_value = client_instance
+        mock.services.return_value.__enter__.return_value = client_instance
         yield client_instance
 
 
@@ -27,9 +27,10 @@ def mock_multiplicators():
     with patch("services.dividends.dividends.Multiplicators") as mock:
         mock_instance = Mock()
         mock.return_value = mock_instance
-        mock_instance.get_divs_from_multiplicator_data_from_api.return_value = {
-            "dividend_yield_daily_ttm": {"value": "10.49", "unit": "%"},
-            "five_years_average_dividend_yield": {"value": "8.75", "unit": "%"},
+        mock_instance.get_raw_divs_from_multiplicator_data_from_api.return_value = {
+            "forward_annual_dividend_yield": 10.49,
+            "five_years_average_dividend_yield": 8.75,
+            "current_ratio_mrq": None,
         }
         yield mock_instance
 
@@ -80,20 +81,29 @@ def test_get_extended_dividend_data_by_ticker(mock_client, mock_db_manager, mock
         }
         result = get_extended_dividend_data_by_ticker("SBER")
         mock_get_div.assert_called_once_with("SBER")
-        mock_multiplicators.get_divs_from_multiplicator_data_from_api.assert_called_once_with("SBER")
+        mock_multiplicators.get_raw_divs_from_multiplicator_data_from_api.assert_called_once_with("SBER")
         assert isinstance(result, dict)
         assert "dividend_net" in result
         assert result["dividend_net"]["value"] == "10.50"
         assert result["dividend_net"]["unit"] == "руб"
-        assert "dividend_yield_daily_ttm" in result
-        assert result["dividend_yield_daily_ttm"]["value"] == "10.49"
+        assert result["close_price"] == {"value": "150.00", "unit": "руб"}
+        assert result["forward_annual_dividend_yield"] == {"value": "10.49", "unit": "%"}
+        assert "current_ratio_mrq" not in result
+
+
+def test_raw_dividend_dates_are_iso_strings(mock_multiplicators):
+    payment_date = datetime(2024, 7, 21)
+    with patch("services.dividends.dividends.get_dividend_data_by_ticker", return_value={"dividend_net": 10.5, "payment_date": payment_date}):
+        raw = get_raw_extended_dividend_data_by_ticker("SBER")
+    assert raw["payment_date"] == "2024-07-21T00:00:00"
+    assert json.loads(json.dumps(raw)) == raw  # the cached row reads back unchanged
 
 
 @pytest.fixture
 def mock_multiplicator_client():
-    with patch("services.multiplicators.multiplicators.Client") as mock:
+    with patch("services.multiplicators.multiplicators.tinkoff_client") as mock:
         client_instance = Mock()
-        mock.return_value.__enter__.return_value = client_instance
+        mock.services.return_value.__enter__.return_value = client_instance
         yield client_instance
 
 
@@ -121,3 +131,25 @@ def test_get_divs_from_multiplicator_data_from_api(mock_multiplicator_client, mo
     assert isinstance(result["five_years_average_dividend_yield"], dict)
     assert result["five_years_average_dividend_yield"]["value"] == "8.75"
     assert result["five_years_average_dividend_yield"]["unit"] == "%"
+
+
+def test_raw_multiplicator_dates_are_iso_strings(mock_multiplicator_client, mock_multiplicator_db):
+    fundamental_mock = MagicMock(asset_uid="uid", ex_dividend_date=datetime(2024, 7, 18))
+    mock_multiplicator_client.instruments.get_asset_fundamentals.return_value = MagicMock(fundamentals=[fundamental_mock])
+    mock_multiplicator_db.get_ticker_by_uid.return_value = "SBER"
+    multiplicator = Multiplicators()
+    multiplicator.db_manager = mock_multiplicator_db
+    with patch.object(Multiplicators, "get_asset_uids", return_value=["uid"]):
+        raw = multiplicator.get_raw_multiplicator_data_from_api()
+    assert raw["SBER"]["ex_dividend_date"] == "2024-07-18T00:00:00"
+
+
+def test_fundamentals_of_unknown_uids_are_skipped(mock_multiplicator_client, mock_multiplicator_db):
+    known, unknown = MagicMock(asset_uid="uid"), MagicMock(asset_uid="missing")
+    mock_multiplicator_client.instruments.get_asset_fundamentals.return_value = MagicMock(fundamentals=[known, unknown])
+    mock_multiplicator_db.get_ticker_by_uid.side_effect = lambda uid: "SBER" if uid == "uid" else None
+    multiplicator = Multiplicators()
+    multiplicator.db_manager = mock_multiplicator_db
+    with patch.object(Multiplicators, "get_asset_uids", return_value=["uid", "missing"]):
+        raw = multiplicator.get_raw_multiplicator_data_from_api()
+    assert list(raw) == ["SBER"]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from services.ichimoku.downsample import lttb_indices, downsample_rows
+
+
+def reference_lttb(x, y, n_out):
+    """Straightforward LTTB, point by point"""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected = [0]
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n - 1)
+        if i == n_out - 3:
+            cx, cy = x[-1], y[-1]
+        else:
+            cx, cy = np.mean(x[next_start:next_end]), np.mean(y[next_start:next_end])
+        a = selected[-1]
+        areas = [abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a])) for j in range(start, end)]
+        selected.append(start + int(np.argmax(areas)))
+    return selected + [n - 1]
+
+
+def test_matches_reference():
+    rng = np.random.default_rng(0)
+    for n, n_out in [(1000, 100), (997, 37), (50, 3), (120, 119)]:
+        x = np.arange(n, dtype=float) * 3600
+        y = 100 + rng.normal(0, 1, n).cumsum()
+        assert lttb_indices(x, y, n_out).tolist() == reference_lttb(x, y, n_out)
+
+
+def test_keeps_peaks_and_ends():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[123], y[321] = 50, -40
+    indices = lttb_indices(x, y, 20).tolist()
+    assert indices[0] == 0 and indices[-1] == 499
+    assert 123 in indices and 321 in indices
+    assert len(indices) == 20
+
+
+def test_downsample_rows():
+    rows = [{"time": i * 60, "close": float(i % 7), "tenkanSen": 1.0} for i in range(300)]
+    rows[10] = {"time": 600, "chikouSpan": 5.0}  # a row without close
+    sampled = downsample_rows(rows, 50)
+    assert len(sampled) == 50
+    assert sampled[0] is rows[0] and sampled[-1] is rows[-1]
+    assert [row["time"] for row in sampled] == sorted(row["time"] for row in sampled)
+    assert downsample_rows(rows[:40], 50) == rows[:40]
@@ -0,0 +1,28 @@
+import httpx
+
+from services import http_client
+
+
+def test_one_client_per_process():
+    http_client.close()
+    client = http_client.get_client()
+    assert http_client.get_client() is client
+    assert client.timeout == http_client.TIMEOUT
+    assert client.headers["Accept-Encoding"] == "gzip, deflate"
+    http_client.close()
+    assert client.is_closed
+    assert http_client.get_client() is not client
+    http_client.close()
+
+
+def test_requests_go_through_the_shared_client(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, str(request.url), request.content))
+        return httpx.Response(200, json={"ok": True})
+
+    monkeypatch.setattr(http_client, "_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    assert http_client.get("https://iss.moex.com/a", params={"x": 1}).json() == {"ok": True}
+    http_client.post("https://cbr.ru/b", content="<soap/>")
+    assert seen == [("GET", "https://iss.moex.com/a?x=1", b""), ("POST", "https://cbr.ru/b", b"<soap/>")]
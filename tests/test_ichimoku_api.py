@@ -0,0 +1,147 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.ichimoku.ichimoku_api import IchimokuApi
+
+
+@pytest.fixture
+def api():
+    return IchimokuApi(ticker="TEST", period="W")
+
+
+@pytest.fixture
+def ichimoku_df(api):
+    size = 80
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    close = np.linspace(100.0, 140.0, size)
+    df = pd.DataFrame(
+        {
+            "time": [start + timedelta(hours=i) for i in range(size)],
+            "open": close - 1,
+            "close": close,
+            "high": close + 2,
+            "low": close - 2,
+            "volume": np.arange(size),
+        }
+    )
+    return api.get_ichimoku(df)
+
+
+def test_export_nan_drops_nan_and_converts_time(api, ichimoku_df):
+    data = api.export_nan(ichimoku_df)
+    assert len(data) == len(ichimoku_df)
+    assert data[0] == {"time": 1704067200, "open": 99.0, "close": 100.0, "high": 102.0, "low": 98.0, "volume": 0, "chikouSpan": ichimoku_df["close"][26]}
+    assert "tenkanSen" in data[8] and "tenkanSen" not in data[7]
+    assert "chikouSpan" not in data[-1]
+    assert all(not any(isinstance(v, float) and np.isnan(v) for v in row.values()) for row in data)
+
+
+def test_export_nan_keeps_column_order_and_native_types(api, ichimoku_df):
+    data = api.export_nan(ichimoku_df)
+    row = data[60]
+    assert list(row) == [col for col in ichimoku_df.columns if col in row]
+    assert list(row)[:6] == ["time", "open", "close", "high", "low", "volume"]
+    assert type(row["volume"]) is int and type(row["close"]) is float
+    json.dumps(data)
+
+
+def test_export_nan_empty_frame(api):
+    assert api.export_nan(pd.DataFrame()) == []
+
+
+def test_get_all_candles_by_period_fetches_only_missing_tail(api, monkeypatch):
+    import services.ichimoku.ichimoku_api as ia
+    from services.tinkoff_client import TinkoffClient
+
+    stored = []
+    requested = []
+    now_val = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    class DummyStore:
+        def __init__(self, figi, interval):
+            pass
+
+        def get_last_time(self):
+            return stored[-1]["time"] if stored else None
+
+        def save_candles(self, candles):
+            known = {c["time"] for c in candles}
+            stored[:] = sorted([c for c in stored if c["time"] not in known] + candles, key=lambda c: c["time"])
+
+        def clear_outdated_candles(self, before):
+            pass
+
+        def get_candles(self, from_):
+            return [c for c in stored if c["time"] >= from_]
+
+    class DummyClient:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+        def get_all_candles(self, figi, from_, interval):
+            requested.append(from_)
+            return iter([])
+
+    def make_candle(self, candle):
+        return candle
+
+    monkeypatch.setattr(ia, "CandlesDbManager", DummyStore)
+    monkeypatch.setattr(ia, "tinkoff_client", TinkoffClient(client=lambda token: DummyClient()))
+    monkeypatch.setattr(ia, "now", lambda: now_val)
+    monkeypatch.setattr(ia.TickerTableDBManager, "get_figi_by_ticker", lambda self, ticker: "FIGI")
+    monkeypatch.setattr(ia.IchimokuApi, "make_candle", make_candle)
+
+    last = now_val - timedelta(hours=3)
+    stored.append({"time": last, "open": 1.0, "close": 1.0, "high": 1.0, "low": 1.0, "volume": 1})
+    df = api.get_all_candles_by_period()
+    assert requested == [last]
+    assert len(df) == 1 and "tenkanSen" in df.columns
+
+    stored.clear()
+    api.get_all_candles_by_period()
+    assert requested[-1] == now_val - ia.get_history_depth(ia.get_candle_source("W")[0])
+
+
+def test_resample_candles_ohlcv(api):
+    start = datetime(2024, 1, 1, 7, 0, tzinfo=timezone.utc)
+    df = pd.DataFrame(
+        {
+            "time": [start + timedelta(minutes=10 * i) for i in range(12)],
+            "open": np.arange(12, dtype=float),
+            "close": np.arange(12, dtype=float) + 0.5,
+            "high": np.arange(12, dtype=float) + 1,
+            "low": np.arange(12, dtype=float) - 1,
+            "volume": np.full(12, 10),
+        }
+    )
+    df = df.drop(index=[7, 8]).reset_index(drop=True)  # gap inside the second hour
+    hourly = api.resample_candles(df, "1h")
+    assert list(hourly.columns) == ["time", "open", "close", "high", "low", "volume"]
+    assert hourly["time"].tolist() == [pd.Timestamp(start), pd.Timestamp(start + timedelta(hours=1))]
+    assert hourly.iloc[0][["open", "close", "high", "low", "volume"]].tolist() == [0.0, 5.5, 6.0, -1.0, 60]
+    assert hourly.iloc[1][["open", "close", "high", "low", "volume"]].tolist() == [6.0, 11.5, 12.0, 5.0, 40]
+    assert api.resample_candles(df, None) is df
+
+
+def test_candle_source_in_resample_mode(monkeypatch):
+    import services.ichimoku.ichimoku_api as ia
+    from services.tinkoff_client import TinkoffClient
+
+    monkeypatch.setattr(ia, "RESAMPLE_CANDLES", False)
+    assert ia.get_candle_source("W") == (ia.CandleInterval.CANDLE_INTERVAL_HOUR, None)
+    assert ia.get_history_depth(ia.CandleInterval.CANDLE_INTERVAL_DAY) == ia.timedelta_type["Y"]
+    # one chart day of 10-minute candles is too short for the scanner
+    assert ia.get_history_depth(ia.CandleInterval.CANDLE_INTERVAL_10_MIN) == ia.get_candles_span("D", ia.SCAN_CANDLES) > ia.timedelta_type["D"]
+
+    monkeypatch.setattr(ia, "RESAMPLE_CANDLES", True)
+    base = ia.CandleInterval.CANDLE_INTERVAL_10_MIN
+    assert {ia.get_candle_source(period)[0] for period in ["D", "3D", "W", "M"]} == {base}
+    assert ia.get_candle_source("M") == (base, "4h")
+    assert ia.get_history_depth(base) == max(ia.timedelta_type["M"], ia.get_candles_span("M", ia.SCAN_CANDLES))
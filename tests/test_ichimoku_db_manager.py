@@ -1,5 +1,3 @@
-import sys
-import types
 from datetime import datetime, timedelta
 import json
 import pytest
@@ -8,28 +6,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..models.db_model import Base, IchimokuIndexCache, SessionLocal
 from ..services.ichimoku.ichimoku_db import IchimokuDbManager
+from ..models.cache_codec import decode_cache
 import os
 
-dummy_api = types.ModuleType("services.ichimoku.ichimoku_api")
-
-
-class DummyIchimokuApi:
-    def __init__(self, ticker, period):
-        self.ticker = ticker
-        self.period = period
-
-    def get_all_candles_by_period(self):
-        now_val = datetime.now()
-        df = pd.DataFrame([{"time": now_val, "open": 100.0, "close": 110.0, "high": 115.0, "low": 95.0, "volume": 1000}])
-        return df
-
-    def export_nan(self, df):
-        return {"tenkanSen": 100, "kijunSen": 105}
-
-
-dummy_api.IchimokuApi = DummyIchimokuApi
-sys.modules["services.ichimoku.ichimoku_api"] = dummy_api
-
 TEST_ENGINE = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=TEST_ENGINE)
 SessionLocal.configure(bind=TEST_ENGINE)
@@ -45,6 +24,7 @@ def patch_ticker_table_db(monkeypatch):
 @pytest.fixture(autouse=True)
 def patch_ichimoku_api(monkeypatch):
     import services.ichimoku.ichimoku_api as ia
+    from services.tinkoff_client import TinkoffClient
 
     monkeypatch.setattr(
         ia.IchimokuApi,
@@ -66,7 +46,7 @@ def patch_ichimoku_api(monkeypatch):
         def get_all_candles(self, **kwargs):
             return iter([])
 
-    monkeypatch.setattr(ia, "Client", lambda token: DummyClient(token))
+    monkeypatch.setattr(ia, "tinkoff_client", TinkoffClient(client=DummyClient))
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -92,7 +72,7 @@ def test_update_and_get_cache(manager):
     manager.update_cache()
     cache = manager.get_cache()
     assert cache is not None
-    assert json.loads(cache.data) == {"tenkanSen": 100, "kijunSen": 105}
+    assert decode_cache(cache.data) == {"tenkanSen": 100, "kijunSen": 105}
 
 
 def test_clear_outdated_cache(manager):
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from models.models import Window
+from services.ichimoku.ichimoku_api import IchimokuApi
+from services.ichimoku.ichimoku_engine import IchimokuEngine, RollingHighLow, DEFAULT_WINDOW, window_key
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CUSTOM = Window(small=5, medium=10, large=30)
+
+
+def make_candles(size: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, size).cumsum()
+    return [
+        {
+            "time": START + timedelta(hours=i),
+            "open": float(close[i] + rng.normal(0, 0.3)),
+            "close": float(close[i]),
+            "high": float(close[i] + rng.random()),
+            "low": float(close[i] - rng.random()),
+            "volume": int(rng.integers(0, 1000)),
+        }
+        for i in range(size)
+    ]
+
+
+def expected_rows(candles: list, window: Window) -> list:
+    api = IchimokuApi(ticker="TEST", period="W")
+    return api.export_nan(api.get_ichimoku(api.normalize_candles(candles), window))
+
+
+def assert_rows_close(actual: dict, expected: dict):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value)
+
+
+def test_rolling_high_low_matches_pandas():
+    candles = make_candles(60)
+    rolling = RollingHighLow(9)
+    for i, candle in enumerate(candles):
+        mid = rolling.midpoint(i, candle["high"], candle["low"])
+        rolling.commit(i, candle["high"], candle["low"])
+        if i < 8:
+            assert mid is None
+        else:
+            window = candles[i - 8 : i + 1]
+            assert mid == pytest.approx((max(c["high"] for c in window) + min(c["low"] for c in window)) / 2)
+
+
+@pytest.mark.parametrize("window", [DEFAULT_WINDOW, CUSTOM])
+def test_engine_matches_full_recalculation(window):
+    candles = make_candles(150)
+    expected = expected_rows(candles, window)
+    engine = IchimokuEngine([window])
+    for i, candle in enumerate(candles):
+        rows = engine.update(candle)[window_key(window)]
+        current = {k: v for k, v in expected[i].items() if k != "chikouSpan"}
+        assert_rows_close(rows[-1], current)
+        if i >= window.medium:
+            assert rows[0] == {"time": expected[i - window.medium]["time"], "chikouSpan": expected[i - window.medium]["chikouSpan"]}
+
+
+def test_forming_candle_updates_replace_last_candle():
+    candles = make_candles(100)
+    engine = IchimokuEngine.from_candles(candles[:-1])
+    forming = dict(candles[-1], high=candles[-1]["high"] + 50, low=candles[-1]["low"] - 50)
+    engine.update(forming)  # the spike is replaced by the final version of the candle
+    rows = engine.update(candles[-1])[window_key(DEFAULT_WINDOW)]
+    expected = expected_rows(candles, DEFAULT_WINDOW)
+    assert_rows_close(rows[-1], {k: v for k, v in expected[-1].items() if k != "chikouSpan"})
+    assert engine.update(candles[-2]) == {}  # older candles are ignored
+
+
+def test_add_window_seeds_from_history():
+    candles = make_candles(200)
+    engine = IchimokuEngine.from_candles(candles[:150])
+    engine.add_window(CUSTOM)
+    assert {window_key(w) for w in engine.windows} == {window_key(DEFAULT_WINDOW), window_key(CUSTOM)}
+    for i in range(150, 200):
+        rows = engine.update(candles[i])
+    for window in (DEFAULT_WINDOW, CUSTOM):
+        expected = expected_rows(candles, window)
+        assert_rows_close(rows[window_key(window)][-1], {k: v for k, v in expected[-1].items() if k != "chikouSpan"})
+
+
+@pytest.mark.parametrize("window", [Window(small=9, medium=300, large=400), Window(small=9, medium=0, large=52), Window(small=0, medium=26, large=52), Window(small=-1, medium=26, large=52), Window(small=30, medium=26, large=52)])
+def test_add_window_rejects_invalid_windows(window):
+    engine = IchimokuEngine()
+    with pytest.raises(ValueError):
+        engine.add_window(window)
+    assert engine.windows == [DEFAULT_WINDOW]
@@ -0,0 +1,255 @@
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.db_model import Base, IchimokuIndexCache
+from services.ichimoku import ichimoku_db
+from services.ichimoku import ichimoku_func
+from services.ichimoku.ichimoku_func import ichimoku_index_data, ichimoku_batch_data, ichimoku_refreshes, background_refreshes
+import services.ichimoku.ichimoku_api as ia
+from services.tinkoff_client import TinkoffClient
+
+# a file database: threadpool workers need their own connections, as with the real db
+TEST_ENGINE = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'ichimoku.db')}", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(bind=TEST_ENGINE)
+CONCURRENT_REQUESTS = 20
+
+
+@pytest.fixture(autouse=True)
+def setup_db(monkeypatch):
+    monkeypatch.setattr(ichimoku_db, "SessionLocal", TestingSessionLocal)
+    Base.metadata.create_all(TEST_ENGINE)
+    yield
+    Base.metadata.drop_all(TEST_ENGINE)
+
+
+@pytest.fixture
+def upstream_calls(monkeypatch):
+    calls = []
+
+    async def slow_download(self, client=None):
+        calls.append((self.ticker, self.period))
+        await asyncio.sleep(0.2)
+        return pd.DataFrame([{"time": datetime.now(), "open": 100.0, "close": 110.0, "high": 115.0, "low": 95.0, "volume": 1000}])
+
+    monkeypatch.setattr(ia.IchimokuApi, "aget_all_candles_by_period", slow_download)
+    monkeypatch.setattr(ia.IchimokuApi, "export_nan", lambda self, df: [{"time": 1, "close": 110.0}])
+    return calls
+
+
+async def load(ticker: str = "SBER", period: str = "W") -> list:
+    return await asyncio.gather(*[ichimoku_index_data(ticker, period) for _ in range(CONCURRENT_REQUESTS)])
+
+
+def expire(ticker: str, period: str, age: timedelta = timedelta(days=2)):
+    session = TestingSessionLocal()
+    entry = session.query(IchimokuIndexCache).filter_by(ticker=ticker, period=period).first()
+    entry.timestamp = datetime.now() - age
+    session.commit()
+    session.close()
+
+
+def test_one_upstream_call_per_expiry(upstream_calls):
+    async def scenario():
+        results = await load()
+        assert upstream_calls == [("SBER", "W")]
+        assert all(result == {"data": [{"time": 1, "close": 110.0}]} for result in results)
+
+        await load()
+        assert len(upstream_calls) == 1  # served from cache
+
+        expire("SBER", "W")
+        await load()
+        assert len(upstream_calls) == 2
+        assert not ichimoku_refreshes.in_flight(("SBER", "W"))
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_refresh_independently(upstream_calls):
+    keys = [("SBER", "W"), ("SBER", "W"), ("GAZP", "W"), ("SBER", "D")]
+
+    async def scenario():
+        await asyncio.gather(*[ichimoku_index_data(*key) for key in keys])
+
+    asyncio.run(scenario())
+    assert sorted(upstream_calls) == [("GAZP", "W"), ("SBER", "D"), ("SBER", "W")]
+
+
+def test_waiters_get_the_refresh_error(monkeypatch):
+    calls = []
+
+    async def failing_download(self, client=None):
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        raise RuntimeError("upstream is down")
+
+    monkeypatch.setattr(ia.IchimokuApi, "aget_all_candles_by_period", failing_download)
+
+    async def scenario():
+        return await asyncio.gather(*[ichimoku_index_data("SBER", "W") for _ in range(5)], return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert all(getattr(error, "status_code", None) == 500 for error in errors)
+    assert len(calls) == 1
+
+
+def test_stale_entry_is_served_while_revalidating(upstream_calls):
+    async def scenario():
+        await load()
+        expire("SBER", "W", timedelta(hours=2))
+
+        started = time.perf_counter()
+        results = await load()
+        assert time.perf_counter() - started < 0.2  # no request waited for the download
+        assert all(result["stale"] and result["age"] >= 7200 for result in results)
+        assert all(result["data"] == [{"time": 1, "close": 110.0}] for result in results)
+
+        await asyncio.gather(*background_refreshes)
+        assert len(upstream_calls) == 2
+        assert "stale" not in await ichimoku_index_data("SBER", "W")
+
+    asyncio.run(scenario())
+
+
+def test_too_old_entry_is_refreshed_synchronously(upstream_calls):
+    async def scenario():
+        await load()
+        expire("SBER", "W", timedelta(days=2))
+        result = await ichimoku_index_data("SBER", "W")
+        assert "stale" not in result
+        assert len(upstream_calls) == 2
+
+    asyncio.run(scenario())
+
+
+class FakeAsyncClient:
+    def __init__(self, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+async def slow_aload_candles(self, figi, interval, window_start, client):
+    await asyncio.sleep(0.1)
+    return [{"time": datetime(1970, 1, 1, tzinfo=timezone.utc), "open": 100.0, "close": 110.0, "high": 115.0, "low": 95.0, "volume": 1000}]
+
+
+build_frame = ia.IchimokuApi.build_frame
+
+
+def blocking_build_frame(self, candles, rule):
+    time.sleep(0.3)
+    return build_frame(self, candles, rule)
+
+
+def test_event_loop_stays_responsive_during_refresh(monkeypatch):
+    monkeypatch.setattr(ia.TickerTableDBManager, "get_figi_by_ticker", lambda self, ticker: "FIGI")
+    monkeypatch.setattr(ia.IchimokuApi, "aload_candles", slow_aload_candles)
+    monkeypatch.setattr(ia.IchimokuApi, "build_frame", blocking_build_frame)
+    monkeypatch.setattr(ia, "tinkoff_client", TinkoffClient(async_client=FakeAsyncClient))
+
+    async def scenario():
+        ticks = []
+        request = asyncio.create_task(ichimoku_index_data("SBER", "W"))
+        while not request.done():
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+        return await request, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result["data"] == [{"time": 0, "open": 100.0, "close": 110.0, "high": 115.0, "low": 95.0, "volume": 1000}]
+    # other coroutines kept running while the blocking part was in the threadpool
+    assert len(ticks) > 20
+    assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+
+def test_batch_fetches_misses_through_one_client(monkeypatch):
+    clients = []
+
+    class CountingAsyncClient(FakeAsyncClient):
+        def __init__(self, token):
+            clients.append(self)
+
+    used = []
+
+    async def download(self, client=None):
+        used.append((self.ticker, client))
+        await asyncio.sleep(0.1)
+        if self.ticker == "VKCO":
+            raise RuntimeError("no candles")
+        return pd.DataFrame([{"time": datetime.now(), "open": 1.0, "close": 2.0, "high": 3.0, "low": 0.5, "volume": 10}])
+
+    monkeypatch.setattr(ichimoku_func, "tinkoff_client", TinkoffClient(async_client=CountingAsyncClient))
+    monkeypatch.setattr(ia.IchimokuApi, "aget_all_candles_by_period", download)
+    monkeypatch.setattr(ia.IchimokuApi, "export_nan", lambda self, df: [{"time": 1, "close": self.ticker}])
+
+    async def scenario():
+        await ichimoku_index_data("SBER", "W")  # cached before the batch
+        used.clear()
+        clients.clear()
+        return await ichimoku_batch_data(["SBER", "GAZP", "VKCO", "GAZP", "LKOH"], "W")
+
+    started = time.perf_counter()
+    result = asyncio.run(scenario())
+    assert time.perf_counter() - started < 0.3  # misses were fetched concurrently
+
+    assert list(result["data"]) == ["SBER", "GAZP", "LKOH"]
+    assert result["data"]["GAZP"] == {"data": [{"time": 1, "close": "GAZP"}]}
+    assert result["errors"] == ["VKCO"]
+    assert len(clients) == 1
+    assert sorted(ticker for ticker, _ in used) == ["GAZP", "LKOH", "VKCO"]
+    assert all(client is clients[0] for _, client in used)
+
+
+def test_batch_serves_stale_entries(upstream_calls, monkeypatch):
+    monkeypatch.setattr(ichimoku_func, "tinkoff_client", TinkoffClient(async_client=FakeAsyncClient))
+
+    async def scenario():
+        await ichimoku_batch_data(["SBER", "GAZP"], "W")
+        expire("GAZP", "W", timedelta(hours=2))
+        result = await ichimoku_batch_data(["SBER", "GAZP"], "W")
+        await asyncio.gather(*background_refreshes)
+        return result
+
+    result = asyncio.run(scenario())
+    assert "stale" not in result["data"]["SBER"]
+    assert result["data"]["GAZP"]["stale"]
+    assert sorted(upstream_calls) == [("GAZP", "W"), ("GAZP", "W"), ("SBER", "W")]
+
+
+def test_downsampled_variants_are_cached_per_resolution(upstream_calls, monkeypatch):
+    monkeypatch.setattr(ia.IchimokuApi, "export_nan", lambda self, df: [{"time": i, "close": float(i % 5)} for i in range(1000)])
+    downsampled = []
+    downsample_rows = ichimoku_func.downsample_rows
+
+    def counting_downsample(rows, max_points):
+        downsampled.append(max_points)
+        return downsample_rows(rows, max_points)
+
+    monkeypatch.setattr(ichimoku_func, "downsample_rows", counting_downsample)
+
+    async def scenario():
+        assert len((await ichimoku_index_data("SBER", "W", 100))["data"]) == 100  # cache miss
+        for _ in range(3):
+            assert len((await ichimoku_index_data("SBER", "W", 100))["data"]) == 100
+            assert len((await ichimoku_index_data("SBER", "W", 300))["data"]) == 300
+        assert len((await ichimoku_index_data("SBER", "W"))["data"]) == 1000
+
+        expire("SBER", "W", timedelta(days=2))  # a new cache entry is downsampled again
+        await ichimoku_index_data("SBER", "W")
+        await ichimoku_index_data("SBER", "W", 100)
+
+    asyncio.run(scenario())
+    assert downsampled == [100, 300, 100]  # the miss is downsampled once for all later requests
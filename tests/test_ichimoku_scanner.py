@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.models import Window
+from services.ichimoku import ichimoku_scanner as scanner
+import services.ichimoku.ichimoku_api as ia
+from services.tinkoff_client import TinkoffClient
+
+WINDOW = Window(small=9, medium=26, large=52)
+SIZE = WINDOW.large + WINDOW.medium + 1
+
+
+def candles(closes: list) -> pd.DataFrame:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        "time": [start + timedelta(hours=i) for i in range(len(closes))],
+        "open": closes, "close": closes, "high": closes + 1, "low": closes - 1, "volume": 1,
+    })
+
+
+def reference_lines(df: pd.DataFrame) -> pd.DataFrame:
+    return ia.IchimokuApi(ticker="", period="W").get_ichimoku(df.copy(), WINDOW)
+
+
+def test_rolling_midpoint_matches_pandas():
+    rng = np.random.default_rng(0)
+    frames = [candles(100 + rng.normal(0, 1, 120).cumsum()) for _ in range(3)]
+    stacked = scanner.stack_candles(frames, 120)
+    kijun = scanner.rolling_midpoint(stacked["high"], stacked["low"], WINDOW.medium)
+    for row, df in enumerate(frames):
+        np.testing.assert_allclose(kijun[row], reference_lines(df)["kijunSen"].to_numpy(), equal_nan=True)
+
+
+def test_stack_pads_short_series():
+    stacked = scanner.stack_candles([candles(range(10)), candles([])], 5)
+    np.testing.assert_array_equal(stacked["close"][0], [5, 6, 7, 8, 9])
+    assert np.isnan(stacked["close"][1]).all()
+
+
+def test_signals_match_per_ticker_lines():
+    rng = np.random.default_rng(1)
+    # a long fall followed by a sharp rise: bullish tk cross and cloud break near the end
+    rise = np.r_[np.linspace(200, 100, 100), np.linspace(100, 200, 20)]
+    frames = [candles(rise[: n]) for n in range(100, 121)] + [candles(100 + rng.normal(0, 2, 120).cumsum()) for _ in range(20)]
+    stacked = scanner.stack_candles(frames, SIZE)
+    signals = scanner.scan_signals(stacked["high"], stacked["low"], stacked["close"], WINDOW)
+
+    for row, df in enumerate(frames):
+        lines = reference_lines(df)
+        last, prev = lines.iloc[-1], lines.iloc[-2]
+        tk = np.sign(last.tenkanSen - last.kijunSen)
+        expected_tk = tk if tk != np.sign(prev.tenkanSen - prev.kijunSen) else 0
+
+        def position(line):
+            top, bottom = max(line.senkouSpanA, line.senkouSpanB), min(line.senkouSpanA, line.senkouSpanB)
+            return 1 if line.close > top else -1 if line.close < bottom else 0
+
+        expected_cloud = position(last) if position(last) != position(prev) else 0
+        back = lines.iloc[-1 - WINDOW.medium]
+        expected_chikou = 1 if last.close > back.high else -1 if last.close < back.low else 0
+
+        assert signals["tkCross"][row] == expected_tk
+        assert signals["cloudBreak"][row] == expected_cloud
+        assert signals["chikou"][row] == expected_chikou
+    assert signals["tkCross"].any() and signals["cloudBreak"].any()
+
+
+def test_short_history_has_no_signals():
+    stacked = scanner.stack_candles([candles(range(10))], SIZE)
+    signals = scanner.scan_signals(stacked["high"], stacked["low"], stacked["close"], WINDOW)
+    assert signals["score"].tolist() == [0]
+
+
+def test_no_cross_on_the_first_candle_with_lines():
+    # kijun-sen (26) and senkou span B (52 candles, shifted by 26) first appear on the last candle
+    rising = candles(np.linspace(100, 200, WINDOW.medium))
+    falling = np.linspace(200, 100, WINDOW.large + WINDOW.medium)
+    jump = [candles(np.r_[falling[: n - 1], 300]) for n in (WINDOW.large + WINDOW.medium, WINDOW.large + WINDOW.medium + 1)]
+    stacked = scanner.stack_candles([rising, *jump], SIZE)
+    signals = scanner.scan_signals(stacked["high"], stacked["low"], stacked["close"], WINDOW)
+    assert signals["tkCross"][0] == 0
+    assert signals["cloudBreak"].tolist()[1:] == [0, 1]
+
+
+def test_rank_signals():
+    signals = {
+        "tkCross": np.array([0, 1, -1, 0]),
+        "cloudBreak": np.array([0, 1, -1, 0]),
+        "chikou": np.array([0, 1, 0, -1]),
+        "score": np.array([0, 3, -2, -1]),
+    }
+    close = np.array([[1.0], [2.0], [3.0], [4.0]])
+    ranked = scanner.rank_signals(["A", "B", "C", "D"], close, signals)
+    assert [row["ticker"] for row in ranked] == ["B", "C", "D"]
+    assert ranked[0] == {"ticker": "B", "close": 2.0, "tkCross": 1, "cloudBreak": 1, "chikou": 1, "score": 3}
+
+
+class FakeAsyncClient:
+    def __init__(self, token):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    calls = []
+
+    async def load_frame(ticker, period, client, semaphore, wi):
+        calls.append(ticker)
+        await asyncio.sleep(0.05)
+        if ticker == "BAD":
+            raise RuntimeError("no candles")
+        return candles(np.r_[np.linspace(200, 100, 100), np.linspace(100, 200, 20)])
+
+    monkeypatch.setattr(scanner, "tinkoff_client", TinkoffClient(async_client=FakeAsyncClient))
+    monkeypatch.setattr(scanner, "load_frame", load_frame)
+    scanner.scan_cache.clear()
+    return calls
+
+
+def test_scan_is_cached_and_coalesced(loaded):
+    async def scenario():
+        return await asyncio.gather(*[scanner.ichimoku_scan("W", ["SBER", "BAD", "GAZP"]) for _ in range(5)])
+
+    results = asyncio.run(scenario())
+    assert loaded == ["SBER", "BAD", "GAZP"]
+    assert all(result == results[0] for result in results)
+    assert [row["ticker"] for row in results[0]] == ["SBER", "GAZP"]
+
+    asyncio.run(scanner.ichimoku_scan("W", ["SBER", "BAD", "GAZP"]))
+    assert len(loaded) == 3
+
+
+def test_scan_loads_enough_candles_for_short_chart_windows(monkeypatch):
+    starts = []
+
+    async def aload_candles(self, figi, interval, window_start, client):
+        # daily candles on weekdays: a long fall, then the last close jumps above the cloud
+        starts.append((interval, window_start))
+        days = pd.bdate_range(window_start, ia.now(), normalize=True)
+        closes = np.r_[np.linspace(200, 100, len(days) - 1), 300]
+        return [{"time": day, "open": close, "close": close, "high": close + 1, "low": close - 1, "volume": 1} for day, close in zip(days, closes)]
+
+    monkeypatch.setattr(ia, "RESAMPLE_CANDLES", False)
+    monkeypatch.setattr(ia.IchimokuApi, "aload_candles", aload_candles)
+    monkeypatch.setattr(type(scanner.db_manager), "get_figi_by_ticker", lambda self, ticker: "figi")
+    monkeypatch.setattr(scanner, "tinkoff_client", TinkoffClient(async_client=FakeAsyncClient))
+    scanner.scan_cache.clear()
+
+    ranked = asyncio.run(scanner.ichimoku_scan("3M", ["SBER"]))
+    assert starts[0][0] == ia.CandleInterval.CANDLE_INTERVAL_DAY
+    assert ia.now() - starts[0][1] > ia.timedelta_type["3M"]  # ~62 trading days of the chart are less than SIZE
+    assert ranked[0]["ticker"] == "SBER" and ranked[0]["cloudBreak"] == 1
+
+    assert asyncio.run(scanner.ichimoku_scan("Y", ["SBER"])) == ranked
+    assert len(starts) == 1  # 3M and Y scan the same daily candles
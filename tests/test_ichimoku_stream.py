@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import services.ichimoku.ichimoku_api as ia
+import services.ichimoku.ichimoku_stream as stream_mod
+from models.models import Window
+from services.ichimoku.ichimoku_stream import IchimokuStreamHub, subscription_type
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SIZE = 100
+
+
+def make_df(ticker_unused=None) -> pd.DataFrame:
+    close = np.linspace(100.0, 150.0, SIZE)
+    return pd.DataFrame(
+        {
+            "time": [START + timedelta(hours=i) for i in range(SIZE)],
+            "open": close,
+            "close": close,
+            "high": close + 1,
+            "low": close - 1,
+            "volume": np.ones(SIZE, dtype=int),
+        }
+    )
+
+
+def stream_candle(hours: float, close: float, interval=stream_mod.interval_type["W"]) -> SimpleNamespace:
+    return SimpleNamespace(
+        figi="FIGI",
+        interval=subscription_type[interval],
+        time=START + timedelta(hours=hours),
+        open=close,
+        close=close,
+        high=close + 1,
+        low=close - 1,
+        volume=5,
+    )
+
+
+class DummyStream:
+    def __init__(self):
+        self.subscribed = []
+        self.unsubscribed = []
+        self.candles = self
+
+    def subscribe(self, instruments):
+        self.subscribed += instruments
+
+    def unsubscribe(self, instruments):
+        self.unsubscribed += instruments
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = IchimokuStreamHub()
+    hub._stream = DummyStream()
+    monkeypatch.setattr(hub, "_ensure_running", lambda: None)
+    monkeypatch.setattr(stream_mod.db_manager.__class__, "get_figi_by_ticker", lambda self, ticker: "FIGI" if ticker == "SBER" else None)
+    monkeypatch.setattr(stream_mod.IchimokuApi, "get_all_candles_by_period", lambda self: make_df())
+    monkeypatch.setattr(stream_mod.IchimokuApi, "make_candle", lambda self, candle: {f: getattr(candle, f) for f in ["time", "open", "close", "high", "low", "volume"]})
+    monkeypatch.setattr(stream_mod, "CandleInstrument", lambda figi, interval: (figi, interval))
+    return hub
+
+
+def test_watchers_share_one_subscription_and_get_updates(hub):
+    async def scenario():
+        async with hub.watch("SBER", "W") as first, hub.watch("SBER", "W") as second:
+            assert len(hub._stream.subscribed) == 1
+            hub.on_candle(stream_candle(SIZE, 151.0))
+            update = first.get_nowait()
+            assert update == second.get_nowait()
+            assert update["ticker"] == "SBER"
+            chikou, last = update["data"]
+            assert last["time"] == int((START + timedelta(hours=SIZE)).timestamp())
+            assert last["close"] == 151.0 and "tenkanSen" in last and "senkouSpanB" in last
+            assert chikou == {"time": last["time"] - 26 * 3600, "chikouSpan": 151.0}
+
+            hub.on_candle(stream_candle(SIZE, 149.0))  # forming candle is updated, not appended
+            assert first.get_nowait()["data"][-1]["close"] == 149.0
+        assert len(hub._stream.unsubscribed) == 1
+        assert hub._watchers == {} and hub._engines == {}
+
+    asyncio.run(scenario())
+
+
+def test_watchers_with_different_windows(hub):
+    async def scenario():
+        custom = Window(small=5, medium=10, large=20)
+        async with hub.watch("SBER", "W") as default_updates, hub.watch("SBER", "W", custom) as custom_updates:
+            assert len(hub._stream.subscribed) == 1
+            hub.on_candle(stream_candle(SIZE, 151.0))
+            assert default_updates.get_nowait()["data"][0]["time"] == int((START + timedelta(hours=SIZE - 26)).timestamp())
+            assert custom_updates.get_nowait()["data"][0]["time"] == int((START + timedelta(hours=SIZE - 10)).timestamp())
+
+    asyncio.run(scenario())
+
+
+def test_slow_watcher_drops_oldest_updates(hub, monkeypatch):
+    monkeypatch.setattr(stream_mod, "UPDATES_QUEUE_SIZE", 2)
+
+    async def scenario():
+        async with hub.watch("SBER", "W") as updates:
+            for i in range(5):
+                hub.on_candle(stream_candle(SIZE + i, 150.0 + i))
+            assert updates.qsize() == 2
+            assert updates.get_nowait()["data"][-1]["close"] == 153.0
+
+    asyncio.run(scenario())
+
+
+def test_unknown_period_or_ticker_is_rejected_before_loading(hub):
+    async def scenario():
+        for ticker, period in [("SBER", "2W"), ("NOPE", "W")]:
+            with pytest.raises(ValueError):
+                async with hub.watch(ticker, period):
+                    pass
+        assert hub._engines == {} and hub._stream.subscribed == []
+
+    asyncio.run(scenario())
+
+
+def test_resampled_charts_share_the_base_stream(hub, monkeypatch):
+    base = stream_mod.CandleInterval.CANDLE_INTERVAL_10_MIN
+    monkeypatch.setattr(ia, "RESAMPLE_CANDLES", True)
+    # 10-minute candles up to 16:30 of the first day: 4 of 6 base candles of the last hour are stored
+    stored = make_df().assign(time=[START + timedelta(minutes=10 * i) for i in range(SIZE)])
+    monkeypatch.setattr(stream_mod.IchimokuApi, "load_candles", lambda self, figi, interval, window_start: stored.to_dict("records"))
+    monkeypatch.setattr(stream_mod.IchimokuApi, "get_all_candles_by_period", lambda self: stored.copy())
+    last_hour = START + timedelta(hours=16)
+
+    async def scenario():
+        async with hub.watch("SBER", "W") as hourly, hub.watch("SBER", "D") as ten_minutes:
+            assert hub._stream.subscribed == [("FIGI", subscription_type[base])]
+            hub.on_candle(stream_candle(16 + 40 / 60, 200.0, base))  # the 5th base candle of the last hour
+            last = hourly.get_nowait()["data"][-1]
+            assert last["time"] == int(last_hour.timestamp())
+            assert last["open"] == stored["open"].iloc[-4] and last["close"] == 200.0 and last["high"] == 201.0
+            assert last["volume"] == 4 + 5
+            assert ten_minutes.get_nowait()["data"][-1]["close"] == 200.0
+        assert hub._stream.unsubscribed == [("FIGI", subscription_type[base])]
+
+    asyncio.run(scenario())
+
+
+def test_invalid_window_leaves_no_engine(hub):
+    def failing_add_window(window):
+        raise ValueError("seeding failed")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with hub.watch("SBER", "W", Window(small=9, medium=0, large=52)):
+                pass
+        assert hub._engines == {} and hub._stream.subscribed == []
+
+        async with hub.watch("SBER", "W") as updates:
+            next(iter(hub._engines.values())).add_window = failing_add_window
+            with pytest.raises(ValueError):
+                async with hub.watch("SBER", "W", Window(small=5, medium=10, large=20)):
+                    pass
+            hub.on_candle(stream_candle(SIZE, 151.0))
+            assert updates.get_nowait()["data"][-1]["close"] == 151.0  # the watched engine is kept
+
+    asyncio.run(scenario())
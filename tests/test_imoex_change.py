@@ -0,0 +1,52 @@
+import pytest
+
+from services import imoex_change
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    payload = {"marketdata": {"columns": ["SECID", "CURRENTVALUE", "LASTVALUE"], "data": [["IMOEX", 3030.0, 3000.0]]}}
+
+    def get(url, params=None, timeout=None):
+        calls.append((url, params))
+        return FakeResponse(payload)
+
+    monkeypatch.setattr(imoex_change.http_client, "get", get)
+    monkeypatch.setattr(imoex_change, "cache", {"quote": None, "time": 0.0})
+    return calls
+
+
+def test_change_against_previous_close(calls):
+    assert imoex_change.get_imoex_quote() == {"price": 3030.0, "abs_change": 30.0, "percent_change": 1.0}
+    url, params = calls[0]
+    assert url.endswith("IMOEX.json")
+    assert params["iss.only"] == "marketdata"
+    assert params["marketdata.columns"] == "SECID,CURRENTVALUE,LASTVALUE"
+
+
+def test_quote_is_cached(calls, monkeypatch):
+    first = imoex_change.get_imoex_quote()
+    assert imoex_change.get_imoex_quote() == first
+    assert len(calls) == 1
+    monkeypatch.setattr(imoex_change, "IMOEX_TTL", 0)
+    imoex_change.get_imoex_quote()
+    assert len(calls) == 2
+
+
+def test_missing_value_raises(calls, monkeypatch):
+    assert imoex_change.get_market_values({"marketdata": {"columns": ["SECID"], "data": []}}) == (None, None)
+    monkeypatch.setattr(imoex_change.http_client, "get", lambda *args, **kwargs: FakeResponse({}))
+    with pytest.raises(Exception, match="CURRENTVALUE"):
+        imoex_change.get_imoex_quote()
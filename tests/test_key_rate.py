@@ -2,8 +2,8 @@ import pytest, datetime
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..models.db_model import Base, KeyRateTable, PeriodEnum
+from ..services import cbr_keyrate
 from ..services.cbr_keyrate import KeyRate
-import requests
 
 TEST_ENGINE = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=TEST_ENGINE)
@@ -17,7 +17,7 @@ def override_session_local(monkeypatch):
     monkeypatch.setattr(cbr_keyrate, "SessionLocal", TestingSessionLocal)
 
 
-def dummy_post(url, data, headers):
+def dummy_post(url, content, headers):
     class DummyResponse:
         status_code = 200
         text = f"""<?xml version="1.0" encoding="utf-8"?>
@@ -41,7 +41,9 @@ def dummy_post(url, data, headers):
     return DummyResponse()
 
 
-requests.post = dummy_post
+@pytest.fixture(autouse=True)
+def fake_http(monkeypatch):
+    monkeypatch.setattr(cbr_keyrate.http_client, "post", dummy_post)
 
 
 @pytest.fixture
@@ -1,4 +1,8 @@
 import json
+import os
+import tempfile
+import threading
+import time
 import pytest
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
@@ -70,13 +74,92 @@ def test_update_cache_uses_existing(manager):
 def test_update_cache_fetches_new_data(manager, monkeypatch):
     ticker = "NEW"
 
-    def fake_get_multiplicator_data_from_api(self):
-        return {ticker: {"value": 222}}
+    def fake_get_raw_multiplicator_data_from_api(self):
+        return {ticker: {"ticker": ticker, "pe_ratio_ttm": 2.22}}
 
     monkeypatch.setattr(
-        "services.multiplicators.multiplicators.Multiplicators.get_multiplicator_data_from_api", fake_get_multiplicator_data_from_api
+        "services.multiplicators.multiplicators.Multiplicators.get_raw_multiplicator_data_from_api", fake_get_raw_multiplicator_data_from_api
     )
     ret = manager.update_cache(ticker)
-    assert ret == {"value": 222}
+    assert ret == {"ticker": ticker, "pe_ratio_ttm": 2.22}
     cached = manager.get_cache(ticker)
-    assert cached == {"value": 222}
+    assert cached == ret
+
+
+def test_one_refresh_caches_every_ticker(manager, monkeypatch):
+    calls = []
+
+    def fake_get_raw_multiplicator_data_from_api(self):
+        calls.append(1)
+        return {"SBER": {"beta": 1}, "GAZP": {"beta": 2}, "LKOH": {"beta": 3}}
+
+    monkeypatch.setattr(
+        "services.multiplicators.multiplicators.Multiplicators.get_raw_multiplicator_data_from_api", fake_get_raw_multiplicator_data_from_api
+    )
+    manager.save_cache("GAZP", {"value": "old"})
+    session = TestSessionLocal()
+    session.query(MultiplicatorsCache).filter(MultiplicatorsCache.ticker == "GAZP").update({"timestamp": datetime.now() - timedelta(days=100)})
+    session.commit()
+    session.close()
+
+    assert manager.update_cache("SBER") == {"beta": 1}
+    assert manager.update_cache("GAZP") == {"beta": 2}  # outdated row was overwritten by the same refresh
+    assert manager.update_cache("LKOH") == {"beta": 3}
+    assert manager.update_cache("MISSING") == {}
+    assert len(calls) == 2  # the ticker missing from the API response asked once more
+    assert manager.get_cache("MISSING") == {}
+
+
+def test_concurrent_misses_share_one_refresh(monkeypatch):
+    # a file database: every thread gets its own connection
+    file_engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'multiplicators.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=file_engine)
+    FileSessionLocal = sessionmaker(bind=file_engine)
+    monkeypatch.setattr(MultiplicatorsDBManager, "get_session", lambda self: FileSessionLocal())
+    calls = []
+
+    def fake_get_raw_multiplicator_data_from_api(self):
+        calls.append(1)
+        time.sleep(0.2)
+        return {ticker: {"ticker": ticker} for ticker in ["SBER", "GAZP", "LKOH", "ROSN"]}
+
+    monkeypatch.setattr(
+        "services.multiplicators.multiplicators.Multiplicators.get_raw_multiplicator_data_from_api", fake_get_raw_multiplicator_data_from_api
+    )
+    results = {}
+
+    def visit(ticker):
+        results[ticker] = MultiplicatorsDBManager().update_cache(ticker)
+
+    threads = [threading.Thread(target=visit, args=(ticker,)) for ticker in ["SBER", "GAZP", "LKOH", "ROSN"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == {ticker: {"ticker": ticker} for ticker in ["SBER", "GAZP", "LKOH", "ROSN"]}
+
+
+def test_formatted_rows_are_refreshed(manager, monkeypatch):
+    monkeypatch.setattr(
+        "services.multiplicators.multiplicators.Multiplicators.get_raw_multiplicator_data_from_api",
+        lambda self: {"LEGACY": {"pe_ratio_ttm": 4.2}},
+    )
+    manager.save_cache("LEGACY", {"pe_ratio_ttm": {"value": "4.20", "unit": ""}})  # stored before raw values
+    assert manager.get_cache("LEGACY") is None
+    assert manager.update_cache("LEGACY") == {"pe_ratio_ttm": 4.2}
+
+
+def test_get_all_cache_skips_formatted_and_outdated_rows(manager):
+    manager.save_all({"ALL_A": {"roe": 20.0}, "ALL_B": {"roe": 5.0}})
+    manager.save_cache("ALL_LEGACY", {"roe": {"value": "5.00", "unit": "%"}})
+    session = TestSessionLocal()
+    session.add(MultiplicatorsCache(ticker="ALL_OLD", data=json.dumps({"roe": 1.0}), timestamp=datetime.now() - timedelta(days=100)))
+    session.commit()
+    session.close()
+
+    all_data, oldest = manager.get_all_cache()
+    assert all_data["ALL_A"] == {"roe": 20.0} and all_data["ALL_B"] == {"roe": 5.0}
+    assert "ALL_LEGACY" not in all_data and "ALL_OLD" not in all_data
+    assert datetime.now() - oldest < timedelta(days=90)
@@ -0,0 +1,30 @@
+from services.presenter import present, is_presented
+
+
+def test_present_formats_raw_values():
+    raw = {
+        "market_capitalization": 7_123_456_789_012.0,
+        "shares_outstanding": 21_586_948_000,
+        "pe_ratio_ttm": 4.2,
+        "average_daily_volume_last_10_days": 51234,
+        "ticker": "SBER",
+        "dividend_net": 33.3,
+        "payment_date": "2024-07-21 00:00:00+00:00",
+        "roe": None,
+        "unknown": 1.0,
+    }
+    assert present(raw) == {
+        "market_capitalization": {"value": "7 123", "unit": "млрд руб"},
+        "shares_outstanding": {"value": "21 587", "unit": "млн"},
+        "pe_ratio_ttm": {"value": "4.20", "unit": ""},
+        "average_daily_volume_last_10_days": {"value": "51234", "unit": "шт"},
+        "ticker": {"value": "SBER", "unit": ""},
+        "dividend_net": {"value": "33.30", "unit": "руб"},
+        "payment_date": {"value": "2024-07-21 00:00:00+00:00", "unit": ""},
+    }
+
+
+def test_is_presented():
+    assert is_presented({"pe_ratio_ttm": {"value": "4.20", "unit": ""}})
+    assert not is_presented({"pe_ratio_ttm": 4.2})
+    assert not is_presented({})
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import services.quote_stream as stream_mod
+from services import share_price
+from services.quote_stream import LatestUpdates, QuoteStreamHub, format_event, quote_events
+from services.share_price import QuoteService
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = QuoteStreamHub(tickers=["SBER", "GAZP"])
+    service = QuoteService(ttl=60)
+    monkeypatch.setattr(service, "close_due", lambda ticker, now=None: False)  # no closes, changes against own prints
+    monkeypatch.setattr(hub, "_ensure_running", lambda: None)
+    monkeypatch.setattr(stream_mod, "quote_service", service)
+    return hub
+
+
+def test_every_client_gets_updates(hub):
+    async def scenario():
+        async with hub.subscribe() as first, hub.subscribe() as second:
+            hub.on_last_price("SBER", 300.0)
+            hub.on_last_price("SBER", 303.0)
+            hub.publish("IMOEX", {"price": 3000.0, "abs_change": 30.0, "percent_change": 1.0})
+            updates = await first.get()
+            assert updates == await second.get()
+            assert updates == [
+                {"ticker": "SBER", "price": 303.0, "abs_change": 3.0, "percent_change": 1.0},
+                {"ticker": "IMOEX", "price": 3000.0, "abs_change": 30.0, "percent_change": 1.0},
+            ]
+        assert hub._clients == set()
+
+    asyncio.run(scenario())
+
+
+def test_slow_client_gets_only_latest_tick_per_ticker(hub):
+    async def scenario():
+        async with hub.subscribe() as client:
+            for price in range(100, 200):
+                hub.on_last_price("SBER", float(price))
+            hub.on_last_price("GAZP", 150.0)
+            updates = await client.get()
+            assert [(u["ticker"], u["price"]) for u in updates] == [("SBER", 199.0), ("GAZP", 150.0)]
+            assert await client.get(timeout=0.01) == []
+
+    asyncio.run(scenario())
+
+
+def test_new_client_starts_with_latest_quotes_and_repeats_are_skipped(hub):
+    async def scenario():
+        async with hub.subscribe():
+            hub.on_last_price("SBER", 300.0)
+            async with hub.subscribe() as late:
+                hub.on_last_price("SBER", 300.0)  # unchanged quote is not published again
+                assert await late.get() == [{"ticker": "SBER", "price": 300.0, "abs_change": 0.0, "percent_change": 0.0}]
+                assert await late.get(timeout=0.01) == []
+
+    asyncio.run(scenario())
+
+
+def test_closes_reloaded_off_the_loop_after_rollover(monkeypatch):
+    hub = QuoteStreamHub(tickers=["SBER"])
+    service = QuoteService(ttl=60)
+    service._prev_close["SBER"] = (date.today() - timedelta(days=1), 290.0)
+    calls = []
+
+    def get_close_prices(figis):
+        calls.append(threading.current_thread() is threading.main_thread())
+        return {"FIGI_SBER": 295.0}
+
+    monkeypatch.setattr(hub, "_ensure_running", lambda: None)
+    monkeypatch.setattr(stream_mod, "quote_service", service)
+    monkeypatch.setattr(share_price.db_manager.__class__, "get_figi_by_ticker", lambda self, ticker: f"FIGI_{ticker}")
+    monkeypatch.setattr(share_price, "get_close_prices", get_close_prices)
+
+    async def scenario():
+        async with hub.subscribe() as client:
+            hub.on_last_price("SBER", 300.0)
+            assert (await client.get())[0]["abs_change"] == 10.0  # published at once, against yesterday's close
+            assert (await client.get(timeout=1))[0]["abs_change"] == 5.0  # then against the reloaded close
+            hub.on_last_price("SBER", 301.0)
+            assert (await client.get())[0]["abs_change"] == 6.0
+
+    asyncio.run(scenario())
+    assert calls == [False]  # loaded once, in the threadpool
+
+
+def test_upstream_runs_once_while_clients_listen(monkeypatch):
+    started = []
+
+    async def run_forever(name):
+        started.append(name)
+        await asyncio.Event().wait()
+
+    hub = QuoteStreamHub(tickers=["SBER"])
+    monkeypatch.setattr(hub, "_run_prices", lambda: run_forever("prices"))
+    monkeypatch.setattr(hub, "_run_imoex", lambda: run_forever("imoex"))
+
+    async def scenario():
+        async with hub.subscribe(), hub.subscribe():
+            await asyncio.sleep(0)
+            assert sorted(started) == ["imoex", "prices"]
+            tasks = list(hub._tasks)
+        assert hub._tasks == [] and all(task.cancelled() for task in tasks)
+
+    asyncio.run(scenario())
+
+
+def test_prices_from_one_stream(monkeypatch):
+    hub = QuoteStreamHub(tickers=["SBER", "GAZP"])
+    subscribed = []
+
+    class FakeStream:
+        def __init__(self):
+            self.last_price = SimpleNamespace(subscribe=subscribed.extend)
+
+        def __aiter__(self):
+            return self.messages()
+
+        async def messages(self):
+            for figi, price in [("FIGI_SBER", 301.0), ("OTHER", 1.0), ("FIGI_GAZP", 151.0)]:
+                yield SimpleNamespace(last_price=SimpleNamespace(figi=figi, price=price))
+            yield SimpleNamespace(last_price=None)
+            await asyncio.Event().wait()
+
+    class FakeAsyncClient:
+        def __init__(self, token):
+            pass
+
+        async def __aenter__(self):
+            return SimpleNamespace(create_market_data_stream=FakeStream)
+
+        async def __aexit__(self, *args):
+            return False
+
+    service = QuoteService(ttl=60)
+    service.record_price("SBER", 300.0)
+    service.record_price("GAZP", 150.0)
+    monkeypatch.setattr(stream_mod, "quote_service", service)
+    monkeypatch.setattr(stream_mod.db_manager.__class__, "get_figi_by_ticker", lambda self, ticker: f"FIGI_{ticker}")
+    monkeypatch.setattr(stream_mod, "AsyncClient", FakeAsyncClient)
+    monkeypatch.setattr(stream_mod, "LastPriceInstrument", lambda figi: figi)
+    monkeypatch.setattr(stream_mod, "quotation_to_decimal", lambda price: price)
+    monkeypatch.setattr(hub, "_run_imoex", lambda: asyncio.Event().wait())
+
+    async def scenario():
+        async with hub.subscribe() as client:
+            received = {}
+            while set(received) != {"SBER", "GAZP"} or received["GAZP"]["price"] != 151.0:
+                received.update({u["ticker"]: u for u in await client.get(timeout=1)})
+            assert subscribed == ["FIGI_SBER", "FIGI_GAZP"]
+            assert received["SBER"] == {"ticker": "SBER", "price": 301.0, "abs_change": 1.0, "percent_change": 0.33}
+
+    asyncio.run(scenario())
+
+
+def test_sse_events(hub, monkeypatch):
+    monkeypatch.setattr(stream_mod, "HEARTBEAT_INTERVAL", 0.01)
+
+    async def scenario():
+        events = quote_events(hub)
+        assert await anext(events) == ": heartbeat\n\n"
+        hub.publish("IMOEX", {"price": 3000.0})
+        assert await anext(events) == format_event({"ticker": "IMOEX", "price": 3000.0})
+        await events.aclose()
+        assert hub._clients == set()
+
+    asyncio.run(scenario())
+    assert format_event({"ticker": "SBER"}) == 'event: quote\ndata: {"ticker": "SBER"}\n\n'
+
+
+def test_latest_updates_keeps_last_change_order():
+    async def scenario():
+        box = LatestUpdates()
+        box.put("A", {"v": 1})
+        box.put("B", {"v": 2})
+        box.put("A", {"v": 3})
+        assert await box.get() == [{"v": 2}, {"v": 3}]
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.multiplicators import multiplicators_db
+from services.multiplicators.multiplicators_db import MultiplicatorsDBManager
+from services.multiplicators.screener import FundamentalsSnapshot, screen, parse_filter
+
+RAW = {
+    "SBER": {"ticker": "SBER", "pe_ratio_ttm": 4.2, "roe": 22.5, "beta": 1.1},
+    "GAZP": {"ticker": "GAZP", "pe_ratio_ttm": 3.1, "roe": 8.0, "beta": None},
+    "LKOH": {"ticker": "LKOH", "pe_ratio_ttm": 5.5, "roe": 25.0, "beta": 0.9},
+    "OZON": {"ticker": "OZON", "pe_ratio_ttm": None, "roe": 30.0},
+}
+
+
+@pytest.fixture
+def snapshot():
+    snapshot = FundamentalsSnapshot()
+    snapshot.load(RAW)
+    return snapshot
+
+
+def tickers(result):
+    return [row["ticker"] for row in result["rows"]]
+
+
+def test_filter_and_sort(snapshot):
+    result = screen(snapshot, filter="pe_ratio_ttm<5, roe>20", fields="pe_ratio_ttm,roe")
+    assert result == {"total": 1, "rows": [{"ticker": "SBER", "pe_ratio_ttm": 4.2, "roe": 22.5}]}
+    assert tickers(screen(snapshot, sort="-roe")) == ["OZON", "LKOH", "SBER", "GAZP"]
+    assert tickers(screen(snapshot, sort="pe_ratio_ttm")) == ["GAZP", "SBER", "LKOH", "OZON"]  # missing value last
+    assert tickers(screen(snapshot, sort="-pe_ratio_ttm")) == ["LKOH", "SBER", "GAZP", "OZON"]
+
+
+def test_missing_values_never_match(snapshot):
+    assert tickers(screen(snapshot, filter="beta!=1.1")) == ["LKOH"]
+    row = screen(snapshot, filter="roe>=30")["rows"][0]
+    assert row["ticker"] == "OZON" and row["pe_ratio_ttm"] is None
+
+
+def test_limit_keeps_total(snapshot):
+    result = screen(snapshot, sort="-roe", limit=2, fields="roe")
+    assert result["total"] == 4
+    assert result["rows"] == [{"ticker": "OZON", "roe": 30.0}, {"ticker": "LKOH", "roe": 25.0}]
+
+
+@pytest.mark.parametrize("kwargs", [{"filter": "roe>>1"}, {"filter": "unknown<1"}, {"sort": "-name"}, {"fields": "ticker"}, {"filter": "roe<__import__"}])
+def test_invalid_expressions(snapshot, kwargs):
+    with pytest.raises(ValueError):
+        screen(snapshot, **kwargs)
+
+
+def test_parse_filter():
+    assert [(field, value) for field, _, value in parse_filter("roe>-1.5e2,,")] == [("roe", -150.0)]
+
+
+def test_snapshot_refreshed_with_the_cache(monkeypatch):
+    calls = []
+    monkeypatch.setattr(multiplicators_db, "fundamentals_snapshot", FundamentalsSnapshot())
+    monkeypatch.setattr(MultiplicatorsDBManager, "save_all", lambda self, data: calls.append(sorted(data)))
+    monkeypatch.setattr(MultiplicatorsDBManager, "get_all_cache", lambda self: ({}, None))  # nothing cached yet
+    monkeypatch.setattr(multiplicators_db.Multiplicators, "get_raw_multiplicator_data_from_api", lambda self: RAW)
+    manager = MultiplicatorsDBManager()
+
+    snapshot = manager.get_snapshot()
+    assert manager.get_snapshot() is snapshot
+    assert calls == [["GAZP", "LKOH", "OZON", "SBER"]]  # one refresh filled both the cache and the snapshot
+    assert tickers(screen(snapshot, filter="roe>20", sort="roe")) == ["SBER", "LKOH", "OZON"]
+
+    snapshot.loaded_at -= timedelta(days=91)
+    manager.get_snapshot()
+    assert len(calls) == 2
+
+
+def test_snapshot_loaded_from_cache_without_api_call(monkeypatch):
+    monkeypatch.setattr(multiplicators_db, "fundamentals_snapshot", FundamentalsSnapshot())
+    stored = datetime.now() - timedelta(days=10)
+    monkeypatch.setattr(MultiplicatorsDBManager, "get_all_cache", lambda self: (RAW, stored))
+    monkeypatch.setattr(MultiplicatorsDBManager, "refresh_all", lambda self: pytest.fail("no API call expected"))
+
+    snapshot = MultiplicatorsDBManager().get_snapshot()
+    assert snapshot.loaded_at == stored
+    assert tickers(screen(snapshot, filter="pe_ratio_ttm<5")) == ["GAZP", "SBER"]
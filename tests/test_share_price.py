@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services import share_price
+from services.tinkoff_client import TinkoffClient
+
+
+class FakeClient:
+    calls = []
+    close_calls = []
+    prices = {}
+    closes = {}
+
+    def __init__(self, token):
+        self.market_data = SimpleNamespace(get_last_prices=self.get_last_prices, get_close_prices=self.get_close_prices)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def get_last_prices(self, figi):
+        FakeClient.calls.append(list(figi))
+        return SimpleNamespace(last_prices=[SimpleNamespace(figi=f, price=FakeClient.prices[f]) for f in figi if f in FakeClient.prices])
+
+    def get_close_prices(self, instruments):
+        figis = [instrument.instrument_id for instrument in instruments]
+        FakeClient.close_calls.append(figis)
+        return SimpleNamespace(close_prices=[SimpleNamespace(figi=f, price=FakeClient.closes[f]) for f in figis if f in FakeClient.closes])
+
+
+@pytest.fixture(autouse=True)
+def fake_api(monkeypatch):
+    figis = {"SBER": "FIGI_SBER", "SBERP": "FIGI_SBERP", "GAZP": "FIGI_GAZP", "NOPRICE": "FIGI_NOPRICE"}
+
+    def get_figi_by_ticker(self, ticker):
+        if ticker not in figis:
+            raise TypeError("'NoneType' object is not subscriptable")
+        return figis[ticker]
+
+    FakeClient.calls = []
+    FakeClient.close_calls = []
+    FakeClient.prices = {"FIGI_SBER": 300.0, "FIGI_SBERP": 299.5, "FIGI_GAZP": 150.0}
+    FakeClient.closes = {}
+    monkeypatch.setattr(share_price, "tinkoff_client", TinkoffClient(client=FakeClient))
+    monkeypatch.setattr(share_price, "InstrumentClosePriceRequest", lambda instrument_id: SimpleNamespace(instrument_id=instrument_id))
+    monkeypatch.setattr(share_price, "quotation_to_decimal", lambda price: price)
+    monkeypatch.setattr(share_price.db_manager.__class__, "get_figi_by_ticker", get_figi_by_ticker)
+    # ttl=0: every call goes upstream unless a test sets its own service
+    monkeypatch.setattr(share_price, "quote_service", share_price.QuoteService(ttl=0))
+
+
+def test_quotes_of_many_tickers_in_one_call():
+    quotes = share_price.get_realtime_quotes(["SBER", "GAZP", "UNKNOWN", "NOPRICE", "SBERP"])
+    assert FakeClient.calls == [["FIGI_SBER", "FIGI_GAZP", "FIGI_NOPRICE", "FIGI_SBERP"]]
+    assert list(quotes) == ["SBER", "GAZP", "SBERP"]
+    assert quotes["SBER"] == {"price": 300.0, "abs_change": 0.0, "percent_change": 0.0}
+
+
+def test_changes_against_own_previous_print():
+    share_price.get_realtime_quotes(["SBER", "GAZP"])
+    FakeClient.prices.update({"FIGI_SBER": 303.0, "FIGI_GAZP": 147.0})
+    quotes = share_price.get_realtime_quotes(["SBER", "GAZP"])
+    assert quotes["SBER"] == {"price": 303.0, "abs_change": 3.0, "percent_change": 1.0}
+    assert quotes["GAZP"] == {"price": 147.0, "abs_change": -3.0, "percent_change": -2.0}
+    # the single-ticker endpoint shares the same history
+    FakeClient.prices["FIGI_SBER"] = 300.0
+    assert share_price.get_realtime_quote("SBER")["abs_change"] == -3.0
+
+
+def test_no_call_without_figis():
+    assert share_price.get_realtime_quotes(["UNKNOWN"]) == {}
+    assert FakeClient.calls == []
+
+
+def test_changes_against_previous_close():
+    FakeClient.closes = {"FIGI_SBER": 290.0}
+    quotes = share_price.get_realtime_quotes(["SBER", "GAZP"])
+    assert quotes["SBER"] == {"price": 300.0, "abs_change": 10.0, "percent_change": 3.45}
+    assert quotes["GAZP"]["abs_change"] == 0.0  # no close, no previous print yet
+    share_price.get_realtime_quotes(["SBER", "GAZP"])
+    assert len(FakeClient.close_calls) == 1  # closes are loaded once a day
+
+
+def test_closes_reloaded_on_a_new_day_while_prices_are_fresh(monkeypatch):
+    service = share_price.QuoteService(ttl=60)
+    monkeypatch.setattr(share_price, "quote_service", service)
+    FakeClient.closes = {"FIGI_SBER": 290.0}
+    share_price.get_realtime_quote("SBER")
+    service._prev_close["SBER"] = (date.today() - timedelta(days=1), 280.0)  # the session rolled over
+
+    service.record_price("SBER", 300.0)
+    assert share_price.get_realtime_quote("SBER")["abs_change"] == 10.0
+    assert len(FakeClient.close_calls) == 2 and len(FakeClient.calls) == 1
+
+
+def test_failed_closes_are_not_requested_on_every_call(monkeypatch):
+    service = share_price.QuoteService(ttl=60)
+    monkeypatch.setattr(share_price, "quote_service", service)
+
+    def fail(self, instruments):
+        FakeClient.close_calls.append(instruments)
+        raise RuntimeError("UNAVAILABLE")
+
+    monkeypatch.setattr(FakeClient, "get_close_prices", fail)
+    for _ in range(5):
+        assert share_price.get_realtime_quote("SBER")["price"] == 300.0
+    assert len(FakeClient.close_calls) == 1
+
+
+def test_repeated_requests_are_served_from_memory(monkeypatch):
+    service = share_price.QuoteService(ttl=60)
+    monkeypatch.setattr(share_price, "quote_service", service)
+    for _ in range(50):
+        share_price.get_realtime_quote("SBER")
+        share_price.get_realtime_quotes(["SBER", "GAZP"])
+    assert FakeClient.calls == [["FIGI_SBER"], ["FIGI_GAZP"]]  # only the expired/new tickers are asked
+
+
+def test_ring_buffer_keeps_recent_prices():
+    service = share_price.QuoteService(history_size=3)
+    for price in [1.0, 2.0, 3.0, 4.0]:
+        service.record_price("SBER", price)
+    assert [price for _, price in service.history("SBER")] == [2.0, 3.0, 4.0]
+    assert service.get_quotes(["SBER"])["SBER"]["abs_change"] == 1.0
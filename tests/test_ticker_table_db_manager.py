@@ -4,6 +4,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from ..models.db_model import Base, TickerTable
 from ..services.paper_data.ticker_table_db import TickerTableDBManager
+from ..services.paper_data.ticker_index import ticker_index
+from ..services.paper_data import ticker_table_db
 
 TEST_ENGINE = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(bind=TEST_ENGINE)
@@ -17,14 +19,28 @@ PaperData.get_uid_ticker_figi_data_by_ticker = lambda self, ticker: dummy_table
 
 
 @pytest.fixture
-def manager():
+def shares(monkeypatch):
+    """Records returned by the bulk shares() sync"""
+    records = []
+    monkeypatch.setattr(PaperData, "get_all_uid_ticker_figi_data", lambda self: records)
+    monkeypatch.setattr(ticker_table_db, "last_sync", None)
+    return records
+
+
+@pytest.fixture
+def manager(shares):
+    session = TestingSessionLocal()
+    session.query(TickerTable).delete()
+    session.commit()
+    session.close()
+    ticker_index.invalidate()
     return TickerTableDBManager()
 
 
 def test_update_cache_and_getters(manager):
     data = manager.update_cache("TEST")
-    loaded = json.loads(data) if isinstance(data, str) else data
-    assert loaded["uid"] == "dummy_uid"
+    assert data["uid"] == "dummy_uid"
+    assert manager.get_cache("TEST")["figi"] == "dummy_figi"
     uid = manager.get_uid_by_ticker("TEST")
     assert uid == "dummy_uid"
     figi = manager.get_figi_by_ticker("TEST")
@@ -34,4 +50,81 @@ def test_update_cache_and_getters(manager):
 def test_get_ticker_by_uid(manager):
     _ = manager.update_cache("DUMMY")
     ticker = manager.get_ticker_by_uid("dummy_uid")
-    assert ticker == "SBER"
+    assert ticker == "DUMMY"
+
+
+def test_index_lookups_without_db_round_trips(manager, monkeypatch):
+    session = TestingSessionLocal()
+    for ticker in ["SBER", "GAZP"]:
+        session.add(TickerTable(ticker=ticker, uid=f"uid_{ticker}", figi=f"figi_{ticker}", isin=f"isin_{ticker}", timestamp=datetime.now()))
+    session.commit()
+    session.close()
+
+    sessions = []
+    monkeypatch.setattr(TickerTableDBManager, "get_session", lambda self: sessions.append(1) or TestingSessionLocal())
+    for _ in range(100):
+        assert manager.get_ticker_by_uid("uid_GAZP") == "GAZP"
+        assert manager.get_figi_by_ticker("SBER") == "figi_SBER"
+        assert manager.get_record("isin", "isin_SBER")["uid"] == "uid_SBER"
+        assert manager.get_record("figi", "figi_GAZP")["ticker"] == "GAZP"
+    assert len(sessions) == 1  # the table was loaded once
+
+    # a new ticker is fetched, saved and visible through a reloaded index
+    assert manager.get_uid_by_ticker("NEW") == "dummy_uid"
+    assert manager.get_record("uid", "uid_SBER")["ticker"] == "SBER"
+
+
+def test_sync_all_upserts_shares(manager, shares):
+    manager.update_cache("SBER")  # an old row is overwritten by the sync
+    shares.extend({"ticker": t, "uid": f"uid_{t}", "figi": f"figi_{t}", "isin": f"isin_{t}", "currency": "rub"} for t in ["SBER", "GAZP", "LKOH"])
+
+    assert manager.sync_all() == 3
+    session = TestingSessionLocal()
+    assert session.query(TickerTable).count() == 3
+    session.close()
+    assert manager.get_record("ticker", "SBER")["uid"] == "uid_SBER"
+    assert manager.get_ticker_by_uid("uid_LKOH") == "LKOH"
+
+
+def test_sync_all_in_chunks_replaces_moved_tickers(manager, shares, monkeypatch):
+    monkeypatch.setattr(ticker_table_db, "UPSERT_CHUNK", 2)
+    session = TestingSessionLocal()
+    session.add(TickerTable(ticker="OLD", uid="uid_T4", figi="figi_T4", isin="isin_T4", timestamp=datetime.now()))
+    session.commit()
+    session.close()
+    shares.extend({"ticker": t, "uid": f"uid_{t}", "figi": f"figi_{t}", "isin": f"isin_{t}"} for t in ["T1", "T2", "T3", "T4", "T5"])
+
+    assert manager.sync_all() == 5
+    session = TestingSessionLocal()
+    assert sorted(row.ticker for row in session.query(TickerTable)) == ["T1", "T2", "T3", "T4", "T5"]
+    session.close()
+
+
+def test_unknown_ticker_is_loaded_by_one_sync(manager, shares, monkeypatch):
+    shares.extend({"ticker": t, "uid": f"uid_{t}", "figi": f"figi_{t}", "isin": f"isin_{t}"} for t in ["SBER", "GAZP"])
+    syncs = []
+    sync_all = TickerTableDBManager.sync_all
+    monkeypatch.setattr(TickerTableDBManager, "sync_all", lambda self: syncs.append(1) or sync_all(self))
+
+    assert manager.get_figi_by_ticker("GAZP") == "figi_GAZP"
+    assert manager.get_figi_by_ticker("SBER") == "figi_SBER"
+    assert manager.get_figi_by_ticker("OTHER") == "dummy_figi"  # not a TQBR share, fetched alone
+    assert len(syncs) == 1
+
+
+def test_saving_a_moved_figi_replaces_the_old_ticker(manager):
+    manager.update_cache("OLD")
+    manager.update_cache("NEW")  # same figi and uid under a new ticker
+    session = TestingSessionLocal()
+    assert [row.ticker for row in session.query(TickerTable)] == ["NEW"]
+    session.close()
+
+
+def test_reverse_lookup_sees_rows_added_by_another_process(manager):
+    assert manager.get_record("figi", "figi_X") is None
+    session = TestingSessionLocal()
+    session.add(TickerTable(ticker="X", uid="uid_X", figi="figi_X", timestamp=datetime.now()))
+    session.commit()
+    session.close()
+    assert manager.get_record("figi", "figi_X")["ticker"] == "X"
+    assert manager.get_record("uid", "uid_X")["ticker"] == "X"
@@ -0,0 +1,133 @@
+import asyncio
+from enum import Enum
+
+import pytest
+
+from services.tinkoff_client import TinkoffClient, is_channel_error
+
+
+class StatusCode(Enum):
+    UNAVAILABLE = 14
+    NOT_FOUND = 5
+    INTERNAL = 13
+    CANCELLED = 1
+
+
+class RequestError(Exception):
+    def __init__(self, code):
+        self.code = code
+
+
+class FakeClient:
+    opened = []
+
+    def __init__(self, token):
+        self.closed = False
+        FakeClient.opened.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.closed = True
+
+
+@pytest.fixture
+def client():
+    FakeClient.opened = []
+    return TinkoffClient(token="x", client=FakeClient, async_client=FakeClient)
+
+
+def test_channel_is_opened_once(client):
+    for _ in range(3):
+        with client.services() as services:
+            assert services is FakeClient.opened[0]
+    assert client.connects == 1
+
+
+def test_channel_error_reconnects_on_next_call(client):
+    with pytest.raises(RequestError):
+        with client.services():
+            raise RequestError(StatusCode.NOT_FOUND)
+    assert len(FakeClient.opened) == 1 and not FakeClient.opened[0].closed
+
+    with pytest.raises(RequestError):
+        with client.services():
+            raise RequestError(StatusCode.UNAVAILABLE)
+    assert FakeClient.opened[0].closed
+
+    with client.services() as services:
+        assert services is FakeClient.opened[1]
+
+
+def test_late_failure_keeps_the_reopened_channel(client):
+    with client.services():
+        pass
+    stale = client.services()
+    stale.__enter__()  # a call still running on the first channel
+    with pytest.raises(RequestError):
+        with client.services():
+            raise RequestError(StatusCode.UNAVAILABLE)
+    with client.services() as services:
+        assert services is FakeClient.opened[1]
+
+    assert stale.__exit__(RequestError, RequestError(StatusCode.UNAVAILABLE), None) is False  # re-raised
+    assert not FakeClient.opened[1].closed
+    with client.services() as services:
+        assert services is FakeClient.opened[1]
+    assert client.connects == 2
+
+
+def test_async_late_failure_keeps_the_reopened_channel(client):
+    async def scenario():
+        stale = client.async_services()
+        await stale.__aenter__()
+        with pytest.raises(RequestError):
+            async with client.async_services():
+                raise RequestError(StatusCode.UNAVAILABLE)
+        async with client.async_services() as services:
+            assert services is FakeClient.opened[1]
+        assert await stale.__aexit__(RequestError, RequestError(StatusCode.UNAVAILABLE), None) is False
+        assert not FakeClient.opened[1].closed
+
+    asyncio.run(scenario())
+
+
+def test_is_channel_error():
+    class RpcError(Exception):
+        def code(self):
+            return StatusCode.UNAVAILABLE
+
+    assert is_channel_error(RpcError())
+    assert is_channel_error(ValueError("Cannot invoke RPC on closed channel!"))
+    assert not is_channel_error(RequestError(StatusCode.NOT_FOUND))
+    assert not is_channel_error(RequestError(StatusCode.INTERNAL))  # the channel itself is fine
+    assert not is_channel_error(RequestError(StatusCode.CANCELLED))
+    assert not is_channel_error(KeyError("figi"))
+
+
+def test_async_channel_per_loop(client):
+    async def use():
+        async with client.async_services() as first, client.async_services() as second:
+            assert first is second
+            return first
+
+    first = asyncio.run(use())
+    assert asyncio.run(use()) is not first  # a new loop can't reuse the old loop's channel
+    assert client.connects == 2
+
+
+def test_start_and_close(client):
+    async def lifespan():
+        await client.start()
+        assert client.connects == 2
+        await client.close()
+
+    asyncio.run(lifespan())
+    assert all(fake.closed for fake in FakeClient.opened)